@@ -0,0 +1,154 @@
+"""Test de charge du service HTTP (api_server.py).
+
+Envoie des requêtes en parallèle vers un point d'accès et rapporte le débit,
+les latences (p50/p95/p99), le taux d'erreurs et le nombre de rejets 503.
+
+Exemple :
+    python api_loadtest.py --endpoint analyze --concurrency 16 --requests 500
+    python api_loadtest.py --endpoint transcribe --audio fixtures/reve.wav --concurrency 4 --duration 60
+"""
+
+import argparse
+import json
+import math
+import sys
+import threading
+import time
+from typing import Dict, List, Any, Tuple
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+SAMPLE_DREAMS = [
+    "Je volais au-dessus de l'océan, heureux et libre, puis je tombais dans une maison sombre.",
+    "Un serpent traversait l'école pendant un examen, j'étais anxieux et perdu.",
+    "Ma mère m'attendait sur un pont, la lumière était douce et je me sentais serein.",
+    "Je courais dans un hôpital sans fin, poursuivi par un chien, paniqué."
+]
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile par la méthode du rang le plus proche (0 si aucune valeur)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+def build_request(base_url: str, endpoint: str, index: int, audio: bytes = None) -> Request:
+    """Construit la requête n°index pour le point d'accès testé"""
+    text = SAMPLE_DREAMS[index % len(SAMPLE_DREAMS)]
+
+    if endpoint == "analyze":
+        return Request(f"{base_url}/analyze", data=json.dumps({"text": text}).encode("utf-8"),
+                       headers={"Content-Type": "application/json"})
+    if endpoint == "batch":
+        return Request(f"{base_url}/analyze/batch", data=json.dumps({"texts": SAMPLE_DREAMS}).encode("utf-8"),
+                       headers={"Content-Type": "application/json"})
+    if endpoint == "transcribe":
+        return Request(f"{base_url}/transcribe", data=audio, headers={"Content-Type": "application/octet-stream"})
+    if endpoint == "search":
+        return Request(f"{base_url}/search?{urlencode({'q': text.split()[2]})}")
+    if endpoint == "stats":
+        return Request(f"{base_url}/stats")
+    raise Exception(f"Point d'accès inconnu : {endpoint}")
+
+def run_load(base_url: str, endpoint: str, concurrency: int, total_requests: int = None,
+             duration: float = None, audio: bytes = None, timeout: float = 300.0) -> Dict[str, Any]:
+    """Lance la charge et retourne les mesures brutes agrégées"""
+    counter = iter(range(10 ** 12))
+    counter_lock = threading.Lock()
+    results: List[Tuple[int, float]] = []
+    results_lock = threading.Lock()
+    deadline = time.perf_counter() + duration if duration else None
+
+    def next_index():
+        with counter_lock:
+            index = next(counter)
+        if total_requests is not None and index >= total_requests:
+            return None
+        if deadline is not None and time.perf_counter() >= deadline:
+            return None
+        return index
+
+    def worker():
+        while True:
+            index = next_index()
+            if index is None:
+                return
+            request = build_request(base_url, endpoint, index, audio)
+            start = time.perf_counter()
+            try:
+                with urlopen(request, timeout=timeout) as response:
+                    response.read()
+                    status = response.status
+            except HTTPError as e:
+                status = e.code
+            except (URLError, OSError):
+                status = 0  # Connexion refusée ou coupée
+            elapsed = time.perf_counter() - start
+            with results_lock:
+                results.append((status, elapsed))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    ok_latencies = [elapsed for status, elapsed in results if status == 200]
+    status_counts = {}
+    for status, _ in results:
+        status_counts[status] = status_counts.get(status, 0) + 1
+
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": len(results),
+        "wall_seconds": wall,
+        "throughput": len(ok_latencies) / wall if wall else 0,
+        "error_rate": (len(results) - len(ok_latencies)) / len(results) if results else 0,
+        "rejected": status_counts.get(503, 0),
+        "status_counts": status_counts,
+        "p50": percentile(ok_latencies, 50),
+        "p95": percentile(ok_latencies, 95),
+        "p99": percentile(ok_latencies, 99)
+    }
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Test de charge du service HTTP des rêves")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--endpoint", default="analyze", choices=["analyze", "batch", "transcribe", "search", "stats"])
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, help="Nombre total de requêtes")
+    parser.add_argument("--duration", type=float, help="Durée du test en secondes")
+    parser.add_argument("--audio", help="Fichier audio envoyé à /transcribe")
+    parser.add_argument("--json", dest="json_output", help="Écrit le rapport dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    if args.requests is None and args.duration is None:
+        args.requests = 200
+
+    audio = None
+    if args.endpoint == "transcribe":
+        if not args.audio:
+            parser.error("--audio est requis pour --endpoint transcribe")
+        with open(args.audio, "rb") as f:
+            audio = f.read()
+
+    report = run_load(args.url.rstrip("/"), args.endpoint, args.concurrency, args.requests, args.duration, audio)
+
+    print(f"{report['endpoint']} | concurrence {report['concurrency']} | {report['requests']} requêtes en {report['wall_seconds']:.1f} s")
+    print(f"Débit : {report['throughput']:.1f} req/s | erreurs : {report['error_rate']:.1%} (dont {report['rejected']} rejets 503)")
+    print(f"Latence : p50 {report['p50'] * 1000:.0f} ms | p95 {report['p95'] * 1000:.0f} ms | p99 {report['p99'] * 1000:.0f} ms")
+    print(f"Codes : {report['status_counts']}")
+
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""Service HTTP local exposant l'analyse, la transcription, la recherche et les statistiques.
+
+Les requêtes sont exécutées par un pool de workers borné : au-delà des
+workers occupés et de la file d'attente, le service répond 503 avec un en-tête
+Retry-After plutôt que d'accumuler du travail. Le modèle Whisper est chargé au
+démarrage et reste en mémoire.
+
+Points d'accès (JSON) :
+    GET  /health
+    POST /analyze          {"text": "..."}
+    POST /analyze/batch    {"texts": ["...", "..."]}
+    POST /transcribe       corps = octets audio bruts, ?language=fr
+    GET  /search?q=...&user=...   (&archive=1 pour chercher aussi dans l'archive froide)
+    GET  /stats?user=...   (?scope=all pour l'agrégat de tous les journaux, &archive=1 comme /search)
+
+Exemple :
+    python api_server.py --port 8765 --workers 2 --queue-size 16
+"""
+
+import argparse
+import json
+import socket
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, Callable
+from urllib.parse import urlparse, parse_qs
+
+from dream_transcription import TranscriptionInputError, get_whisper_model, transcribe_audio, validate_language
+from dream_storage import safe_user_id
+from dream_utils import analyze_dream, get_admin_statistics, get_dream_statistics, get_interpretation, search_dreams
+
+MAX_BODY_BYTES = 25 * 1024 * 1024
+MAX_BATCH_SIZE = 100
+
+class PoolSaturated(Exception):
+    """Levée quand tous les workers et toutes les places de la file sont occupés"""
+
+class WorkerPool:
+    """Pool de workers borné avec file d'attente et rejet immédiat au-delà"""
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.capacity = workers + queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="dream-worker")
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def run(self, fn: Callable, *args, timeout: float = None):
+        """Exécute fn dans le pool et attend son résultat (PoolSaturated si plein)"""
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturated()
+
+        with self._lock:
+            self.in_flight += 1
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._release)
+        return future.result(timeout=timeout)
+
+    def _release(self, _future):
+        with self._lock:
+            self.in_flight -= 1
+        self._slots.release()
+
+    def status(self) -> Dict[str, int]:
+        with self._lock:
+            in_flight = self.in_flight
+        return {
+            "workers": self.workers,
+            "capacity": self.capacity,
+            "in_flight": in_flight,
+            "queued": max(0, in_flight - self.workers)
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def _with_interpretation(analysis):
+    """Ajoute le texte rendu de l'interprétation (stockée sous forme de modèles) à la réponse"""
+    return dict(analysis, interpretation=get_interpretation(analysis))
+
+def _analyze_batch(texts):
+    return [analyze_dream(text) for text in texts]
+
+def _search(query, user_id, include_archive=False):
+    results = search_dreams(query, user_id=user_id, include_archive=include_archive)
+    return [dict(dream, analysis=_with_interpretation(dream.get("analysis", {}))) for dream in results]
+
+def _stats(user_id, scope, include_archive=False):
+    if scope == "all":
+        return get_admin_statistics(include_archive=include_archive)
+    return get_dream_statistics(user_id, include_archive=include_archive)
+
+class DreamAPIHandler(BaseHTTPRequestHandler):
+    """Routage des requêtes vers le pool de workers"""
+
+    pool: WorkerPool = None
+    request_timeout: float = 300.0
+    server_version = "DreamSynthesizerAPI/1.0"
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        include_archive = params.get("archive", ["0"])[0] == "1"
+        user_id = params.get("user", [None])[0]
+        try:
+            safe_user_id(user_id)
+        except Exception as e:
+            self._send_json(400, {"error": str(e)})
+            return
+
+        if url.path == "/health":
+            self._send_json(200, {"status": "ok", "pool": self.pool.status()})
+        elif url.path == "/search":
+            query = params.get("q", [""])[0]
+            self._dispatch(lambda results: {"count": len(results), "results": results},
+                           _search, query, user_id, include_archive)
+        elif url.path == "/stats":
+            self._dispatch(lambda stats: stats, _stats,
+                           user_id, params.get("scope", ["user"])[0], include_archive)
+        else:
+            self._send_json(404, {"error": f"Route inconnue : {url.path}"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            self._send_json(400, {"error": "En-tête Content-Length invalide"})
+            return
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {"error": f"Corps de requête limité à {MAX_BODY_BYTES} octets"})
+            return
+        body = self.rfile.read(length)
+
+        if url.path == "/transcribe":
+            if not body:
+                self._send_json(400, {"error": "Corps audio vide"})
+                return
+            language = params.get("language", ["fr"])[0]
+            try:
+                validate_language(language)
+            except TranscriptionInputError as e:
+                self._send_json(400, {"error": str(e)})
+                return
+            self._dispatch(lambda text: {"text": text}, transcribe_audio, body, language)
+            return
+
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": "JSON invalide"})
+            return
+        if not isinstance(payload, dict):
+            self._send_json(400, {"error": "Le corps JSON doit être un objet"})
+            return
+
+        if url.path == "/analyze":
+            if not isinstance(payload.get("text"), str) or not payload["text"].strip():
+                self._send_json(400, {"error": "Champ 'text' requis"})
+                return
+            self._dispatch(_with_interpretation, analyze_dream, payload["text"])
+        elif url.path == "/analyze/batch":
+            texts = payload.get("texts")
+            if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+                self._send_json(400, {"error": "Champ 'texts' (liste de chaînes) requis"})
+                return
+            if len(texts) > MAX_BATCH_SIZE:
+                self._send_json(413, {"error": f"Lot limité à {MAX_BATCH_SIZE} textes"})
+                return
+            self._dispatch(lambda results: {"results": [_with_interpretation(a) for a in results]}, _analyze_batch, texts)
+        else:
+            self._send_json(404, {"error": f"Route inconnue : {url.path}"})
+
+    def _dispatch(self, render: Callable, fn: Callable, *args):
+        """Exécute fn dans le pool et traduit saturation, délai et erreurs en codes HTTP"""
+        try:
+            result = self.pool.run(fn, *args, timeout=self.request_timeout)
+        except PoolSaturated:
+            self._send_json(503, {"error": "Service saturé, réessayez plus tard"}, {"Retry-After": "1"})
+        except TimeoutError:
+            self._send_json(504, {"error": "Délai de traitement dépassé"})
+        except TranscriptionInputError as e:
+            self._send_json(400, {"error": str(e)})
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+        else:
+            self._send_json(200, render(result))
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Dict[str, str] = None):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+def create_server(host: str, port: int, workers: int, queue_size: int,
+                  request_timeout: float = 300.0, verbose: bool = False) -> ThreadingHTTPServer:
+    """Crée le serveur HTTP et son pool de workers"""
+    handler = type("BoundDreamAPIHandler", (DreamAPIHandler,), {
+        "pool": WorkerPool(workers, queue_size),
+        "request_timeout": request_timeout
+    })
+    # File d'écoute bien plus longue que la capacité du pool : une connexion en
+    # trop est acceptée puis reçoit un 503, au lieu d'être réinitialisée par le système
+    server_class = type("DreamAPIServer", (ThreadingHTTPServer,), {
+        "request_queue_size": max(socket.SOMAXCONN, 2 * (workers + queue_size))
+    })
+    server = server_class((host, port), handler)
+    server.daemon_threads = True
+    server.verbose = verbose
+    return server
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Service HTTP du Synthétiseur de Rêves")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2, help="Requêtes traitées simultanément")
+    parser.add_argument("--queue-size", type=int, default=16, help="Requêtes en attente avant de répondre 503")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Délai maximal d'une requête (s)")
+    parser.add_argument("--no-preload", action="store_true", help="Ne charge pas Whisper au démarrage")
+    parser.add_argument("--verbose", action="store_true", help="Journalise chaque requête")
+    args = parser.parse_args(argv)
+
+    if not args.no_preload:
+        print("Chargement du modèle Whisper...", file=sys.stderr)
+        get_whisper_model()
+
+    server = create_server(args.host, args.port, args.workers, args.queue_size, args.timeout, args.verbose)
+    print(f"Service disponible sur http://{args.host}:{args.port} "
+          f"({args.workers} workers, file de {args.queue_size})", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.RequestHandlerClass.pool.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
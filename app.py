@@ -1,9 +1,15 @@
 import streamlit as st
-from dream_utils import transcribe_audio, generate_image, analyze_dream, save_dream_entry, load_dream_history
+from dream_utils import transcribe_audio, generate_image, analyze_dream, get_interpretation, save_dream_entry, load_dream_history
+from dream_utils import load_compact_history, load_dreams_at, get_recurring_words
+from dream_storage import DEFAULT_USER, safe_user_id
+from dream_preview import IncrementalAnalyzer
 import os
 from datetime import datetime
 import json
 
+# Rêves affichés par page dans l'historique (seuls ceux-là sont lus en entier)
+HISTORY_PAGE_SIZE = 20
+
 # Configuration de la page
 st.set_page_config(
     page_title="Synthétiseur de Rêves", 
@@ -56,6 +62,18 @@ st.markdown('<h1 class="main-header">🌙 Synthétiseur de Rêves</h1>', unsafe_
 
 # Sidebar pour navigation
 with st.sidebar:
+    st.header("👤 Journal")
+    # Chaque journal est stocké dans sa propre partition
+    user_id = st.text_input("Identifiant du journal :", value=DEFAULT_USER, key="user_id")
+    try:
+        user_id = safe_user_id(user_id)
+    except Exception as e:
+        st.error(str(e))
+        st.stop()
+    # Les rêves anciens sont dans l'archive froide, lue seulement sur demande
+    include_archive = st.checkbox("Inclure les rêves archivés", value=False)
+    
+    st.markdown("---")
     st.header("🎯 Navigation")
     mode = st.radio(
         "Choisissez votre mode :",
@@ -111,9 +129,27 @@ if mode == "📝 Nouveau rêve":
     with col2:
         st.subheader("🎨 Aperçu")
         if dream_text:
-            st.info(f"Mots : {len(dream_text.split())}")
+            # Analyse incrémentale : seule la partie modifiée du texte est réanalysée
+            if "preview_analyzer" not in st.session_state:
+                st.session_state["preview_analyzer"] = IncrementalAnalyzer()
+            preview = st.session_state["preview_analyzer"].update(dream_text)
+            
+            st.info(f"Mots : {preview['word_count']} | Complexité : {preview['complexity_score']}/10")
             st.info(f"Style : {dream_style}")
             st.info(f"Ambiance : {image_mood}")
+            
+            if preview["symbols"]:
+                st.write("**Symboles :**")
+                for symbol in preview["symbols"]:
+                    st.markdown(f'<span class="symbol-tag">{symbol}</span>', unsafe_allow_html=True)
+            
+            if preview["emotions"]:
+                st.write("**Émotions détectées :**")
+                for emotion in preview["emotions"]:
+                    st.markdown(f'<span class="emotion-tag">{emotion}</span>', unsafe_allow_html=True)
+            
+            if preview["themes"]:
+                st.write(f"**Thèmes :** {', '.join(preview['themes'])}")
     
     if st.button("🚀 Analyser et générer", type="primary"):
         if dream_text:
@@ -123,7 +159,7 @@ if mode == "📝 Nouveau rêve":
                 
                 # Génération de l'image avec style
                 enhanced_prompt = f"{dream_text}, style {dream_style}, ambiance {image_mood}"
-                image_path = generate_image(enhanced_prompt)
+                image_path = generate_image(enhanced_prompt, analysis=analysis, style=dream_style, mood=image_mood)
                 
                 # Sauvegarde
                 dream_entry = {
@@ -142,7 +178,7 @@ if mode == "📝 Nouveau rêve":
                     "date": datetime.now().isoformat()
                 }
                 
-                save_dream_entry(dream_entry)
+                save_dream_entry(dream_entry, user_id=user_id)
             
             # Affichage des résultats
             st.success("Rêve analysé avec succès !")
@@ -154,7 +190,7 @@ if mode == "📝 Nouveau rêve":
                 st.write(dream_text)
                 
                 st.subheader("🔍 Analyse psychologique")
-                st.write(analysis.get("interpretation", "Analyse non disponible"))
+                st.write(get_interpretation(analysis) or "Analyse non disponible")
                 
                 if analysis.get("symbols"):
                     st.subheader("🔮 Symboles identifiés")
@@ -179,14 +215,14 @@ elif mode == "🎙️ Rêve vocal":
     audio_file = st.file_uploader("Uploadez votre rêve (WAV/MP3)", type=["wav", "mp3"])
     
     if audio_file:
-        with open("temp_audio.wav", "wb") as f:
-            f.write(audio_file.read())
+        # L'audio reste en mémoire : pas de fichier temporaire partagé entre sessions
+        audio_bytes = audio_file.getvalue()
         
-        st.audio("temp_audio.wav")
+        st.audio(audio_bytes, format=audio_file.type)
         
         if st.button("🔄 Transcrire et analyser"):
             with st.spinner("Transcription en cours..."):
-                texte_reve = transcribe_audio("temp_audio.wav")
+                texte_reve = transcribe_audio(audio_bytes)
             
             st.subheader("📝 Transcription")
             st.write(texte_reve)
@@ -194,7 +230,7 @@ elif mode == "🎙️ Rêve vocal":
             with st.spinner("Analyse et génération..."):
                 analysis = analyze_dream(texte_reve)
                 enhanced_prompt = f"{texte_reve}, style {dream_style}, ambiance {image_mood}"
-                image_path = generate_image(enhanced_prompt)
+                image_path = generate_image(enhanced_prompt, analysis=analysis, style=dream_style, mood=image_mood)
                 
                 # Sauvegarde
                 dream_entry = {
@@ -210,13 +246,13 @@ elif mode == "🎙️ Rêve vocal":
                     "date": datetime.now().isoformat()
                 }
                 
-                save_dream_entry(dream_entry)
+                save_dream_entry(dream_entry, user_id=user_id)
             
             col1, col2 = st.columns(2)
             
             with col1:
                 st.subheader("🔍 Analyse")
-                st.write(analysis.get("interpretation", "Analyse non disponible"))
+                st.write(get_interpretation(analysis) or "Analyse non disponible")
                 
                 if analysis.get("symbols"):
                     st.subheader("🔮 Symboles")
@@ -226,44 +262,54 @@ elif mode == "🎙️ Rêve vocal":
             with col2:
                 st.subheader("🎨 Visualisation")
                 st.image(image_path, caption="Votre rêve visualisé", use_column_width=True)
-        
-        # Nettoyage du fichier temporaire
-        if os.path.exists("temp_audio.wav"):
-            os.remove("temp_audio.wav")
 
 # Historique des rêves
 elif mode == "📚 Historique":
     st.header("📚 Historique de vos rêves")
     
-    history = load_dream_history()
+    # Représentation compacte, en cache tant que le journal ne change pas :
+    # filtres par opérations sur des bitsets
+    compact, locations = load_compact_history(user_id, include_archive=include_archive)
     
-    if history:
+    if len(compact):
+
         # Filtres
         col_filter1, col_filter2, col_filter3 = st.columns(3)
         
         with col_filter1:
-            filter_type = st.selectbox("Type de rêve :", ["Tous"] + list(set([d["metadata"].get("dream_type", "Non spécifié") for d in history])))
+            filter_type = st.selectbox("Type de rêve :", ["Tous"] + compact.values("dream_types"))
         
         with col_filter2:
-            filter_emotion = st.selectbox("Émotion :", ["Toutes"] + list(set([e for d in history for e in d["metadata"].get("emotions", [])])))
+            filter_emotion = st.selectbox("Émotion :", ["Toutes"] + compact.values("emotions"))
         
         with col_filter3:
             sort_by = st.selectbox("Trier par :", ["Date (récent)", "Date (ancien)", "Titre"])
         
         # Filtrage
-        filtered_history = history
-        if filter_type != "Tous":
-            filtered_history = [d for d in filtered_history if d["metadata"].get("dream_type") == filter_type]
-        if filter_emotion != "Toutes":
-            filtered_history = [d for d in filtered_history if filter_emotion in d["metadata"].get("emotions", [])]
+        filtered_indices = compact.filter(
+            dream_type=filter_type if filter_type != "Tous" else None,
+            emotion=filter_emotion if filter_emotion != "Toutes" else None
+        )
+        records = compact.records
         
         # Tri
         if sort_by == "Date (récent)":
-            filtered_history.sort(key=lambda x: x["date"], reverse=True)
+            filtered_indices.sort(key=lambda i: records[i].timestamp, reverse=True)
         elif sort_by == "Date (ancien)":
-            filtered_history.sort(key=lambda x: x["date"])
+            filtered_indices.sort(key=lambda i: records[i].timestamp)
         else:
-            filtered_history.sort(key=lambda x: x["title"])
+            filtered_indices.sort(key=lambda i: records[i].title)
+        
+        # Pagination : seules les entrées de la page sont relues depuis le stockage
+        page_count = max(1, -(-len(filtered_indices) // HISTORY_PAGE_SIZE))
+        page = st.number_input("Page :", min_value=1, max_value=page_count, value=1) if page_count > 1 else 1
+        page_indices = filtered_indices[(page - 1) * HISTORY_PAGE_SIZE:page * HISTORY_PAGE_SIZE]
+        try:
+            filtered_history = load_dreams_at(user_id, [locations[i] for i in page_indices])
+        except Exception as e:
+            # Journal modifié entre-temps : les emplacements seront recalculés au prochain affichage
+            st.error(f"{str(e)} — rechargez la page.")
+            filtered_history = []
         
         # Affichage
         for i, dream in enumerate(filtered_history):
@@ -275,7 +321,7 @@ elif mode == "📚 Historique":
                     st.write(dream["text"])
                     
                     st.write("**Analyse :**")
-                    st.write(dream["analysis"].get("interpretation", "Pas d'analyse"))
+                    st.write(get_interpretation(dream["analysis"]) or "Pas d'analyse")
                     
                     if dream["analysis"].get("symbols"):
                         st.write("**Symboles :**")
@@ -303,57 +349,43 @@ elif mode == "📚 Historique":
 elif mode == "📊 Analyses":
     st.header("📊 Analyses de vos rêves")
     
-    history = load_dream_history()
+    compact, _ = load_compact_history(user_id, include_archive=include_archive)
     
-    if history:
+    if len(compact):
+        records = compact.records
+        
         # Statistiques générales
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("Total des rêves", len(history))
+            st.metric("Total des rêves", len(records))
         
         with col2:
-            avg_quality = sum([d["metadata"].get("sleep_quality", 0) for d in history]) / len(history)
+            avg_quality = sum(r.sleep_quality for r in records) / len(records)
             st.metric("Qualité moyenne", f"{avg_quality:.1f}/10")
         
         with col3:
-            avg_clarity = sum([d["metadata"].get("dream_clarity", 0) for d in history]) / len(history)
+            avg_clarity = sum(r.dream_clarity for r in records) / len(records)
             st.metric("Clarté moyenne", f"{avg_clarity:.1f}/10")
         
         with col4:
-            dream_types = [d["metadata"].get("dream_type", "Normal") for d in history]
-            most_common = max(set(dream_types), key=dream_types.count) if dream_types else "Aucun"
+            type_counts = compact.counts("dream_types")
+            most_common = max(type_counts, key=type_counts.get) if type_counts else "Aucun"
             st.metric("Type le plus fréquent", most_common)
         
         # Graphiques
         st.subheader("📈 Tendances")
         
         # Émotions les plus fréquentes
-        all_emotions = [e for d in history for e in d["metadata"].get("emotions", [])]
-        if all_emotions:
-            emotion_counts = {}
-            for emotion in all_emotions:
-                emotion_counts[emotion] = emotion_counts.get(emotion, 0) + 1
-            
+        emotion_counts = compact.counts("emotions")
+        if emotion_counts:
             st.bar_chart(emotion_counts)
         
-        # Mots-clés les plus fréquents
+        # Mots-clés les plus fréquents (top 10, en cache comme l'historique compact)
         st.subheader("🔤 Mots-clés récurrents")
-        all_text = " ".join([d["text"] for d in history])
-        words = all_text.lower().split()
-        # Filtrer les mots courants
-        common_words = {"le", "la", "les", "de", "des", "du", "un", "une", "et", "ou", "mais", "donc", "car", "ni", "je", "tu", "il", "elle", "nous", "vous", "ils", "elles", "que", "qui", "dont", "où", "dans", "sur", "avec", "sans", "pour", "par", "à", "au", "aux", "ce", "cette", "ces", "mon", "ma", "mes", "ton", "ta", "tes", "son", "sa", "ses", "notre", "votre", "leur", "leurs"}
-        filtered_words = [w for w in words if len(w) > 3 and w not in common_words]
+        word_dict = get_recurring_words(user_id, include_archive=include_archive)
         
-        if filtered_words:
-            word_counts = {}
-            for word in filtered_words:
-                word_counts[word] = word_counts.get(word, 0) + 1
-            
-            # Top 10 des mots
-            sorted_words = sorted(word_counts.items(), key=lambda x: x[1], reverse=True)[:10]
-            word_dict = dict(sorted_words)
-            
+        if word_dict:
             st.bar_chart(word_dict)
     else:
         st.info("Pas assez de données pour générer des analyses.")
@@ -362,7 +394,7 @@ elif mode == "📊 Analyses":
 elif mode == "🎨 Galerie":
     st.header("🎨 Galerie de vos rêves")
     
-    history = load_dream_history()
+    history = load_dream_history(user_id, include_archive=include_archive)
     
     if history:
         # Grille d'images
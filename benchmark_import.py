@@ -0,0 +1,98 @@
+"""Benchmark du temps d'import à froid de l'interface, du stockage et de l'analyse.
+
+Mesure le temps d'import via `python -X importtime` dans un processus neuf et
+échoue (code de sortie 1) si le temps médian dépasse le budget ou si l'une des
+piles lourdes (Whisper, torch, numpy, requests, dotenv, Pillow) est chargée à
+l'import.
+
+Exemple :
+    python benchmark_import.py --budget-ms 50 --runs 7
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+from typing import Dict, List, Any
+
+# Modules importés par l'interface au démarrage
+DEFAULT_MODULES = [
+    "dream_utils", "dream_analysis", "dream_storage", "dream_records", "dream_rollups", "dream_media",
+    "dream_preview", "dream_archive", "dream_backup", "dream_locks"
+]
+
+# Piles qui ne doivent se charger qu'à la première transcription ou génération d'image
+FORBIDDEN_MODULES = ["whisper", "torch", "numpy", "requests", "dotenv", "PIL"]
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)$")
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Analyse la sortie de -X importtime : temps propre, cumulé, profondeur, module"""
+    entries = []
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append({
+                "module": module,
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": (len(indent) - 1) // 2
+            })
+    return entries
+
+def measure(modules: List[str]) -> Dict[str, Any]:
+    """Importe les modules dans un processus neuf et mesure le coût total"""
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {', '.join(modules)}"],
+        cwd=repo_dir, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise Exception(f"Import impossible : {result.stderr.strip().splitlines()[-1]}")
+
+    entries = parse_importtime(result.stderr)
+
+    # Les imports de premier niveau de nos modules incluent tout ce qu'ils chargent
+    total_us = sum(e["cumulative_us"] for e in entries if e["depth"] == 0 and e["module"] in modules)
+    loaded = {e["module"].split(".")[0] for e in entries}
+
+    return {
+        "total_ms": total_us / 1000,
+        "heavy_modules": sorted(m for m in FORBIDDEN_MODULES if m in loaded),
+        "slowest": sorted(entries, key=lambda e: e["self_us"], reverse=True)[:10]
+    }
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark du temps d'import à froid")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES)
+    parser.add_argument("--budget-ms", type=float, default=50.0, help="Budget du temps d'import médian")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    runs = [measure(args.modules) for _ in range(args.runs)]
+    median_ms = statistics.median(run["total_ms"] for run in runs)
+    heavy = sorted({module for run in runs for module in run["heavy_modules"]})
+
+    print(f"Import de {', '.join(args.modules)} : médiane {median_ms:.1f} ms sur {args.runs} essais "
+          f"(budget {args.budget_ms:.0f} ms)")
+    print("Modules les plus lents (temps propre) :")
+    for entry in runs[-1]["slowest"]:
+        print(f"  {entry['self_us'] / 1000:7.2f} ms  {entry['module']}")
+
+    failed = False
+    if heavy:
+        print(f"❌ Piles lourdes chargées à l'import : {', '.join(heavy)}")
+        failed = True
+    if median_ms > args.budget_ms:
+        print(f"❌ Budget dépassé : {median_ms:.1f} ms > {args.budget_ms:.0f} ms")
+        failed = True
+    if not failed:
+        print("✅ Démarrage à froid dans le budget")
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""Benchmark des profils d'inférence Whisper sur un jeu d'audios locaux.
+
+Pour chaque profil, mesure le facteur temps réel (RTF = temps de calcul / durée
+de l'audio) et l'accord mot à mot avec la transcription de référence fp32.
+
+Exemple :
+    python benchmark_whisper.py fixtures/audio --model base --profiles fp32 int8 --threads 4
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, List, Any
+
+import dream_transcription
+from dream_transcription import AUDIO_SAMPLE_RATE, WHISPER_PROFILES, decode_audio, get_whisper_model, read_audio_bytes, run_whisper
+
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".ogg", ".flac", ".webm")
+
+def list_fixtures(fixtures_dir: str) -> List[str]:
+    """Liste les fichiers audio du répertoire de fixtures"""
+    files = [
+        os.path.join(fixtures_dir, name)
+        for name in sorted(os.listdir(fixtures_dir))
+        if name.lower().endswith(AUDIO_EXTENSIONS)
+    ]
+    if not files:
+        raise Exception(f"Aucun fichier audio trouvé dans {fixtures_dir}")
+    return files
+
+def normalize_words(text: str) -> List[str]:
+    """Découpe une transcription en mots normalisés (minuscules, sans ponctuation)"""
+    return re.findall(r"[\w']+", text.lower())
+
+def word_agreement(reference: str, candidate: str) -> float:
+    """Accord mot à mot entre deux transcriptions (1 - taux d'erreur de mots)"""
+    ref_words = normalize_words(reference)
+    cand_words = normalize_words(candidate)
+
+    if not ref_words:
+        return 1.0 if not cand_words else 0.0
+
+    # Distance d'édition sur les mots, une ligne à la fois
+    previous = list(range(len(cand_words) + 1))
+    for i, ref_word in enumerate(ref_words, start=1):
+        current = [i] + [0] * len(cand_words)
+        for j, cand_word in enumerate(cand_words, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != cand_word)
+            )
+        previous = current
+
+    return max(0.0, 1.0 - previous[-1] / len(ref_words))
+
+def benchmark_profile(model_name: str, profile: str, fixtures: Dict[str, Any], language: str) -> Dict[str, Any]:
+    """Transcrit toutes les fixtures avec un profil et mesure les temps"""
+
+    start = time.perf_counter()
+    get_whisper_model(model_name, profile)
+    load_seconds = time.perf_counter() - start
+
+    # Première passe à vide pour exclure les allocations initiales des mesures
+    first_samples = next(iter(fixtures.values()))
+    run_whisper(first_samples[:AUDIO_SAMPLE_RATE], language=language, model_name=model_name, profile=profile)
+
+    files = {}
+    for path, samples in fixtures.items():
+        start = time.perf_counter()
+        text = run_whisper(samples, language=language, model_name=model_name, profile=profile)
+        elapsed = time.perf_counter() - start
+
+        duration = len(samples) / AUDIO_SAMPLE_RATE
+        files[path] = {
+            "text": text,
+            "audio_seconds": duration,
+            "compute_seconds": elapsed,
+            "rtf": elapsed / duration if duration else 0
+        }
+
+    total_audio = sum(f["audio_seconds"] for f in files.values())
+    total_compute = sum(f["compute_seconds"] for f in files.values())
+
+    return {
+        "profile": profile,
+        "load_seconds": load_seconds,
+        "audio_seconds": total_audio,
+        "compute_seconds": total_compute,
+        "rtf": total_compute / total_audio if total_audio else 0,
+        "files": files
+    }
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark des profils d'inférence Whisper")
+    parser.add_argument("fixtures_dir", help="Répertoire contenant les audios de test")
+    parser.add_argument("--model", default=dream_transcription.WHISPER_MODEL_NAME, help="Taille du modèle Whisper")
+    parser.add_argument("--profiles", nargs="+", default=list(WHISPER_PROFILES), choices=WHISPER_PROFILES)
+    parser.add_argument("--threads", type=int, default=dream_transcription.WHISPER_THREADS, help="Threads intra-op de torch (0 = défaut)")
+    parser.add_argument("--language", default="fr")
+    parser.add_argument("--json", dest="json_output", help="Écrit le rapport détaillé dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    dream_transcription.WHISPER_THREADS = args.threads
+
+    # Décodage unique des fixtures, hors des mesures
+    fixtures = {path: decode_audio(read_audio_bytes(path)) for path in list_fixtures(args.fixtures_dir)}
+
+    # La référence fp32 est toujours calculée en premier
+    profiles = ["fp32"] + [p for p in args.profiles if p != "fp32"]
+    results = [benchmark_profile(args.model, profile, fixtures, args.language) for profile in profiles]
+
+    baseline = results[0]["files"]
+    for result in results:
+        agreements = [
+            word_agreement(baseline[path]["text"], item["text"])
+            for path, item in result["files"].items()
+        ]
+        result["word_agreement"] = sum(agreements) / len(agreements)
+
+    print(f"Modèle : {args.model} | threads : {args.threads or 'défaut'} | fixtures : {len(fixtures)} "
+          f"({results[0]['audio_seconds']:.1f} s d'audio)")
+    print(f"{'Profil':<8} {'Chargement (s)':>15} {'Calcul (s)':>11} {'RTF':>7} {'Accord / fp32':>14}")
+    for result in results:
+        if result["profile"] not in args.profiles:
+            continue
+        print(f"{result['profile']:<8} {result['load_seconds']:>15.2f} {result['compute_seconds']:>11.2f} "
+              f"{result['rtf']:>7.3f} {result['word_agreement']:>13.1%}")
+
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as f:
+            json.dump({"model": args.model, "threads": args.threads, "results": results}, f, ensure_ascii=False, indent=2)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
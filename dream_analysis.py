@@ -0,0 +1,362 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Any, Optional
+
+# Dictionnaire étendu des symboles de rêve
+DREAM_SYMBOLS = {
+    "eau": "émotions, inconscient, purification, fluidité",
+    "feu": "passion, transformation, énergie, destruction créatrice",
+    "voler": "liberté, évasion, aspiration, dépassement de soi",
+    "chute": "perte de contrôle, anxiété, peur de l'échec",
+    "animal": "instincts, nature primitive, aspects refoulés",
+    "maison": "soi, psyché, sécurité, intimité",
+    "mort": "transformation, fin d'un cycle, renaissance",
+    "enfant": "innocence, nouveau départ, potentiel",
+    "serpent": "transformation, sagesse cachée, guérison",
+    "chat": "indépendance, mystère, intuition féminine",
+    "chien": "loyauté, amitié, protection, fidélité",
+    "arbre": "croissance, stabilité, connexion terre-ciel",
+    "montagne": "défi, objectif, élévation spirituelle",
+    "océan": "inconscient collectif, immensité, émotions profondes",
+    "lumière": "connaissance, espoir, révélation, clarté",
+    "obscurité": "inconnu, peur, mystère, potentiel caché",
+    "pont": "transition, connexion, passage",
+    "escalier": "progression, évolution, ascension",
+    "miroir": "introspection, vérité, conscience de soi",
+    "clé": "solution, accès, révélation, pouvoir",
+    "porte": "opportunité, passage, choix, seuil",
+    "voiture": "contrôle, direction de vie, autonomie",
+    "avion": "ambitions élevées, perspective, voyage spirituel",
+    "école": "apprentissage, évaluation, retour au passé",
+    "hôpital": "guérison, vulnérabilité, besoin de soins",
+    "nourriture": "besoins fondamentaux, nourriture spirituelle",
+    "argent": "valeur personnelle, sécurité, pouvoir",
+    "bijoux": "valeur cachée, beauté intérieure, préciosité",
+    "livre": "connaissance, sagesse, recherche de vérité",
+    "téléphone": "communication, besoin de connexion",
+    "bébé": "nouveau projet, vulnérabilité, responsabilité"
+}
+
+# Émotions détectées et mots qui les expriment
+EMOTION_WORDS = {
+    "peur": ["peur", "effrayé", "terrifié", "anxieux", "angoissé", "inquiet", "paniqué"],
+    "joie": ["heureux", "joyeux", "content", "ravi", "euphorie", "délice", "bonheur"],
+    "tristesse": ["triste", "mélancolique", "déprimé", "chagrin", "peine", "mélancolie"],
+    "colère": ["colère", "furieux", "irrité", "rage", "énervé", "agacé", "indigné"],
+    "surprise": ["surpris", "étonné", "choqué", "stupéfait", "sidéré", "ébahi"],
+    "sérénité": ["calme", "paisible", "serein", "tranquille", "apaisé", "zen"],
+    "amour": ["amour", "tendresse", "affection", "passion", "attachement"],
+    "nostalgie": ["nostalgie", "mélancolie", "regret", "souvenir", "passé"],
+    "confusion": ["confus", "perdu", "déboussolé", "désorienté", "trouble"],
+    "excitation": ["excité", "stimulé", "enthousiaste", "fébrile", "survolté"]
+}
+
+# Thèmes déduits des symboles, puis des mots du récit (dans cet ordre)
+THEME_SYMBOLS = {
+    "Transformation": ["mort", "serpent", "feu", "eau", "papillon"],
+    "Liberté": ["voler", "oiseau", "ciel", "montagne"],
+    "Sécurité": ["maison", "famille", "enfant", "cocon"]
+}
+THEME_WORDS = {
+    "Vie professionnelle": ["travail", "bureau", "collègue", "patron"],
+    "Relations amoureuses": ["amour", "couple", "mariage", "baiser"],
+    "Apprentissage": ["école", "examen", "étude", "apprendre"],
+    "Voyage/Quête": ["voyage", "partir", "route", "destination"],
+    "Passé/Mémoire": ["passé", "enfance", "souvenir", "nostalgie"]
+}
+
+# Mots qui augmentent le score de complexité
+COMPLEX_WORDS = ["transformation", "métamorphose", "symbolique", "mystérieux", "surréaliste"]
+
+def analyze_dream(dream_text: str) -> Dict[str, Any]:
+    """Analyse un rêve et retourne une interprétation complète"""
+    
+    # Analyse des symboles présents
+    symbols_found = []
+    dream_lower = dream_text.lower()
+    
+    for symbol, meaning in DREAM_SYMBOLS.items():
+        if symbol in dream_lower:
+            symbols_found.append(symbol)
+    
+    # Analyse des émotions étendues
+    emotions_detected = []
+    for emotion, words in EMOTION_WORDS.items():
+        if any(word in dream_lower for word in words):
+            emotions_detected.append(emotion)
+    
+    # Interprétation stockée sous forme de modèles, rendue à l'affichage (get_interpretation)
+    interpretation_refs = build_interpretation_refs(dream_text, symbols_found, emotions_detected)
+    
+    return {
+        "interpretation_refs": interpretation_refs,
+        "symbols": symbols_found,
+        "emotions": emotions_detected,
+        "word_count": len(dream_text.split()),
+        "complexity_score": calculate_complexity_score(dream_text),
+        "themes": identify_dream_themes(dream_text, symbols_found),
+        "psychological_insights": generate_psychological_insights(symbols_found, emotions_detected)
+    }
+
+# Modèles de l'interprétation : une analyse ne stocke que la liste de leurs
+# identifiants (interpretation_refs) ; le texte est produit à l'affichage.
+# {symbols} et {emotions} sont remplacés par les listes de l'analyse.
+INTERPRETATION_TEMPLATES = {
+    "intro.fear": "Votre rêve semble refléter des préoccupations ou anxiétés actuelles.",
+    "intro.joy": "Ce rêve révèle un état d'esprit positif et optimiste.",
+    "intro.sadness": "Votre rêve exprime peut-être un besoin de guérison émotionnelle.",
+    "intro.emotions": "Votre rêve révèle une riche palette d'émotions à explorer.",
+    "intro.default": "Votre rêve offre des insights fascinants sur votre monde intérieur.",
+    "symbols.list": "\n🔮 **Symboles identifiés** : {symbols}",
+    "symbol.eau": "• L'eau représente vos émotions profondes et votre capacité d'adaptation. Elle peut indiquer un besoin de purification ou de renouveau émotionnel.",
+    "symbol.voler": "• Le vol symbolise votre désir de liberté et d'évasion. Vous aspirez peut-être à dépasser vos limitations actuelles.",
+    "symbol.maison": "• La maison reflète votre état psychologique intime. Elle peut révéler comment vous vous sentez en sécurité ou non dans votre vie.",
+    "symbol.animal": "• Les animaux dans vos rêves représentent vos instincts naturels et vos aspects les plus authentiques.",
+    "symbol.mort": "• La mort symbolise une transformation profonde, la fin d'une période et le début d'une nouvelle phase de vie.",
+    "symbol.lumière": "• La lumière représente la connaissance, l'espoir et la clarté qui émergent dans votre conscience.",
+    "symbol.obscurité": "• L'obscurité peut symboliser l'inconnu qui vous intrigue ou des aspects de vous-même à explorer.",
+    "emotions.list": "\n💭 **Climat émotionnel** : {emotions}",
+    "emotions.fear_joy": "• Le mélange de peur et de joie suggère une période de transition où excitation et appréhension coexistent.",
+    "emotions.fear": "• La peur présente peut refléter des anxiétés actuelles ou anticiper des défis à venir.",
+    "emotions.joy": "• Les sentiments positifs indiquent un alignement avec vos valeurs profondes et vos aspirations.",
+    "emotions.sadness": "• La tristesse peut signaler un besoin de guérison ou d'acceptation d'une perte.",
+    "emotions.serenity": "• La sérénité suggère que vous trouvez un équilibre intérieur malgré les défis.",
+    "pattern.movement": "\n🏃 **Dynamique de mouvement** : Le thème de la course ou de la fuite suggère un désir d'échapper à une situation ou au contraire de poursuivre un objectif.",
+    "pattern.fall": "\n⬇️ **Dynamique de chute** : La chute peut représenter une perte de contrôle ou la peur d'échouer dans un domaine important.",
+    "pattern.family": "\n👨‍👩‍👧‍👦 **Dimension familiale** : La présence de la famille suggère des questions liées à vos racines, votre identité ou vos relations proches.",
+    "pattern.relationship": "\n💕 **Dimension relationnelle** : Les relations dans votre rêve reflètent vos besoins de connexion et d'intimité.",
+    "advice.header": "\n✨ **Perspectives** :",
+    "advice.introspection": "• Votre rêve suggère une période propice à l'introspection et à la guérison émotionnelle.",
+    "advice.risks": "• C'est peut-être le moment d'oser prendre des risques créatifs ou professionnels.",
+    "advice.safety": "• Explorez ce qui vous fait vous sentir en sécurité ou vulnérable dans votre environnement actuel.",
+    "advice.explore": "• Considérez ce rêve comme une invitation à explorer les aspects de votre vie qu'il met en lumière.",
+    "advice.journal": "• Gardez un journal de vos rêves pour identifier des patterns récurrents.",
+    "advice.meditate": "• Méditez sur les émotions ressenties pour mieux comprendre leurs messages."
+}
+
+# Nombre d'interprétations rendues gardées en mémoire
+INTERPRETATION_CACHE_SIZE = 1024
+
+def build_interpretation_refs(dream_text: str, symbols: List[str], emotions: List[str]) -> List[str]:
+    """Choisit les modèles de l'interprétation du rêve (identifiants de INTERPRETATION_TEMPLATES)"""
+    
+    refs = []
+    
+    # Introduction personnalisée
+    if emotions:
+        dominant_emotion = emotions[0]
+        if dominant_emotion == "peur":
+            refs.append("intro.fear")
+        elif dominant_emotion == "joie":
+            refs.append("intro.joy")
+        elif dominant_emotion == "tristesse":
+            refs.append("intro.sadness")
+        else:
+            refs.append("intro.emotions")
+    else:
+        refs.append("intro.default")
+    
+    # Analyse approfondie des symboles
+    if symbols:
+        refs.append("symbols.list")
+        
+        # Analyse spécifique par symbole
+        for symbol in symbols[:3]:  # Limiter aux 3 premiers pour éviter la surcharge
+            if f"symbol.{symbol}" in INTERPRETATION_TEMPLATES:
+                refs.append(f"symbol.{symbol}")
+    
+    # Analyse des émotions
+    if emotions:
+        refs.append("emotions.list")
+        
+        if "peur" in emotions and "joie" in emotions:
+            refs.append("emotions.fear_joy")
+        elif "peur" in emotions:
+            refs.append("emotions.fear")
+        elif "joie" in emotions:
+            refs.append("emotions.joy")
+        elif "tristesse" in emotions:
+            refs.append("emotions.sadness")
+        
+        if "sérénité" in emotions:
+            refs.append("emotions.serenity")
+    
+    # Analyse des patterns narratifs
+    dream_lower = dream_text.lower()
+    
+    # Analyse du mouvement dans le rêve
+    if any(word in dream_lower for word in ["course", "courir", "fuite", "poursuivre"]):
+        refs.append("pattern.movement")
+    
+    if any(word in dream_lower for word in ["chute", "tomber", "glisser"]):
+        refs.append("pattern.fall")
+    
+    # Analyse des relations dans le rêve
+    if any(word in dream_lower for word in ["famille", "mère", "père", "enfant", "frère", "sœur"]):
+        refs.append("pattern.family")
+    
+    if any(word in dream_lower for word in ["ami", "amour", "couple", "partenaire"]):
+        refs.append("pattern.relationship")
+    
+    # Conseils et perspectives
+    refs.append("advice.header")
+    
+    if symbols and emotions:
+        if "eau" in symbols and "sérénité" in emotions:
+            refs.append("advice.introspection")
+        elif "voler" in symbols and "joie" in emotions:
+            refs.append("advice.risks")
+        elif "maison" in symbols and "peur" in emotions:
+            refs.append("advice.safety")
+        else:
+            refs.append("advice.explore")
+    
+    refs.append("advice.journal")
+    refs.append("advice.meditate")
+    
+    return refs
+
+def render_interpretation(refs: List[str], symbols: List[str], emotions: List[str]) -> str:
+    """Produit le texte d'une interprétation à partir de ses identifiants de modèles"""
+    params = {"symbols": ", ".join(symbols), "emotions": ", ".join(emotions)}
+    return "\n".join(INTERPRETATION_TEMPLATES[ref].format(**params) for ref in refs)
+
+@lru_cache(maxsize=INTERPRETATION_CACHE_SIZE)
+def _render_cached(refs: tuple, symbols: tuple, emotions: tuple) -> str:
+    return render_interpretation(list(refs), list(symbols), list(emotions))
+
+def get_interpretation(analysis: Dict[str, Any]) -> str:
+    """Texte de l'interprétation d'une analyse (rendu une fois puis mis en cache)
+
+    Les analyses antérieures au stockage par modèles gardent leur texte
+    d'origine dans "interpretation", renvoyé tel quel.
+    """
+    if "interpretation" in analysis:
+        return analysis["interpretation"]
+    refs = analysis.get("interpretation_refs")
+    if not refs:
+        return ""
+    return _render_cached(tuple(refs), tuple(analysis.get("symbols", [])), tuple(analysis.get("emotions", [])))
+
+def parse_interpretation(interpretation: str, symbols: List[str], emotions: List[str]) -> Optional[List[str]]:
+    """Retrouve les identifiants de modèles d'une interprétation textuelle
+
+    Retourne None si le texte ne se re-rend pas à l'identique (texte modifié,
+    modèles changés depuis) : il faut alors conserver le texte brut.
+    """
+    params = {"symbols": ", ".join(symbols), "emotions": ", ".join(emotions)}
+    rendered_to_ref = {template.format(**params): ref for ref, template in INTERPRETATION_TEMPLATES.items()}
+    
+    # Les parties sont jointes par "\n" et certaines commencent elles-mêmes par "\n"
+    refs = []
+    lines = interpretation.split("\n")
+    i = 0
+    while i < len(lines):
+        part = lines[i]
+        if part == "" and i + 1 < len(lines):
+            i += 1
+            part = "\n" + lines[i]
+        ref = rendered_to_ref.get(part)
+        if ref is None:
+            return None
+        refs.append(ref)
+        i += 1
+    
+    if render_interpretation(refs, symbols, emotions) != interpretation:
+        return None
+    return refs
+
+def migrate_analysis(analysis: Dict[str, Any]) -> bool:
+    """Remplace, en place, le texte d'interprétation d'une analyse par ses identifiants de modèles
+
+    Sans perte : le texte n'est retiré que s'il se re-rend à l'identique.
+    Retourne True si l'analyse a été modifiée.
+    """
+    if "interpretation" not in analysis or "interpretation_refs" in analysis:
+        return False
+    refs = parse_interpretation(analysis["interpretation"], analysis.get("symbols", []), analysis.get("emotions", []))
+    if refs is None:
+        return False
+    del analysis["interpretation"]
+    analysis["interpretation_refs"] = refs
+    return True
+
+def generate_comprehensive_interpretation(dream_text: str, symbols: List[str], emotions: List[str]) -> str:
+    """Génère une interprétation complète et riche du rêve"""
+    return render_interpretation(build_interpretation_refs(dream_text, symbols, emotions), symbols, emotions)
+
+def identify_dream_themes(dream_text: str, symbols: List[str]) -> List[str]:
+    """Identifie les thèmes principaux du rêve"""
+    
+    themes = []
+    dream_lower = dream_text.lower()
+    
+    # Thèmes basés sur les symboles
+    for theme, theme_symbols in THEME_SYMBOLS.items():
+        if any(symbol in symbols for symbol in theme_symbols):
+            themes.append(theme)
+    
+    # Thèmes basés sur le contenu textuel
+    for theme, words in THEME_WORDS.items():
+        if any(word in dream_lower for word in words):
+            themes.append(theme)
+    
+    return themes
+
+def generate_psychological_insights(symbols: List[str], emotions: List[str]) -> List[str]:
+    """Génère des insights psychologiques basés sur les symboles et émotions"""
+    
+    insights = []
+    
+    # Insights basés sur les combinaisons symboles/émotions
+    if "eau" in symbols and "peur" in emotions:
+        insights.append("Possible anxiété face à vos émotions profondes")
+    
+    if "voler" in symbols and "joie" in emotions:
+        insights.append("Forte aspiration à la liberté et à l'accomplissement")
+    
+    if "maison" in symbols and "sérénité" in emotions:
+        insights.append("Sentiment de sécurité intérieure bien établi")
+    
+    if "mort" in symbols and "tristesse" in emotions:
+        insights.append("Processus de deuil ou acceptation d'un changement")
+    
+    # Insights basés sur les émotions multiples
+    if len(emotions) > 2:
+        insights.append("Richesse émotionnelle complexe nécessitant de l'attention")
+    
+    if "peur" in emotions and "joie" in emotions:
+        insights.append("Ambivalence face à une situation de changement")
+    
+    # Insights basés sur les symboles
+    if len(symbols) > 3:
+        insights.append("Rêve riche en symboles indiquant une période de transformation")
+    
+    if "lumière" in symbols and "obscurité" in symbols:
+        insights.append("Processus d'intégration entre conscient et inconscient")
+    
+    return insights
+
+def calculate_complexity_score(dream_text: str) -> float:
+    """Calcule un score de complexité du rêve"""
+    
+    # Facteurs de complexité
+    word_count = len(dream_text.split())
+    sentence_count = len(re.split(r'[.!?]+', dream_text))
+    
+    # Présence de mots complexes
+    dream_lower = dream_text.lower()
+    complex_word_count = sum(1 for word in COMPLEX_WORDS if word in dream_lower)
+    
+    return complexity_from_counts(word_count, sentence_count, complex_word_count)
+
+def complexity_from_counts(word_count: int, sentence_count: int, complex_word_count: int) -> float:
+    """Score de complexité sur 10 à partir des comptes de mots, de phrases et de mots complexes"""
+    
+    # Score basé sur différents critères
+    length_score = min(word_count / 100, 1.0)  # Normalisé sur 100 mots
+    structure_score = min(sentence_count / 10, 1.0)  # Normalisé sur 10 phrases
+    complexity_word_score = min(complex_word_count / 5, 1.0)  # Normalisé sur 5 mots complexes
+    
+    final_score = (length_score + structure_score + complexity_word_score) / 3
+    return round(final_score * 10, 1)  # Score sur 10
@@ -0,0 +1,241 @@
+import os
+import json
+import gzip
+import threading
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+import dream_storage
+
+# Archive froide : les rêves plus anciens que la fenêtre chaude (DREAM_HOT_DAYS)
+# quittent les partitions JSON pour un fichier compressé par mois, dans
+# dreams_data/<utilisateur>/cold/<AAAA-MM>.json.zst (ou .json.gz sans zstandard).
+# Les partitions chaudes restent seules lues par défaut ; l'archive n'est
+# décompressée qu'à la demande, mois par mois.
+COLD_DIRNAME = "cold"
+COLD_MANIFEST = "manifest.json"
+
+# Fenêtre chaude par défaut, en jours
+HOT_DAYS = 365
+
+# Compression : zstd si le module zstandard est installé (DREAM_COLD_CODEC=gzip pour forcer gzip)
+ZSTD_LEVEL = 19
+GZIP_LEVEL = 9
+CODEC_EXTENSIONS = ("zst", "gz")
+
+_archive_lock = threading.RLock()
+
+def _zstandard():
+    """Module zstandard, ou None s'il n'est pas installé"""
+    try:
+        import zstandard
+        return zstandard
+    except ImportError:
+        return None
+
+def cold_codec() -> str:
+    """Extension du format de compression utilisé pour les nouvelles écritures"""
+    if os.getenv("DREAM_COLD_CODEC", "zstd") == "zstd" and _zstandard() is not None:
+        return "zst"
+    return "gz"
+
+def _compress(data: bytes, codec: str) -> bytes:
+    if codec == "zst":
+        return _zstandard().ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+def _decompress(data: bytes, codec: str) -> bytes:
+    if codec == "zst":
+        zstandard = _zstandard()
+        if zstandard is None:
+            raise Exception("Le module zstandard est requis pour lire cette archive")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+def hot_cutoff(hot_days: int = None) -> datetime:
+    """Date avant laquelle un rêve appartient à l'archive froide"""
+    if hot_days is None:
+        hot_days = int(os.getenv("DREAM_HOT_DAYS", HOT_DAYS))
+    return datetime.now() - timedelta(days=hot_days)
+
+def split_tiers(history: List[Dict[str, Any]], cutoff: datetime) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Sépare un historique en rêves chauds et rêves à archiver"""
+    hot, cold = [], []
+    for dream in history:
+        (cold if datetime.fromisoformat(dream["date"]) < cutoff else hot).append(dream)
+    return hot, cold
+
+def cold_dir(user_id: Optional[str]) -> str:
+    """Répertoire de l'archive froide d'un utilisateur"""
+    return dream_storage.user_file(user_id, COLD_DIRNAME)
+
+def _month_file(user_id: Optional[str], month: str, codec: str) -> str:
+    return os.path.join(cold_dir(user_id), f"{month}.json.{codec}")
+
+def load_manifest(user_id: Optional[str]) -> Dict[str, Any]:
+    """Manifeste de l'archive : date limite d'archivage et nombre de rêves par mois"""
+    path = os.path.join(cold_dir(user_id), COLD_MANIFEST)
+    if not os.path.exists(path):
+        return {"cutoff": None, "months": {}}
+
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _save_manifest(user_id: Optional[str], manifest: Dict[str, Any]):
+    directory = cold_dir(user_id)
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, COLD_MANIFEST)
+    temp_file = f"{path}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_file, path)
+
+def archive_signature(user_id: Optional[str]) -> Optional[Tuple]:
+    """Empreinte du manifeste (réécrit à chaque modification de l'archive), None sans archive"""
+    try:
+        stat = os.stat(os.path.join(cold_dir(user_id), COLD_MANIFEST))
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+def list_cold_months(user_id: Optional[str], start: date = None, end: date = None) -> List[str]:
+    """Mois archivés d'un utilisateur (élagués selon la plage), dans l'ordre chronologique"""
+    manifest = load_manifest(user_id)
+
+    # Tout rêve archivé est antérieur à la date limite : une plage qui
+    # commence après son jour ne touche pas l'archive
+    if start is not None and manifest["cutoff"] and start.isoformat() > manifest["cutoff"][:10]:
+        return []
+
+    return [
+        month for month in sorted(manifest["months"])
+        if (start is None or month >= start.isoformat()[:7]) and (end is None or month <= end.isoformat()[:7])
+    ]
+
+def read_cold_month_bytes(user_id: Optional[str], month: str) -> bytes:
+    """Contenu JSON décompressé (UTF-8) d'un mois archivé (vide s'il n'existe pas)"""
+    for codec in CODEC_EXTENSIONS:
+        path = _month_file(user_id, month, codec)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                return _decompress(f.read(), codec)
+    return b""
+
+def load_cold_month(user_id: Optional[str], month: str) -> List[Dict[str, Any]]:
+    """Décompresse les rêves archivés d'un mois (liste vide s'il n'y en a pas)"""
+    data = read_cold_month_bytes(user_id, month)
+    return json.loads(data) if data else []
+
+def _write_cold_month(user_id: Optional[str], month: str, entries: List[Dict[str, Any]]) -> int:
+    """Réécrit un mois archivé de manière atomique et retourne sa taille compressée"""
+    codec = cold_codec()
+    path = _month_file(user_id, month, codec)
+    size = 0
+
+    if entries:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = _compress(json.dumps(entries, ensure_ascii=False, separators=(",", ":")).encode('utf-8'), codec)
+        temp_file = f"{path}.tmp"
+        with open(temp_file, 'wb') as f:
+            f.write(data)
+        os.replace(temp_file, path)
+        size = len(data)
+
+    # Un mois n'existe que dans un format à la fois
+    for other in CODEC_EXTENSIONS:
+        other_path = _month_file(user_id, month, other)
+        if (other != codec or not entries) and os.path.exists(other_path):
+            os.remove(other_path)
+    return size
+
+def iter_cold_history(user_id: Optional[str], start: date = None, end: date = None) -> Iterator[Dict[str, Any]]:
+    """Parcourt les rêves archivés, en ne décompressant chaque mois qu'au moment de le lire"""
+    for month in list_cold_months(user_id, start, end):
+        for dream in load_cold_month(user_id, month):
+            dream_day = datetime.fromisoformat(dream["date"]).date()
+            if (start is None or dream_day >= start) and (end is None or dream_day <= end):
+                yield dream
+
+def _group_by_month(entries: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    grouped = {}
+    for entry in entries:
+        grouped.setdefault(entry["date"][:7], []).append(entry)
+    return grouped
+
+def archive_entries(user_id: Optional[str], entries: List[Dict[str, Any]], cutoff: datetime):
+    """Ajoute des rêves à l'archive froide (seuls les mois concernés sont réécrits)"""
+    with _archive_lock:
+        manifest = load_manifest(user_id)
+
+        for month, new_entries in _group_by_month(entries).items():
+            # Même identité que dream_storage.remove_entry : une entrée réarchivée remplace l'ancienne
+            merged = {(d.get("date"), d.get("text")): d for d in load_cold_month(user_id, month)}
+            for entry in new_entries:
+                merged[(entry.get("date"), entry.get("text"))] = entry
+            month_entries = sorted(merged.values(), key=lambda d: d["date"])
+
+            size = _write_cold_month(user_id, month, month_entries)
+            manifest["months"][month] = {"count": len(month_entries), "bytes": size}
+
+        if manifest["cutoff"] is None or cutoff.isoformat() > manifest["cutoff"]:
+            manifest["cutoff"] = cutoff.isoformat()
+        _save_manifest(user_id, manifest)
+
+def replace_cold_history(user_id: Optional[str], history: List[Dict[str, Any]]):
+    """Réécrit entièrement l'archive d'un utilisateur (restaurations) en gardant sa date limite"""
+    with _archive_lock:
+        manifest = load_manifest(user_id)
+        grouped = _group_by_month(history)
+
+        for month in list(manifest["months"]):
+            if month not in grouped:
+                _write_cold_month(user_id, month, [])
+                del manifest["months"][month]
+        for month, entries in grouped.items():
+            entries = sorted(entries, key=lambda d: d["date"])
+            manifest["months"][month] = {"count": len(entries), "bytes": _write_cold_month(user_id, month, entries)}
+
+        if manifest["months"] or manifest["cutoff"]:
+            _save_manifest(user_id, manifest)
+
+def get_archive_usage(user_id: Optional[str]) -> Dict[str, Any]:
+    """Occupation de l'archive d'un utilisateur, lue dans le manifeste (sans décompression)"""
+    manifest = load_manifest(user_id)
+    months = manifest["months"]
+    return {
+        "cutoff": manifest["cutoff"],
+        "months": len(months),
+        "dreams": sum(month["count"] for month in months.values()),
+        "total_bytes": sum(month["bytes"] for month in months.values())
+    }
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    import dream_utils
+
+    parser = argparse.ArgumentParser(description="Archivage des rêves anciens (niveau froid compressé)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    retain_parser = subparsers.add_parser("retain", help="Archive les rêves hors de la fenêtre chaude")
+    retain_parser.add_argument("--user", help="Journal à traiter (tous par défaut)")
+    retain_parser.add_argument("--hot-days", type=int, help=f"Fenêtre chaude en jours (DREAM_HOT_DAYS, {HOT_DAYS} par défaut)")
+    subparsers.add_parser("usage", help="Occupation de l'archive par journal")
+    migrate_parser = subparsers.add_parser(
+        "migrate-interpretations",
+        help="Remplace les interprétations stockées en texte par leurs modèles (rêves récents et archivés)"
+    )
+    migrate_parser.add_argument("--user", help="Journal à traiter (tous par défaut)")
+    args = parser.parse_args(argv)
+
+    users = [args.user] if getattr(args, "user", None) else dream_storage.list_users()
+    for user_id in users:
+        if args.command == "retain":
+            print(f"{user_id} : {dream_utils.apply_retention_policy(user_id, hot_days=args.hot_days)} rêves archivés")
+        elif args.command == "migrate-interpretations":
+            print(f"{user_id} : {dream_utils.migrate_interpretations(user_id)} interprétations migrées")
+        else:
+            usage = get_archive_usage(user_id)
+            print(f"{user_id} : {usage['dreams']} rêves, {usage['months']} mois, {usage['total_bytes']} o"
+                  f" (avant {usage['cutoff'] or '-'})")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
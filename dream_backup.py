@@ -0,0 +1,216 @@
+import os
+import json
+import gzip
+from datetime import datetime
+from typing import Callable, Dict, List, Any, Optional
+import dream_locks
+
+# Sauvegardes incrémentales : journal des changements (insertions, mises à jour,
+# suppressions) découpé en segments compressés à chaque point de contrôle, plus
+# des instantanés complets périodiques. Une restauration repart de l'instantané
+# le plus récent avant la date visée et rejoue les segments jusqu'à elle.
+BACKUP_DIR = "dream_backups"
+CHANGELOG_FILE = os.path.join(BACKUP_DIR, "changelog.jsonl")
+STATE_FILE = os.path.join(BACKUP_DIR, "state.json")
+LOCK_FILE = os.path.join(BACKUP_DIR, ".lock")
+
+# Un instantané complet tous les N points de contrôle
+SNAPSHOT_EVERY = 7
+
+# L'application, ingest_dreams.py et le service HTTP écrivent dans le même
+# journal : le verrou de fichier sérialise aussi les processus entre eux
+def _locked():
+    """Verrou réentrant du journal, exclusif entre threads et entre processus"""
+    return dream_locks.file_lock(LOCK_FILE)
+
+def _load_state() -> Dict[str, Any]:
+    if not os.path.exists(STATE_FILE):
+        return {"seq": 0, "checkpoint_seq": 0, "checkpoints_since_snapshot": 0, "force_snapshot": True}
+    with open(STATE_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _save_state(state: Dict[str, Any]):
+    dream_locks.atomic_write(STATE_FILE, json.dumps(state))
+
+def _identity(entry: Dict[str, Any]) -> tuple:
+    """Identité d'une entrée pour le rejeu (même convention que dream_storage.remove_entry)"""
+    return (entry.get("date"), entry.get("text"))
+
+def log_change(op: str, user_id: str, entry: Dict[str, Any], previous: Dict[str, Any] = None):
+    """Ajoute une opération (insert, update, delete) au journal des changements"""
+    with _locked():
+        state = _load_state()
+        state["seq"] += 1
+        record = {
+            "seq": state["seq"],
+            "ts": datetime.now().isoformat(),
+            "op": op,
+            "user": user_id,
+            "entry": entry
+        }
+        if previous is not None:
+            record["previous"] = previous
+
+        os.makedirs(BACKUP_DIR, exist_ok=True)
+        with open(CHANGELOG_FILE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        _save_state(state)
+
+def _read_changelog() -> List[Dict[str, Any]]:
+    if not os.path.exists(CHANGELOG_FILE):
+        return []
+    with open(CHANGELOG_FILE, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def _write_gzip_json(path: str, payload: Any, lines: bool = False):
+    temp_file = f"{path}.tmp"
+    with gzip.open(temp_file, 'wt', encoding='utf-8') as f:
+        if lines:
+            for record in payload:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        else:
+            json.dump(payload, f, ensure_ascii=False)
+    os.replace(temp_file, path)
+
+def create_backup(load_all_histories: Callable[[], Dict[str, List[Dict[str, Any]]]], full: bool = False) -> Dict[str, Any]:
+    """Crée un point de contrôle : segment des changements récents, et instantané si dû
+
+    Le coût d'un point de contrôle incrémental est proportionnel au nombre de
+    changements depuis le précédent ; seul l'instantané périodique relit tout.
+    """
+    with _locked():
+        state = _load_state()
+        records = [r for r in _read_changelog() if r["seq"] > state["checkpoint_seq"]]
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        written = []
+
+        if records:
+            segment = os.path.join(BACKUP_DIR, f"incr_{records[0]['seq']:010d}_{records[-1]['seq']:010d}.jsonl.gz")
+            _write_gzip_json(segment, records, lines=True)
+            written.append(segment)
+
+        take_snapshot = (
+            full
+            or state.get("force_snapshot", False)
+            or state["checkpoints_since_snapshot"] + 1 >= SNAPSHOT_EVERY
+        )
+        if take_snapshot:
+            snapshot = os.path.join(BACKUP_DIR, f"snapshot_{state['seq']:010d}_{stamp}.json.gz")
+            _write_gzip_json(snapshot, {
+                "seq": state["seq"],
+                "ts": datetime.now().isoformat(),
+                "users": load_all_histories()
+            })
+            written.append(snapshot)
+            state["checkpoints_since_snapshot"] = 0
+            state["force_snapshot"] = False
+        else:
+            state["checkpoints_since_snapshot"] += 1
+
+        # Le journal actif repart de zéro : ses changements sont dans le segment
+        state["checkpoint_seq"] = state["seq"]
+        _save_state(state)
+        if os.path.exists(CHANGELOG_FILE):
+            os.remove(CHANGELOG_FILE)
+
+        return {"changes": len(records), "snapshot": take_snapshot, "files": written}
+
+def list_backups() -> Dict[str, List[Dict[str, Any]]]:
+    """Liste les instantanés et segments disponibles"""
+    snapshots, segments = [], []
+    if os.path.isdir(BACKUP_DIR):
+        for name in sorted(os.listdir(BACKUP_DIR)):
+            path = os.path.join(BACKUP_DIR, name)
+            parts = name.split(".")[0].split("_")
+            if name.startswith("snapshot_") and name.endswith(".json.gz"):
+                snapshots.append({"path": path, "seq": int(parts[1]), "size": os.path.getsize(path)})
+            elif name.startswith("incr_") and name.endswith(".jsonl.gz"):
+                segments.append({"path": path, "first_seq": int(parts[1]), "last_seq": int(parts[2]),
+                                 "size": os.path.getsize(path)})
+    return {"snapshots": snapshots, "segments": segments}
+
+def _read_segment(path: str) -> List[Dict[str, Any]]:
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def _read_snapshot(path: str) -> Dict[str, Any]:
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+def _apply(users: Dict[str, List[Dict[str, Any]]], record: Dict[str, Any]):
+    """Rejoue une opération ; le rejeu est idempotent (une écriture peut précéder son instantané)"""
+    history = users.setdefault(record["user"], [])
+    entry = record["entry"]
+    target = _identity(record.get("previous", entry))
+    position = next((i for i, d in enumerate(history) if _identity(d) == target), None)
+
+    if record["op"] == "insert":
+        if position is None:
+            history.append(entry)
+    elif record["op"] == "update":
+        if position is None:
+            history.append(entry)
+        else:
+            history[position] = entry
+    elif record["op"] == "delete":
+        if position is not None:
+            history.pop(position)
+
+def restore_point(point: datetime = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Reconstruit l'état de tous les journaux à une date donnée (maintenant par défaut)"""
+    with _locked():
+        point_iso = (point or datetime.now()).isoformat()
+        backups = list_backups()
+
+        # Instantané le plus récent antérieur à la date visée
+        base = None
+        for snapshot in reversed(backups["snapshots"]):
+            data = _read_snapshot(snapshot["path"])
+            if data["ts"] <= point_iso:
+                base = data
+                break
+        if base is None:
+            raise Exception("Aucun instantané antérieur à la date demandée")
+
+        records = []
+        for segment in backups["segments"]:
+            if segment["last_seq"] > base["seq"]:
+                records.extend(_read_segment(segment["path"]))
+        records.extend(_read_changelog())
+
+        users = base["users"]
+        for record in sorted(records, key=lambda r: r["seq"]):
+            if record["seq"] > base["seq"] and record["ts"] <= point_iso:
+                _apply(users, record)
+        return users
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    import dream_utils
+
+    parser = argparse.ArgumentParser(description="Sauvegardes incrémentales des journaux de rêves")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backup_parser = subparsers.add_parser("backup", help="Crée un point de contrôle")
+    backup_parser.add_argument("--full", action="store_true", help="Force un instantané complet")
+    restore_parser = subparsers.add_parser("restore", help="Restaure l'état à une date")
+    restore_parser.add_argument("--at", help="Date ISO visée (maintenant par défaut)")
+    subparsers.add_parser("list", help="Liste les sauvegardes")
+    args = parser.parse_args(argv)
+
+    if args.command == "backup":
+        result = dream_utils.backup_dreams(full=args.full)
+        kind = "instantané complet + " if result["snapshot"] else ""
+        print(f"Point de contrôle : {kind}{result['changes']} changements")
+    elif args.command == "restore":
+        point = datetime.fromisoformat(args.at) if args.at else None
+        print(f"{dream_utils.restore_dreams(point)} rêves restaurés")
+    else:
+        backups = list_backups()
+        for snapshot in backups["snapshots"]:
+            print(f"instantané  seq ≤ {snapshot['seq']:>8}  {snapshot['size']:>10} o  {snapshot['path']}")
+        for segment in backups["segments"]:
+            print(f"segment     seq {segment['first_seq']}-{segment['last_seq']}  {segment['size']:>10} o  {segment['path']}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,300 @@
+import os
+import json
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+from dream_records import Vocabulary
+from dream_rollups import ROLLUP_MAX_POINTS, choose_granularity
+
+# Archive colonnaire en lecture seule pour l'analyse de longs historiques :
+# une colonne .npy par champ numérique (ouverte en mmap, sans analyse JSON),
+# les symboles et émotions encodés en identifiants (format CSR : offsets +
+# identifiants concaténés) et les textes dans un tas UTF-8 indexé par offsets.
+ARCHIVE_DIRNAME = "columnar"
+ARCHIVE_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+TEXT_HEAP_FILE = "text_heap.bin"
+
+NUMERIC_COLUMNS = {
+    "date": "datetime64[us]",
+    "sleep_quality": np.int16,
+    "dream_clarity": np.int16,
+    "complexity_score": np.float64,
+    "word_count": np.int32,
+    "dream_type": np.int32
+}
+# Listes encodées : symboles de l'analyse, émotions déclarées (métadonnées)
+LIST_COLUMNS = ("symbols", "emotions")
+
+WEEKDAY_NAMES = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
+
+_US_PER_HOUR = 3600 * 10 ** 6
+_US_PER_DAY = 24 * _US_PER_HOUR
+
+def build_archive(dream_history: List[Dict[str, Any]], archive_dir: str, source: Any = None) -> Dict[str, Any]:
+    """Écrit l'archive colonnaire d'un historique et retourne son manifeste
+
+    L'archive est construite à côté puis mise en place par renommage : un
+    lecteur ne voit jamais une archive à moitié écrite. source (valeur JSON)
+    décrit les données d'origine ; elle est conservée dans le manifeste pour
+    que l'appelant puisse détecter une archive périmée.
+    """
+    vocabularies = {"dream_types": Vocabulary(), "symbols": Vocabulary(), "emotions": Vocabulary()}
+    count = len(dream_history)
+
+    columns = {name: np.zeros(count, dtype=dtype) for name, dtype in NUMERIC_COLUMNS.items()}
+    list_offsets = {name: np.zeros(count + 1, dtype=np.int64) for name in LIST_COLUMNS}
+    list_ids = {name: [] for name in LIST_COLUMNS}
+    text_offsets = np.zeros(count + 1, dtype=np.int64)
+    text_chunks = []
+
+    for i, dream in enumerate(dream_history):
+        metadata = dream.get("metadata", {})
+        analysis = dream.get("analysis", {})
+
+        columns["date"][i] = np.datetime64(datetime.fromisoformat(dream["date"]), "us")
+        columns["sleep_quality"][i] = metadata.get("sleep_quality") or 0
+        columns["dream_clarity"][i] = metadata.get("dream_clarity") or 0
+        columns["complexity_score"][i] = analysis.get("complexity_score", 0)
+        columns["word_count"][i] = analysis.get("word_count", 0)
+        columns["dream_type"][i] = vocabularies["dream_types"].intern(metadata.get("dream_type", "Non spécifié"))
+
+        for name, values in (("symbols", analysis.get("symbols", [])), ("emotions", metadata.get("emotions", []))):
+            list_ids[name].extend(vocabularies[name].intern(value) for value in values)
+            list_offsets[name][i + 1] = len(list_ids[name])
+
+        encoded = dream.get("text", "").encode("utf-8")
+        text_chunks.append(encoded)
+        text_offsets[i + 1] = text_offsets[i] + len(encoded)
+
+    # Répertoire temporaire unique : deux constructions simultanées ne se mélangent pas
+    parent = os.path.dirname(archive_dir) or "."
+    os.makedirs(parent, exist_ok=True)
+    temp_dir = tempfile.mkdtemp(dir=parent, prefix=f".{os.path.basename(archive_dir)}.", suffix=".tmp")
+
+    for name, column in columns.items():
+        np.save(os.path.join(temp_dir, f"{name}.npy"), column)
+    for name in LIST_COLUMNS:
+        np.save(os.path.join(temp_dir, f"{name}_offsets.npy"), list_offsets[name])
+        np.save(os.path.join(temp_dir, f"{name}_ids.npy"), np.array(list_ids[name], dtype=np.int32))
+    np.save(os.path.join(temp_dir, "text_offsets.npy"), text_offsets)
+    with open(os.path.join(temp_dir, TEXT_HEAP_FILE), "wb") as f:
+        f.write(b"".join(text_chunks))
+
+    manifest = {
+        "version": ARCHIVE_VERSION,
+        "count": count,
+        "created": datetime.now().isoformat(),
+        "source": source,
+        "vocabularies": {
+            name: [vocabulary.name(term_id) for term_id in range(len(vocabulary))]
+            for name, vocabulary in vocabularies.items()
+        }
+    }
+    with open(os.path.join(temp_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+
+    old_dir = f"{temp_dir}.old"
+    if os.path.isdir(archive_dir):
+        os.replace(archive_dir, old_dir)
+    os.replace(temp_dir, archive_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+    return manifest
+
+def archive_exists(archive_dir: str) -> bool:
+    return os.path.exists(os.path.join(archive_dir, MANIFEST_FILE))
+
+def _counts(ids: np.ndarray, names: List[str]) -> Dict[str, int]:
+    """Occurrences par identifiant, restituées par nom dans l'ordre de première apparition"""
+    counts = np.bincount(ids, minlength=len(names))
+    return {names[term_id]: int(counts[term_id]) for term_id in range(len(names)) if counts[term_id]}
+
+def _most_common(values: np.ndarray) -> Optional[int]:
+    """Valeur la plus fréquente ; en cas d'égalité, la première rencontrée (comme max sur un dict)"""
+    if not len(values):
+        return None
+    uniques, first_index, counts = np.unique(values, return_index=True, return_counts=True)
+    candidates = np.flatnonzero(counts == counts.max())
+    return int(uniques[candidates[np.argmin(first_index[candidates])]])
+
+def _dreams_per_week(first: datetime, last: datetime, count: int) -> float:
+    """Même calcul que dream_utils.calculate_dream_frequency"""
+    if count < 2:
+        return 0
+    period_days = (last - first).days
+    if period_days == 0:
+        return count
+    return round(count / (period_days / 7), 1)
+
+class ColumnarArchive:
+    """Archive colonnaire ouverte en mémoire partagée (np.load(mmap_mode="r"))
+
+    L'ouverture ne lit que le manifeste ; chaque colonne est projetée en
+    mémoire à son premier accès et seules les pages touchées sont lues.
+    """
+
+    def __init__(self, archive_dir: str):
+        self.archive_dir = archive_dir
+        with open(os.path.join(archive_dir, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("version") != ARCHIVE_VERSION:
+            raise Exception(f"Version d'archive non prise en charge : {self.manifest.get('version')}")
+        self.vocabularies: Dict[str, List[str]] = self.manifest["vocabularies"]
+        self._columns: Dict[str, np.ndarray] = {}
+        self._heap = None
+
+    def __len__(self) -> int:
+        return self.manifest["count"]
+
+    def column(self, name: str) -> np.ndarray:
+        """Colonne projetée en mémoire (lecture seule)"""
+        if name not in self._columns:
+            path = os.path.join(self.archive_dir, f"{name}.npy")
+            try:
+                self._columns[name] = np.load(path, mmap_mode="r")
+            except ValueError:
+                self._columns[name] = np.load(path)  # Colonne vide : rien à projeter
+        return self._columns[name]
+
+    def values(self, name: str, index: int) -> List[str]:
+        """Valeurs d'une colonne liste (symbols, emotions) pour un rêve"""
+        offsets = self.column(f"{name}_offsets")
+        ids = self.column(f"{name}_ids")[offsets[index]:offsets[index + 1]]
+        return [self.vocabularies[name][term_id] for term_id in ids]
+
+    def text(self, index: int) -> str:
+        """Texte d'un rêve, lu depuis le tas de chaînes"""
+        if self._heap is None:
+            path = os.path.join(self.archive_dir, TEXT_HEAP_FILE)
+            # Un tas vide ne peut pas être projeté en mémoire
+            self._heap = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.zeros(0, np.uint8)
+        offsets = self.column("text_offsets")
+        return self._heap[offsets[index]:offsets[index + 1]].tobytes().decode("utf-8")
+
+    def _date_bounds(self):
+        dates = self.column("date")
+        return dates.min().item(), dates.max().item()
+
+    def statistics(self) -> Dict[str, Any]:
+        """Mêmes statistiques que dream_utils.compute_dream_statistics, calculées sur les colonnes"""
+        count = len(self)
+        if not count:
+            return {}
+
+        sleep_quality = self.column("sleep_quality")
+        dream_clarity = self.column("dream_clarity")
+        rated_sleep = sleep_quality[sleep_quality != 0]
+        rated_clarity = dream_clarity[dream_clarity != 0]
+        first_dream, last_dream = self._date_bounds()
+
+        return {
+            "total_dreams": count,
+            "avg_sleep_quality": round(int(rated_sleep.sum()) / len(rated_sleep), 1) if len(rated_sleep) else 0,
+            "avg_dream_clarity": round(int(rated_clarity.sum()) / len(rated_clarity), 1) if len(rated_clarity) else 0,
+            "avg_complexity": round(float(self.column("complexity_score").sum()) / count, 1),
+            "dream_type_distribution": _counts(self.column("dream_type"), self.vocabularies["dream_types"]),
+            "emotion_distribution": _counts(self.column("emotions_ids"), self.vocabularies["emotions"]),
+            "symbol_distribution": _counts(self.column("symbols_ids"), self.vocabularies["symbols"]),
+            "first_dream_date": first_dream.isoformat(),
+            "last_dream_date": last_dream.isoformat(),
+            "dream_frequency": _dreams_per_week(first_dream, last_dream, count)
+        }
+
+    def emotion_evolution(self, max_points: int = ROLLUP_MAX_POINTS) -> Dict[str, Any]:
+        """Émotions déclarées par bucket (jour, semaine ou mois), comme dream_rollups.query_rollups"""
+        first_dream, last_dream = self._date_bounds()
+        granularity = choose_granularity(first_dream.date(), last_dream.date(), max_points)
+
+        days = self.column("date").astype("datetime64[D]")
+        if granularity == "day":
+            buckets = days
+        elif granularity == "week":
+            # Le 1970-01-01 est un jeudi : recul jusqu'au lundi de la semaine
+            buckets = days - ((days.astype(np.int64) + 3) % 7).astype("timedelta64[D]")
+        else:
+            buckets = days.astype("datetime64[M]").astype("datetime64[D]")
+
+        keys, dream_bucket = np.unique(buckets, return_inverse=True)
+        offsets = self.column("emotions_offsets")
+        emotion_bucket = np.repeat(dream_bucket, np.diff(offsets))
+        names = self.vocabularies["emotions"]
+
+        # Comptage conjoint (bucket, émotion) en une seule passe
+        pairs = np.bincount(emotion_bucket * len(names) + self.column("emotions_ids"),
+                            minlength=len(keys) * len(names)).reshape(len(keys), len(names))
+        evolution = {}
+        for bucket_index, key in enumerate(keys):
+            row = pairs[bucket_index]
+            evolution[str(key)] = {names[term_id]: int(row[term_id]) for term_id in np.flatnonzero(row)}
+
+        return {"granularity": granularity, "evolution": evolution}
+
+    def insights(self) -> Dict[str, Any]:
+        """Mêmes insights que dream_utils.get_dream_insights, calculés sur les colonnes"""
+        count = len(self)
+        if not count:
+            return {}
+
+        microseconds = self.column("date").astype(np.int64)
+        days = microseconds // _US_PER_DAY
+        most_common_weekday = _most_common((days + 3) % 7)
+        most_common_hour = _most_common((microseconds // _US_PER_HOUR) % 24)
+
+        # Corrélation entre qualité du sommeil et clarté (rêves ayant les deux notes)
+        sleep_quality = self.column("sleep_quality")
+        dream_clarity = self.column("dream_clarity")
+        rated = (sleep_quality != 0) & (dream_clarity != 0)
+        x = sleep_quality[rated].astype(np.int64)
+        y = dream_clarity[rated].astype(np.int64)
+
+        correlation = 0
+        n = len(x)
+        if n > 1:
+            sum_x, sum_y = int(x.sum()), int(y.sum())
+            numerator = n * int((x * y).sum()) - sum_x * sum_y
+            denominator = ((n * int((x * x).sum()) - sum_x ** 2) * (n * int((y * y).sum()) - sum_y ** 2)) ** 0.5
+            if denominator != 0:
+                correlation = numerator / denominator
+
+        first_dream, last_dream = self._date_bounds()
+        trend = self.emotion_evolution()
+
+        return {
+            "most_common_weekday": WEEKDAY_NAMES[most_common_weekday],
+            "most_common_hour": most_common_hour,
+            "sleep_clarity_correlation": round(correlation, 3),
+            "emotion_evolution": trend["evolution"],
+            "emotion_evolution_granularity": trend["granularity"],
+            "total_analysis_period_days": (last_dream - first_dream).days if count > 1 else 0,
+            "average_dreams_per_week": _dreams_per_week(first_dream, last_dream, count)
+        }
+
+def open_archive(archive_dir: str) -> ColumnarArchive:
+    """Ouvre une archive existante (exception si elle n'a pas été construite)"""
+    if not archive_exists(archive_dir):
+        raise Exception(f"Aucune archive colonnaire dans {archive_dir}")
+    return ColumnarArchive(archive_dir)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+    import dream_storage
+    import dream_utils
+
+    parser = argparse.ArgumentParser(description="Archives colonnaires (statistiques et insights sans analyse JSON)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="Construit ou reconstruit l'archive colonnaire")
+    build_parser.add_argument("--user", help="Journal à traiter (tous par défaut)")
+    build_parser.add_argument("--include-archive", action="store_true", help="Inclut les rêves de l'archive froide")
+    args = parser.parse_args(argv)
+
+    for user_id in [args.user] if args.user else dream_storage.list_users():
+        print(f"{user_id} : {dream_utils.build_columnar_archive(user_id, include_archive=args.include_archive)} rêves")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
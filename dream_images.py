@@ -0,0 +1,213 @@
+import io
+import os
+import time
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+import requests
+import numpy as np
+from dotenv import load_dotenv
+from typing import Dict, List, Any, Optional
+import dream_media
+
+load_dotenv()
+
+# Chaîne de moteurs d'image, essayés dans l'ordre (DREAM_IMAGE_BACKEND=clipdrop,procedural)
+DEFAULT_IMAGE_BACKENDS = "clipdrop,procedural"
+
+# Délai maximal d'une requête distante, et mise à l'écart d'un moteur après un échec
+IMAGE_TIMEOUT_SECONDS = 30.0
+IMAGE_COOLDOWN_SECONDS = 60.0
+
+CLIPDROP_URL = "https://clipdrop-api.co/text-to-image/v1"
+
+class ImageBackend(ABC):
+    """Moteur de génération d'image : retourne le contenu PNG d'une image
+
+    Un moteur qui n'implémente pas render ne peut pas être instancié : l'erreur
+    survient à la configuration, pas au milieu de la chaîne de repli.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    def render(self, prompt: str, analysis: Dict[str, Any] = None, style: str = None, mood: str = None) -> bytes:
+        """Contenu de l'image générée"""
+
+class ClipdropBackend(ImageBackend):
+    """Génération distante par l'API texte-vers-image de Clipdrop"""
+
+    name = "clipdrop"
+
+    def __init__(self, api_key: str = None, timeout: float = None):
+        self.api_key = api_key
+        self.timeout = timeout
+
+    def render(self, prompt: str, analysis: Dict[str, Any] = None, style: str = None, mood: str = None) -> bytes:
+        api_key = self.api_key or os.getenv("CLIPDROP_API_KEY")
+        if not api_key:
+            raise Exception("La clé API Clipdrop n'est pas définie dans .env")
+
+        # Amélioration du prompt pour de meilleures images
+        enhanced_prompt = f"dream interpretation, surreal, mystical, {prompt}, high quality, detailed, artistic"
+
+        response = requests.post(
+            CLIPDROP_URL,
+            headers={"x-api-key": api_key},
+            json={"prompt": enhanced_prompt},
+            timeout=self.timeout or float(os.getenv("DREAM_IMAGE_TIMEOUT", IMAGE_TIMEOUT_SECONDS))
+        )
+
+        if response.status_code != 200:
+            raise Exception(f"Erreur génération image : {response.status_code}, {response.text}")
+        return response.content
+
+# Palettes (haut, bas, accent) par ambiance et couleurs associées aux émotions
+MOOD_PALETTES = {
+    "mystérieuse": [(24, 16, 58), (72, 44, 128), (36, 140, 150)],
+    "colorée": [(255, 94, 98), (255, 195, 0), (46, 196, 182)],
+    "sombre": [(8, 8, 16), (40, 30, 48), (120, 30, 40)],
+    "lumineuse": [(255, 246, 214), (180, 220, 255), (255, 190, 90)],
+    "onirique": [(120, 90, 200), (250, 170, 210), (140, 230, 240)]
+}
+EMOTION_COLORS = {
+    "peur": (110, 20, 40),
+    "joie": (250, 205, 60),
+    "tristesse": (50, 80, 150),
+    "colère": (205, 40, 30),
+    "surprise": (240, 130, 200),
+    "sérénité": (120, 200, 180),
+    "amour": (230, 90, 130),
+    "nostalgie": (180, 140, 100),
+    "confusion": (140, 120, 160),
+    "excitation": (250, 120, 40)
+}
+
+class ProceduralBackend(ImageBackend):
+    """Rendu local d'un tableau abstrait à partir de l'analyse, en quelques dizaines de millisecondes
+
+    Déterministe : le même rêve (prompt, symboles, émotions, style, ambiance)
+    donne toujours la même image. Une forme par symbole, colorée d'après les
+    émotions ; le style choisit le type de formes, l'ambiance la palette.
+    Le calcul se fait sur une grille réduite, agrandie ensuite (formes lisses).
+    """
+
+    name = "procedural"
+
+    def __init__(self, size: int = 512, grid: int = 128):
+        self.size = size
+        self.grid = grid
+
+    def render(self, prompt: str, analysis: Dict[str, Any] = None, style: str = None, mood: str = None) -> bytes:
+        from PIL import Image  # Pillow n'est chargé que pour ce moteur
+
+        analysis = analysis or {}
+        symbols = analysis.get("symbols", [])
+        emotions = analysis.get("emotions", [])
+        style = (style or "").lower()
+        mood = (mood or "").lower()
+
+        seed_source = "|".join([prompt, ",".join(symbols), ",".join(emotions), style, mood])
+        rng = np.random.default_rng(int.from_bytes(hashlib.sha256(seed_source.encode("utf-8")).digest()[:8], "little"))
+
+        palette = np.array(MOOD_PALETTES.get(mood, MOOD_PALETTES["onirique"]), dtype=np.float32)
+        colors = [np.array(EMOTION_COLORS[e], dtype=np.float32) for e in emotions if e in EMOTION_COLORS] or list(palette)
+
+        y, x = np.mgrid[0:self.grid, 0:self.grid].astype(np.float32) / self.grid
+
+        # Fond : dégradé vertical ondulé entre les deux premières couleurs de la palette
+        warp = 0.06 * np.sin(2 * np.pi * (x * rng.uniform(0.5, 2.5) + rng.uniform(0, 1)))
+        t = np.clip(y + warp, 0, 1)[..., None]
+        image = palette[0] * (1 - t) + palette[1] * t
+
+        shapes = max(1, len(symbols)) + {"minimaliste": 0, "artistique": 6, "fantasy": 3}.get(style, 2)
+        if style == "minimaliste":
+            shapes = min(shapes, 2)
+
+        for i in range(min(shapes, 12)):
+            cx, cy = rng.uniform(0.15, 0.85, size=2)
+            radius = rng.uniform(0.06, 0.22)
+            distance = np.sqrt((x - cx) ** 2 + (y - cy) ** 2)
+            if style == "surréaliste":
+                weight = np.exp(-((distance - radius) ** 2) / (2 * (radius * 0.12) ** 2))  # Anneaux
+            elif style == "minimaliste":
+                weight = (distance < radius).astype(np.float32)  # Disques pleins
+            else:
+                weight = np.exp(-(distance ** 2) / (2 * radius ** 2))  # Halos
+            color = colors[i % len(colors)] if i < len(symbols) or i % 2 else palette[2]
+            alpha = (weight * rng.uniform(0.55, 0.9))[..., None]
+            image = image * (1 - alpha) + color * alpha
+
+        pixels = np.clip(image, 0, 255).astype(np.uint8)
+        pixels = np.asarray(Image.fromarray(pixels).resize((self.size, self.size), Image.BICUBIC)).copy()
+
+        if style == "fantasy":
+            # Étoiles : petites croix lumineuses, à pleine résolution
+            for cx, cy in rng.integers(1, self.size - 1, size=(40, 2)):
+                pixels[cy, cx - 1:cx + 2] = 255
+                pixels[cy - 1:cy + 2, cx] = 255
+
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format="PNG")
+        return buffer.getvalue()
+
+IMAGE_BACKENDS = {
+    "clipdrop": ClipdropBackend,
+    "procedural": ProceduralBackend
+}
+
+_backends: Optional[List[ImageBackend]] = None
+_unavailable_until: Dict[str, float] = {}
+_backends_lock = threading.Lock()
+
+def configure_backends(backends: List[ImageBackend] = None):
+    """Remplace la chaîne de moteurs (None : revenir à DREAM_IMAGE_BACKEND)"""
+    global _backends
+    with _backends_lock:
+        _backends = backends
+        _unavailable_until.clear()
+
+def get_backends() -> List[ImageBackend]:
+    """Chaîne de moteurs configurée, dans l'ordre d'essai"""
+    with _backends_lock:
+        if _backends is not None:
+            return list(_backends)
+
+    names = [n.strip() for n in os.getenv("DREAM_IMAGE_BACKEND", DEFAULT_IMAGE_BACKENDS).split(",") if n.strip()]
+    unknown = [n for n in names if n not in IMAGE_BACKENDS]
+    if unknown:
+        raise Exception(f"Moteur d'image inconnu : {', '.join(unknown)}")
+    return [IMAGE_BACKENDS[n]() for n in names]
+
+def generate_image(prompt: str, analysis: Dict[str, Any] = None, style: str = None, mood: str = None) -> str:
+    """Génère une image et retourne son chemin dans le stockage dream_media
+
+    Les moteurs sont essayés dans l'ordre ; un moteur qui vient d'échouer est
+    écarté pendant DREAM_IMAGE_COOLDOWN secondes (sauf s'il est le dernier).
+    """
+    backends = get_backends()
+    cooldown = float(os.getenv("DREAM_IMAGE_COOLDOWN", IMAGE_COOLDOWN_SECONDS))
+    errors = []
+
+    for position, backend in enumerate(backends):
+        is_last = position == len(backends) - 1
+        with _backends_lock:
+            skipped = not is_last and _unavailable_until.get(backend.name, 0) > time.monotonic()
+        if skipped:
+            errors.append(f"{backend.name} : écarté après un échec récent")
+            continue
+
+        try:
+            data = backend.render(prompt, analysis=analysis, style=style, mood=mood)
+        except Exception as e:
+            with _backends_lock:
+                _unavailable_until[backend.name] = time.monotonic() + cooldown
+            errors.append(f"{backend.name} : {str(e)}")
+            continue
+
+        with _backends_lock:
+            _unavailable_until.pop(backend.name, None)
+        # Stockage adressé par contenu : pas de collision entre deux images
+        return dream_media.store_image(data)
+
+    raise Exception(f"Erreur lors de la génération d'image : {' ; '.join(errors)}")
@@ -0,0 +1,78 @@
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Union
+
+# Verrous de fichiers partagés par les modules de stockage : l'application,
+# ingest_dreams.py et le service HTTP peuvent écrire dans les mêmes fichiers,
+# un verrou de thread ne suffit donc pas à sérialiser leurs lectures-modifications-écritures.
+
+class _FileLock:
+    """Verrou réentrant associé à un fichier, exclusif entre threads et entre processus"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.RLock()
+        self.handle = None
+        self.depth = 0
+
+_file_locks: Dict[str, _FileLock] = {}
+_file_locks_lock = threading.Lock()
+
+def _lock_file(f):
+    try:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    except ImportError:
+        import msvcrt  # Windows
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+def _unlock_file(f):
+    try:
+        import fcntl
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    except ImportError:
+        import msvcrt
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+@contextmanager
+def file_lock(path: str):
+    """Verrou exclusif sur le fichier path (créé au besoin), réentrant dans un même thread"""
+    with _file_locks_lock:
+        state = _file_locks.setdefault(os.path.abspath(path), _FileLock(path))
+
+    with state.lock:
+        if state.depth == 0:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            state.handle = open(path, 'a+')
+            _lock_file(state.handle)
+        state.depth += 1
+        try:
+            yield
+        finally:
+            state.depth -= 1
+            if state.depth == 0:
+                _unlock_file(state.handle)
+                state.handle.close()
+                state.handle = None
+
+def atomic_write(path: str, data: Union[str, bytes]):
+    """Remplace un fichier de manière atomique via un fichier temporaire unique du même répertoire"""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_file = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        if isinstance(data, str):
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+        else:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+        os.replace(temp_file, path)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
@@ -0,0 +1,231 @@
+import os
+import io
+import json
+import hashlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+import dream_locks
+
+# Répertoire du stockage des images, partitionné par empreinte du contenu
+MEDIA_DIR = "dream_media"
+MEDIA_INDEX_FILE = os.path.join(MEDIA_DIR, "index.json")
+MEDIA_LOCK_FILE = os.path.join(MEDIA_DIR, ".lock")
+
+# Qualité WebP des images des rêves archivés (dream_archive)
+COLD_IMAGE_QUALITY = 80
+
+def _index_locked():
+    """Verrou de l'index (lecture-modification-écriture), exclusif entre threads et entre processus"""
+    return dream_locks.file_lock(MEDIA_LOCK_FILE)
+
+def _webp_enabled() -> bool:
+    """Indique si le ré-encodage WebP sans perte est activé (DREAM_MEDIA_WEBP=1)"""
+    return os.getenv("DREAM_MEDIA_WEBP", "0") == "1"
+
+def _load_index() -> Dict[str, Dict[str, Any]]:
+    """Charge l'index des images : chemin -> taille, date de création, références
+
+    Un index illisible lève une exception : le traiter comme vide ferait
+    supprimer des images encore référencées.
+    """
+    if not os.path.exists(MEDIA_INDEX_FILE):
+        return {}
+
+    try:
+        with open(MEDIA_INDEX_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        raise Exception(f"Erreur lors du chargement de l'index des images : {str(e)}")
+
+def _save_index(index: Dict[str, Dict[str, Any]]):
+    """Sauvegarde l'index de manière atomique"""
+    dream_locks.atomic_write(MEDIA_INDEX_FILE, json.dumps(index, ensure_ascii=False, indent=2))
+
+def _encode_webp_lossless(data: bytes) -> Optional[bytes]:
+    """Ré-encode une image en WebP sans perte (None si indisponible ou plus lourd)"""
+    try:
+        from PIL import Image, features
+        if not features.check("webp"):
+            return None
+
+        with Image.open(io.BytesIO(data)) as image:
+            buffer = io.BytesIO()
+            image.save(buffer, format="WEBP", lossless=True)
+    except Exception as e:
+        print(f"Ré-encodage WebP impossible : {str(e)}")
+        return None
+
+    encoded = buffer.getvalue()
+    return encoded if len(encoded) < len(data) else None
+
+def _encode_webp_lossy(data: bytes, quality: int) -> Optional[bytes]:
+    """Ré-encode une image en WebP avec perte (None si indisponible ou plus lourd)"""
+    try:
+        from PIL import Image, features
+        if not features.check("webp"):
+            return None
+
+        with Image.open(io.BytesIO(data)) as image:
+            buffer = io.BytesIO()
+            image.save(buffer, format="WEBP", quality=quality, method=6)
+    except Exception as e:
+        print(f"Ré-encodage WebP impossible : {str(e)}")
+        return None
+
+    encoded = buffer.getvalue()
+    return encoded if len(encoded) < len(data) else None
+
+def media_path(digest: str, extension: str) -> str:
+    """Chemin d'une image dans le stockage : dream_media/ab/cd/<empreinte>.<ext>"""
+    return os.path.join(MEDIA_DIR, digest[:2], digest[2:4], f"{digest}.{extension}")
+
+def is_managed(image_path: str) -> bool:
+    """Indique si une image appartient au stockage (et figure dans son index)"""
+    with _index_locked():
+        return image_path in _load_index()
+
+def store_image(data: bytes, extension: str = "png", webp: bool = None) -> str:
+    """Enregistre une image dans le stockage et retourne son chemin
+
+    Les images identiques ne sont écrites qu'une fois : le nom de fichier est
+    l'empreinte SHA-256 du contenu d'origine.
+    """
+    if webp is None:
+        webp = _webp_enabled()
+
+    digest = hashlib.sha256(data).hexdigest()
+
+    if webp:
+        encoded = _encode_webp_lossless(data)
+        if encoded is not None:
+            data, extension = encoded, "webp"
+
+    path = media_path(digest, extension)
+
+    with _index_locked():
+        index = _load_index()
+
+        if path not in index or not os.path.exists(path):
+            dream_locks.atomic_write(path, data)
+
+        entry = index.setdefault(path, {"refs": []})
+        entry["size"] = len(data)
+        entry["created"] = datetime.now().isoformat()
+        _save_index(index)
+
+    return path
+
+def add_reference(image_path: str, dream_ref: str) -> bool:
+    """Associe une image du stockage à une entrée de rêve"""
+    with _index_locked():
+        index = _load_index()
+        if image_path not in index:
+            return False
+
+        refs = index[image_path]["refs"]
+        if dream_ref not in refs:
+            refs.append(dream_ref)
+            _save_index(index)
+        return True
+
+def remove_reference(image_path: str, dream_ref: str, delete_orphan: bool = True) -> bool:
+    """Détache une image d'une entrée de rêve, et la supprime si plus rien n'y fait référence"""
+    with _index_locked():
+        index = _load_index()
+        if image_path not in index:
+            return False
+
+        refs = index[image_path]["refs"]
+        if dream_ref in refs:
+            refs.remove(dream_ref)
+
+        if delete_orphan and not refs:
+            _delete_image(image_path, index)
+
+        _save_index(index)
+        return True
+
+def _delete_image(image_path: str, index: Dict[str, Dict[str, Any]]):
+    """Supprime le fichier d'une image et son entrée d'index"""
+    index.pop(image_path, None)
+    if os.path.exists(image_path):
+        try:
+            os.remove(image_path)
+        except OSError:
+            pass  # Le fichier sera retenté à la prochaine collecte
+
+def collect_orphans(older_than_days: float = 0, grace_seconds: float = 3600) -> int:
+    """Supprime les images qui ne sont plus référencées par aucun rêve
+
+    Le délai de grâce protège les images tout juste générées dont l'entrée de
+    rêve n'est pas encore sauvegardée.
+    """
+    min_age = max(timedelta(days=older_than_days), timedelta(seconds=grace_seconds))
+    cutoff = datetime.now() - min_age
+
+    with _index_locked():
+        index = _load_index()
+        orphans = [
+            path for path, entry in index.items()
+            if not entry["refs"] and datetime.fromisoformat(entry["created"]) < cutoff
+        ]
+
+        for path in orphans:
+            _delete_image(path, index)
+
+        if orphans:
+            _save_index(index)
+
+    return len(orphans)
+
+def rebuild_references(references: Dict[str, List[str]]):
+    """Remplace les références de l'index à partir de l'historique (chemin -> rêves)"""
+    with _index_locked():
+        index = _load_index()
+        for path, entry in index.items():
+            entry["refs"] = sorted(set(references.get(path, [])))
+        _save_index(index)
+
+def import_image(image_path: str, dream_ref: str) -> str:
+    """Déplace une image existante dans le stockage et retourne son nouveau chemin"""
+    with open(image_path, "rb") as f:
+        data = f.read()
+
+    extension = os.path.splitext(image_path)[1].lstrip(".").lower() or "png"
+    new_path = store_image(data, extension=extension)
+    add_reference(new_path, dream_ref)
+
+    if os.path.abspath(new_path) != os.path.abspath(image_path):
+        os.remove(image_path)
+
+    return new_path
+
+def recompress_image(image_path: str, quality: int = None) -> str:
+    """Version WebP avec perte d'une image du stockage (archivage) ; retourne son chemin
+
+    L'image d'origine n'est pas modifiée : elle reste partagée avec les
+    autres rêves qui y font référence. Retourne le chemin d'origine si le
+    ré-encodage est impossible ou ne fait rien gagner.
+    """
+    if quality is None:
+        quality = int(os.getenv("DREAM_COLD_IMAGE_QUALITY", COLD_IMAGE_QUALITY))
+
+    if not is_managed(image_path) or image_path.endswith(".webp") or not os.path.exists(image_path):
+        return image_path
+
+    with open(image_path, "rb") as f:
+        encoded = _encode_webp_lossy(f.read(), quality)
+    if encoded is None:
+        return image_path
+    return store_image(encoded, extension="webp", webp=False)
+
+def get_media_usage() -> Dict[str, Any]:
+    """Statistiques d'occupation du stockage, calculées depuis l'index"""
+    with _index_locked():
+        index = _load_index()
+
+    return {
+        "images": len(index),
+        "total_bytes": sum(entry.get("size", 0) for entry in index.values()),
+        "orphans": sum(1 for entry in index.values() if not entry["refs"])
+    }
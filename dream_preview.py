@@ -0,0 +1,182 @@
+import re
+import time
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Tuple
+
+from dream_analysis import (
+    COMPLEX_WORDS,
+    DREAM_SYMBOLS,
+    EMOTION_WORDS,
+    THEME_SYMBOLS,
+    THEME_WORDS,
+    complexity_from_counts
+)
+
+# Un segment s'arrête après une fin de phrase (ou un saut de ligne) suivie
+# d'espaces : aucun mot-clé ni aucune suite de ponctuation ne chevauche deux
+# segments, donc les résultats par segment s'additionnent exactement.
+SEGMENT_PATTERN = re.compile(r".*?[.!?\n]+\s+|.+", re.S)
+PUNCTUATION_RUN = re.compile(r"[.!?]+")
+
+SEGMENT_CACHE_SIZE = 4096
+PREVIEW_DEBOUNCE_SECONDS = 0.15
+
+# Tous les mots dont la présence compte pour l'aperçu
+KEYWORDS = tuple(dict.fromkeys(
+    list(DREAM_SYMBOLS)
+    + [word for words in EMOTION_WORDS.values() for word in words]
+    + [word for words in THEME_WORDS.values() for word in words]
+    + COMPLEX_WORDS
+))
+
+def split_segments(text: str) -> List[str]:
+    """Découpe un texte en segments contigus (leur concaténation redonne le texte)"""
+    return SEGMENT_PATTERN.findall(text)
+
+@lru_cache(maxsize=SEGMENT_CACHE_SIZE)
+def scan_segment(segment: str) -> Tuple[frozenset, int, int]:
+    """Mots-clés présents, nombre de mots et suites de ponctuation d'un segment"""
+    lower = segment.lower()
+    hits = frozenset(keyword for keyword in KEYWORDS if keyword in lower)
+    return hits, len(segment.split()), len(PUNCTUATION_RUN.findall(segment))
+
+def _common_prefix(a: str, b: str) -> int:
+    """Longueur du préfixe commun (recherche dichotomique, comparaisons de tranches en C)"""
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[:middle] == b[:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+def _common_suffix(a: str, b: str, limit: int) -> int:
+    """Longueur du suffixe commun, bornée par limit"""
+    low, high = 0, limit
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[len(a) - middle:] == b[len(b) - middle:]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+class IncrementalAnalyzer:
+    """Aperçu de l'analyse tenu à jour pendant la saisie
+
+    À chaque modification, seul l'intervalle édité (préfixe et suffixe communs
+    exclus, plus un segment de chaque côté) est redécoupé et analysé ; les
+    compteurs globaux sont mis à jour par différence. Le résultat est
+    identique à celui d'analyze_dream pour symboles, émotions, thèmes,
+    nombre de mots et score de complexité.
+    """
+
+    def __init__(self, debounce: float = PREVIEW_DEBOUNCE_SECONDS):
+        self.debounce = debounce
+        self._text = ""
+        self._segments: List[str] = []
+        self._hit_counts: Dict[str, int] = {}
+        self._word_count = 0
+        self._punctuation_runs = 0
+        self._last_update = float("-inf")
+        self._pending: Optional[str] = None
+        self.rescanned_chars = 0  # Taille de la zone réanalysée lors de la dernière mise à jour
+        self._preview = self._build_preview()
+
+    def _apply(self, segment: str, sign: int):
+        hits, words, runs = scan_segment(segment)
+        for keyword in hits:
+            count = self._hit_counts.get(keyword, 0) + sign
+            if count:
+                self._hit_counts[keyword] = count
+            else:
+                del self._hit_counts[keyword]
+        self._word_count += sign * words
+        self._punctuation_runs += sign * runs
+
+    def _locate(self, position: int) -> Tuple[int, int]:
+        """Indice et début du segment contenant une position (dernier segment au-delà de la fin)"""
+        offset = 0
+        for index, segment in enumerate(self._segments):
+            if position < offset + len(segment):
+                return index, offset
+            offset += len(segment)
+        last = len(self._segments) - 1
+        return last, offset - len(self._segments[last])
+
+    def update(self, text: str) -> Dict[str, Any]:
+        """Met à jour l'aperçu pour le nouveau texte (réanalyse de la seule zone modifiée)"""
+        self._last_update = time.monotonic()
+        self._pending = None
+        if text == self._text:
+            self.rescanned_chars = 0
+            return self._preview
+
+        old = self._text
+        prefix = _common_prefix(old, text)
+        suffix = _common_suffix(old, text, min(len(old), len(text)) - prefix)
+
+        if self._segments:
+            # Un segment de marge de chaque côté : l'édition peut créer ou effacer la frontière voisine
+            first, _ = self._locate(prefix)
+            last, _ = self._locate(len(old) - suffix)
+            first = max(0, first - 1)
+            last = min(len(self._segments) - 1, last + 1)
+            start = sum(len(segment) for segment in self._segments[:first])
+            old_end = start + sum(len(segment) for segment in self._segments[first:last + 1])
+        else:
+            first, last, start, old_end = 0, -1, 0, 0
+
+        new_end = old_end + len(text) - len(old)
+        replaced = split_segments(text[start:new_end])
+
+        for segment in self._segments[first:last + 1]:
+            self._apply(segment, -1)
+        for segment in replaced:
+            self._apply(segment, 1)
+        self._segments[first:last + 1] = replaced
+
+        self._text = text
+        self.rescanned_chars = new_end - start
+        self._preview = self._build_preview()
+        return self._preview
+
+    def submit(self, text: str, now: float = None) -> Dict[str, Any]:
+        """Variante anti-rebond d'update : au plus une analyse par intervalle debounce
+
+        Dans l'intervalle, le texte est mis en attente et l'aperçu précédent est
+        renvoyé avec "pending": True ; flush() analyse le texte en attente.
+        """
+        now = time.monotonic() if now is None else now
+        if now - self._last_update < self.debounce:
+            self._pending = text
+            return dict(self._preview, pending=True)
+        return self.update(text)
+
+    def flush(self) -> Dict[str, Any]:
+        """Analyse le texte mis en attente par submit (s'il y en a un)"""
+        if self._pending is not None:
+            return self.update(self._pending)
+        return self._preview
+
+    def _build_preview(self) -> Dict[str, Any]:
+        hit = self._hit_counts
+
+        symbols = [symbol for symbol in DREAM_SYMBOLS if symbol in hit]
+        emotions = [emotion for emotion, words in EMOTION_WORDS.items() if any(word in hit for word in words)]
+
+        themes = [theme for theme, theme_symbols in THEME_SYMBOLS.items() if any(s in symbols for s in theme_symbols)]
+        themes += [theme for theme, words in THEME_WORDS.items() if any(word in hit for word in words)]
+
+        complex_word_count = sum(1 for word in COMPLEX_WORDS if word in hit)
+
+        return {
+            "symbols": symbols,
+            "emotions": emotions,
+            "themes": themes,
+            "word_count": self._word_count,
+            # re.split sur les suites de ponctuation donne une phrase de plus que de suites
+            "complexity_score": complexity_from_counts(self._word_count, self._punctuation_runs + 1, complex_word_count),
+            "pending": False
+        }
@@ -0,0 +1,208 @@
+from datetime import datetime
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple
+
+# Catégories internées : symboles et thèmes de l'analyse, émotions déclarées
+# (métadonnées), émotions détectées dans le texte et type de rêve
+CATEGORIES = ("symbols", "emotions", "detected_emotions", "themes", "dream_types")
+
+def _popcount(mask: int) -> int:
+    return bin(mask).count("1")
+
+def iter_bits(mask: int) -> Iterator[int]:
+    """Positions des bits à 1 d'un bitset, dans l'ordre croissant
+
+    Parcours de la représentation binaire : linéaire en la taille du bitset,
+    là où retirer le bit de poids faible recopierait l'entier à chaque bit.
+    """
+    bits = bin(mask)[:1:-1]  # Bit de poids faible en tête
+    position = bits.find("1")
+    while position != -1:
+        yield position
+        position = bits.find("1", position + 1)
+
+class Vocabulary:
+    """Table d'internement : chaîne <-> petit identifiant entier"""
+
+    __slots__ = ("_ids", "_names")
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._names: List[str] = []
+
+    def intern(self, name: str) -> int:
+        """Identifiant d'une chaîne, attribué à sa première apparition"""
+        term_id = self._ids.get(name)
+        if term_id is None:
+            term_id = len(self._names)
+            self._ids[name] = term_id
+            self._names.append(name)
+        return term_id
+
+    def id_of(self, name: str) -> Optional[int]:
+        return self._ids.get(name)
+
+    def name(self, term_id: int) -> str:
+        return self._names[term_id]
+
+    def mask(self, names: Iterable[str]) -> int:
+        """Bitset des chaînes connues (les inconnues sont ignorées)"""
+        mask = 0
+        for name in names:
+            term_id = self._ids.get(name)
+            if term_id is not None:
+                mask |= 1 << term_id
+        return mask
+
+    def names(self, mask: int) -> List[str]:
+        return [self._names[term_id] for term_id in iter_bits(mask)]
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+class DreamRecord:
+    """Représentation compacte d'un rêve : champs numériques et bitsets d'identifiants"""
+
+    __slots__ = ("index", "timestamp", "title", "sleep_quality", "dream_clarity", "complexity_score",
+                 "word_count", "dream_type", "symbols", "emotions", "detected_emotions", "themes")
+
+    def __init__(self, index: int, timestamp: float, title: str, sleep_quality: int, dream_clarity: int,
+                 complexity_score: float, word_count: int, dream_type: int,
+                 symbols: int, emotions: int, detected_emotions: int, themes: int):
+        self.index = index
+        self.timestamp = timestamp
+        self.title = title  # Tri par titre sans relire l'entrée complète
+        self.sleep_quality = sleep_quality
+        self.dream_clarity = dream_clarity
+        self.complexity_score = complexity_score
+        self.word_count = word_count
+        self.dream_type = dream_type
+        self.symbols = symbols
+        self.emotions = emotions
+        self.detected_emotions = detected_emotions
+        self.themes = themes
+
+class CompactHistory:
+    """Historique compact : filtres et co-occurrences par opérations bit à bit
+
+    En plus du bitset de chaque rêve, chaque terme garde la liste de ses rêves
+    sous forme de bitset (bit i = rêve i) : filtrer revient à combiner ces
+    bitsets, et une co-occurrence est le popcount d'un ET.
+    """
+
+    def __init__(self, dream_history: List[Dict[str, Any]] = None):
+        self.vocabularies: Dict[str, Vocabulary] = {category: Vocabulary() for category in CATEGORIES}
+        self.records: List[DreamRecord] = []
+        self._postings: Dict[str, List[int]] = {category: [] for category in CATEGORIES}
+
+        for dream in dream_history or []:
+            self.add(dream)
+
+    def _intern(self, category: str, names: Iterable[str], index: int) -> int:
+        vocabulary = self.vocabularies[category]
+        postings = self._postings[category]
+        mask = 0
+        for name in names:
+            term_id = vocabulary.intern(name)
+            if term_id == len(postings):
+                postings.append(0)
+            postings[term_id] |= 1 << index
+            mask |= 1 << term_id
+        return mask
+
+    def add(self, dream: Dict[str, Any]) -> DreamRecord:
+        """Ajoute un rêve (dictionnaire complet) et retourne son enregistrement compact"""
+        index = len(self.records)
+        metadata = dream.get("metadata", {})
+        analysis = dream.get("analysis", {})
+
+        dream_type = metadata.get("dream_type", "Non spécifié")
+        self._intern("dream_types", [dream_type], index)
+
+        record = DreamRecord(
+            index=index,
+            timestamp=datetime.fromisoformat(dream["date"]).timestamp(),
+            title=dream.get("title", ""),
+            sleep_quality=metadata.get("sleep_quality") or 0,
+            dream_clarity=metadata.get("dream_clarity") or 0,
+            complexity_score=analysis.get("complexity_score", 0),
+            word_count=analysis.get("word_count", 0),
+            dream_type=self.vocabularies["dream_types"].id_of(dream_type),
+            symbols=self._intern("symbols", analysis.get("symbols", []), index),
+            emotions=self._intern("emotions", metadata.get("emotions", []), index),
+            detected_emotions=self._intern("detected_emotions", analysis.get("emotions", []), index),
+            themes=self._intern("themes", analysis.get("themes", []), index)
+        )
+        self.records.append(record)
+        return record
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def values(self, category: str) -> List[str]:
+        """Valeurs distinctes d'une catégorie, dans l'ordre de première apparition"""
+        vocabulary = self.vocabularies[category]
+        return [vocabulary.name(term_id) for term_id in range(len(vocabulary))]
+
+    def posting(self, category: str, name: str) -> int:
+        """Bitset des rêves contenant un terme (0 s'il est inconnu)"""
+        term_id = self.vocabularies[category].id_of(name)
+        return self._postings[category][term_id] if term_id is not None else 0
+
+    def select(self, all_of: Dict[str, Iterable[str]] = None, any_of: Dict[str, Iterable[str]] = None) -> int:
+        """Bitset des rêves ayant tous les termes de all_of et au moins un terme de chaque catégorie d'any_of"""
+        selected = (1 << len(self.records)) - 1
+
+        for category, names in (all_of or {}).items():
+            for name in names:
+                selected &= self.posting(category, name)
+
+        for category, names in (any_of or {}).items():
+            union = 0
+            for name in names:
+                union |= self.posting(category, name)
+            selected &= union
+
+        return selected
+
+    def filter(self, dream_type: str = None, emotion: str = None, symbol: str = None, theme: str = None) -> List[int]:
+        """Indices (dans l'historique d'origine) des rêves correspondant aux filtres"""
+        all_of = {}
+        if dream_type is not None:
+            all_of["dream_types"] = [dream_type]
+        if emotion is not None:
+            all_of["emotions"] = [emotion]
+        if symbol is not None:
+            all_of["symbols"] = [symbol]
+        if theme is not None:
+            all_of["themes"] = [theme]
+        return list(iter_bits(self.select(all_of=all_of)))
+
+    def counts(self, category: str, selection: int = None) -> Dict[str, int]:
+        """Nombre de rêves par terme, éventuellement restreint à une sélection"""
+        vocabulary = self.vocabularies[category]
+        counts = {}
+        for term_id, posting in enumerate(self._postings[category]):
+            if selection is not None:
+                posting &= selection
+            count = _popcount(posting)
+            if count:
+                counts[vocabulary.name(term_id)] = count
+        return counts
+
+    def cooccurrence(self, category: str, other_category: str = None) -> Dict[Tuple[str, str], int]:
+        """Nombre de rêves où deux termes apparaissent ensemble (popcount des ET de bitsets)"""
+        other_category = other_category or category
+        same = other_category == category
+        names = self.vocabularies[category]
+        other_names = self.vocabularies[other_category]
+        postings = self._postings[category]
+        other_postings = self._postings[other_category]
+
+        pairs = {}
+        for term_id, posting in enumerate(postings):
+            start = term_id + 1 if same else 0
+            for other_id in range(start, len(other_postings)):
+                count = _popcount(posting & other_postings[other_id])
+                if count:
+                    pairs[(names.name(term_id), other_names.name(other_id))] = count
+        return pairs
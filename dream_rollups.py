@@ -0,0 +1,189 @@
+import os
+import json
+import threading
+from datetime import datetime, date, timedelta
+from typing import Dict, List, Any, Optional
+import dream_locks
+
+# Agrégats pré-calculés par jour, semaine et mois, tenus à jour à chaque écriture
+# (un fichier par utilisateur, voir dream_storage.user_file)
+ROLLUPS_FILE = "rollups.json"
+# Version 2 : les rêves archivés restent comptés (les fichiers antérieurs sont reconstruits)
+ROLLUPS_VERSION = 2
+GRANULARITIES = ("day", "week", "month")
+
+# Nombre maximal de points renvoyés quand la granularité est choisie automatiquement
+ROLLUP_MAX_POINTS = 120
+
+_rollups_lock = threading.RLock()
+
+def bucket_start(dream_date: datetime, granularity: str) -> str:
+    """Début du bucket (AAAA-MM-JJ) contenant une date pour une granularité"""
+    day = dream_date.date() if isinstance(dream_date, datetime) else dream_date
+
+    if granularity == "day":
+        return day.isoformat()
+    if granularity == "week":
+        return (day - timedelta(days=day.weekday())).isoformat()
+    if granularity == "month":
+        return day.replace(day=1).isoformat()
+    raise Exception(f"Granularité inconnue : {granularity}")
+
+def empty_rollups() -> Dict[str, Any]:
+    """Structure vide des agrégats"""
+    rollups = {"version": ROLLUPS_VERSION, "total": 0}
+    for granularity in GRANULARITIES:
+        rollups[granularity] = {}
+    return rollups
+
+def _empty_bucket() -> Dict[str, Any]:
+    return {
+        "count": 0,
+        "emotions": {},
+        "symbols": {},
+        "themes": {},
+        "dream_types": {},
+        "sleep_quality_sum": 0,
+        "sleep_quality_count": 0,
+        "dream_clarity_sum": 0,
+        "dream_clarity_count": 0
+    }
+
+def _add_count(counts: Dict[str, int], key: str, delta: int):
+    counts[key] = counts.get(key, 0) + delta
+    if counts[key] <= 0:
+        del counts[key]
+
+def apply_dream(rollups: Dict[str, Any], dream: Dict[str, Any], delta: int = 1):
+    """Ajoute (delta=1) ou retire (delta=-1) un rêve des agrégats, en place"""
+    dream_date = datetime.fromisoformat(dream["date"])
+    metadata = dream.get("metadata", {})
+    analysis = dream.get("analysis", {})
+
+    for granularity in GRANULARITIES:
+        key = bucket_start(dream_date, granularity)
+        bucket = rollups[granularity].setdefault(key, _empty_bucket())
+
+        bucket["count"] += delta
+        for emotion in metadata.get("emotions", []):
+            _add_count(bucket["emotions"], emotion, delta)
+        for symbol in analysis.get("symbols", []):
+            _add_count(bucket["symbols"], symbol, delta)
+        for theme in analysis.get("themes", []):
+            _add_count(bucket["themes"], theme, delta)
+        _add_count(bucket["dream_types"], metadata.get("dream_type", "Non spécifié"), delta)
+
+        # Même convention que get_dream_statistics : les valeurs absentes ou nulles sont ignorées
+        if metadata.get("sleep_quality"):
+            bucket["sleep_quality_sum"] += delta * metadata["sleep_quality"]
+            bucket["sleep_quality_count"] += delta
+        if metadata.get("dream_clarity"):
+            bucket["dream_clarity_sum"] += delta * metadata["dream_clarity"]
+            bucket["dream_clarity_count"] += delta
+
+        if bucket["count"] <= 0:
+            del rollups[granularity][key]
+
+    rollups["total"] += delta
+
+def build_rollups(dream_history: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Calcule les agrégats complets d'un historique"""
+    rollups = empty_rollups()
+    for dream in dream_history:
+        apply_dream(rollups, dream)
+    return rollups
+
+def load_rollups(rollups_file: str = ROLLUPS_FILE) -> Optional[Dict[str, Any]]:
+    """Charge les agrégats sauvegardés (None s'ils n'existent pas encore ou sont d'une autre version)"""
+    if not os.path.exists(rollups_file):
+        return None
+
+    try:
+        with open(rollups_file, 'r', encoding='utf-8') as f:
+            rollups = json.load(f)
+    except Exception as e:
+        print(f"Erreur lors du chargement des agrégats : {str(e)}")
+        return None
+    return rollups if rollups.get("version") == ROLLUPS_VERSION else None
+
+def save_rollups(rollups: Dict[str, Any], rollups_file: str = ROLLUPS_FILE):
+    """Sauvegarde les agrégats de manière atomique"""
+    dream_locks.atomic_write(rollups_file, json.dumps(rollups, ensure_ascii=False))
+
+def record_dreams(dreams: List[Dict[str, Any]], delta: int = 1, rollups_file: str = ROLLUPS_FILE):
+    """Met à jour incrémentalement les agrégats sauvegardés après une écriture
+
+    Si les agrégats n'existent pas encore, ils seront reconstruits à la
+    prochaine lecture (voir get_rollups) : il n'y a rien à mettre à jour.
+    """
+    with _rollups_lock:
+        rollups = load_rollups(rollups_file)
+        if rollups is None:
+            return
+
+        for dream in dreams:
+            apply_dream(rollups, dream, delta)
+        save_rollups(rollups, rollups_file)
+
+def get_rollups(load_history, rollups_file: str = ROLLUPS_FILE) -> Dict[str, Any]:
+    """Retourne les agrégats sauvegardés, reconstruits depuis l'historique si absents"""
+    with _rollups_lock:
+        rollups = load_rollups(rollups_file)
+        if rollups is None:
+            rollups = build_rollups(load_history())
+            save_rollups(rollups, rollups_file)
+        return rollups
+
+def invalidate_rollups(rollups_file: str = ROLLUPS_FILE):
+    """Supprime les agrégats sauvegardés (ils seront reconstruits à la prochaine lecture)"""
+    with _rollups_lock:
+        if os.path.exists(rollups_file):
+            os.remove(rollups_file)
+
+def choose_granularity(start: date, end: date, max_points: int = ROLLUP_MAX_POINTS) -> str:
+    """Choisit la granularité la plus fine qui tient dans max_points buckets"""
+    days = (end - start).days + 1
+    if days <= max_points:
+        return "day"
+    if days / 7 <= max_points:
+        return "week"
+    return "month"
+
+def query_rollups(rollups: Dict[str, Any], start: date = None, end: date = None,
+                  granularity: str = None, max_points: int = ROLLUP_MAX_POINTS) -> Dict[str, Any]:
+    """Extrait une série temporelle des agrégats sur une plage de dates
+
+    Sans granularité explicite, la plus fine qui tient dans max_points buckets
+    est choisie selon l'étendue de la plage.
+    """
+    days = rollups["day"]
+    if not days:
+        return {"granularity": granularity or "day", "points": []}
+
+    if start is None:
+        start = date.fromisoformat(min(days))
+    if end is None:
+        end = date.fromisoformat(max(days))
+    if granularity is None:
+        granularity = choose_granularity(start, end, max_points)
+
+    # Les clés sont des dates ISO : la comparaison de chaînes suit l'ordre chronologique
+    first_key = bucket_start(start, granularity)
+    last_key = end.isoformat()
+
+    points = []
+    for key in sorted(rollups[granularity]):
+        if first_key <= key <= last_key:
+            bucket = rollups[granularity][key]
+            points.append({
+                "start": key,
+                "count": bucket["count"],
+                "emotions": bucket["emotions"],
+                "symbols": bucket["symbols"],
+                "themes": bucket["themes"],
+                "dream_types": bucket["dream_types"],
+                "avg_sleep_quality": round(bucket["sleep_quality_sum"] / bucket["sleep_quality_count"], 1) if bucket["sleep_quality_count"] else None,
+                "avg_dream_clarity": round(bucket["dream_clarity_sum"] / bucket["dream_clarity_count"], 1) if bucket["dream_clarity_count"] else None
+            })
+
+    return {"granularity": granularity, "points": points}
@@ -0,0 +1,273 @@
+import os
+import re
+import json
+from datetime import date, datetime
+from typing import Dict, List, Any, Iterator, Optional, Tuple
+import dream_locks
+
+# Stockage partitionné : un répertoire par utilisateur, et optionnellement
+# un fichier par mois (DREAM_PARTITION_BY_MONTH=1) dans chaque répertoire
+DREAMS_DIR = "dreams_data"
+DEFAULT_USER = "default"
+
+# Nom de la partition unique quand le découpage par mois est désactivé
+SINGLE_PARTITION = "dreams"
+
+# Identifiants de journal acceptés, utilisés tels quels comme noms de répertoire
+USER_ID_PATTERN = re.compile(r"[\w-][\w.-]{0,99}")
+
+# Verrous inter-processus des journaux, hors des répertoires utilisateurs
+# (migrate_legacy_file teste l'existence du répertoire sous ce verrou)
+LOCKS_DIRNAME = ".locks"
+
+_json_decoder = json.JSONDecoder()
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+def partition_by_month() -> bool:
+    """Indique si les rêves de chaque utilisateur sont découpés par mois"""
+    return os.getenv("DREAM_PARTITION_BY_MONTH", "0") == "1"
+
+def safe_user_id(user_id: Optional[str]) -> str:
+    """Valide un identifiant utilisateur et le retourne comme nom de répertoire
+
+    L'identifiant n'est jamais transformé (hors espaces aux extrémités) : deux
+    journaux distincts ne peuvent pas aboutir au même répertoire. Un
+    identifiant qu'il faudrait corriger est refusé.
+    """
+    cleaned = (user_id or DEFAULT_USER).strip() or DEFAULT_USER
+    if not USER_ID_PATTERN.fullmatch(cleaned):
+        raise Exception(
+            f"Identifiant de journal invalide : {user_id!r} "
+            "(100 caractères au plus : lettres, chiffres, « _ », « - », et « . » hors premier caractère)"
+        )
+    return cleaned
+
+def user_dir(user_id: Optional[str]) -> str:
+    """Répertoire des données d'un utilisateur"""
+    return os.path.join(DREAMS_DIR, safe_user_id(user_id))
+
+def user_file(user_id: Optional[str], filename: str) -> str:
+    """Chemin d'un fichier annexe (agrégats...) propre à un utilisateur"""
+    return os.path.join(user_dir(user_id), filename)
+
+def user_lock(user_id: Optional[str]):
+    """Verrou d'écriture d'un journal, exclusif entre threads et entre processus (réentrant)"""
+    return dream_locks.file_lock(os.path.join(DREAMS_DIR, LOCKS_DIRNAME, f"{safe_user_id(user_id)}.lock"))
+
+def partition_key(dream: Dict[str, Any]) -> str:
+    """Partition d'une entrée : son mois (AAAA-MM) ou la partition unique"""
+    if partition_by_month():
+        return dream["date"][:7]
+    return SINGLE_PARTITION
+
+def _partition_file(user_id: Optional[str], key: str) -> str:
+    return os.path.join(user_dir(user_id), f"{key}.json")
+
+def _is_month_key(key: str) -> bool:
+    return re.fullmatch(r"\d{4}-\d{2}", key) is not None
+
+def list_users() -> List[str]:
+    """Liste les utilisateurs ayant des données"""
+    if not os.path.isdir(DREAMS_DIR):
+        return []
+    return sorted(
+        name for name in os.listdir(DREAMS_DIR)
+        if os.path.isdir(os.path.join(DREAMS_DIR, name)) and USER_ID_PATTERN.fullmatch(name)
+    )
+
+def user_exists(user_id: Optional[str]) -> bool:
+    """Indique si un utilisateur a déjà un répertoire de données"""
+    return os.path.isdir(user_dir(user_id))
+
+def list_partitions(user_id: Optional[str]) -> List[str]:
+    """Liste les partitions d'un utilisateur, dans l'ordre chronologique"""
+    directory = user_dir(user_id)
+    if not os.path.isdir(directory):
+        return []
+
+    keys = [
+        name[:-len(".json")] for name in os.listdir(directory)
+        if name.endswith(".json") and (name[:-len(".json")] == SINGLE_PARTITION or _is_month_key(name[:-len(".json")]))
+    ]
+    # La partition unique (données antérieures au découpage) précède les mois
+    return sorted(keys, key=lambda key: (key != SINGLE_PARTITION, key))
+
+def partition_signature(user_id: Optional[str]) -> Tuple:
+    """Empreinte des partitions d'un utilisateur (taille, date de modification, inode) : change à chaque écriture"""
+    signature = []
+    for key in list_partitions(user_id):
+        try:
+            stat = os.stat(_partition_file(user_id, key))
+        except FileNotFoundError:
+            continue  # Partition vidée entre-temps
+        signature.append((key, stat.st_size, stat.st_mtime_ns, stat.st_ino))
+    return tuple(signature)
+
+def read_partition_text(user_id: Optional[str], key: str) -> str:
+    """Contenu JSON brut d'une partition (chaîne vide si elle n'existe pas)
+
+    Les fins de ligne sont conservées telles quelles (newline='') : les
+    positions d'octets d'iter_json_entries restent justes pour un fichier CRLF.
+    """
+    path = _partition_file(user_id, key)
+    if not os.path.exists(path):
+        return ""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return f.read()
+
+def read_partition_range(user_id: Optional[str], key: str, start: int, end: int) -> bytes:
+    """Octets [start, end[ d'une partition (voir iter_json_entries)"""
+    with open(_partition_file(user_id, key), 'rb') as f:
+        f.seek(start)
+        return f.read(end - start)
+
+def iter_json_entries(text: str) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+    """Parcourt les entrées d'une liste JSON avec leur intervalle d'octets (début, fin) en UTF-8
+
+    json.loads sur ces seuls octets relit une entrée sans décoder le reste.
+    """
+    position = _WHITESPACE.match(text, 0).end()
+    if position == len(text):
+        return
+    if text[position] != "[":
+        raise ValueError("Une partition doit contenir une liste JSON")
+    position = _WHITESPACE.match(text, position + 1).end()
+
+    cursor, byte_offset = 0, 0
+    while position < len(text) and text[position] != "]":
+        entry, end = _json_decoder.raw_decode(text, position)
+        byte_start = byte_offset + len(text[cursor:position].encode('utf-8'))
+        byte_offset = byte_start + len(text[position:end].encode('utf-8'))
+        cursor = end
+        yield byte_start, byte_offset, entry
+
+        position = _WHITESPACE.match(text, end).end()
+        if position < len(text) and text[position] == ",":
+            position = _WHITESPACE.match(text, position + 1).end()
+
+def load_partition(user_id: Optional[str], key: str, strict: bool = False) -> List[Dict[str, Any]]:
+    """Charge une partition (liste vide si elle n'existe pas)
+
+    Une partition illisible est ignorée en lecture ; avec strict=True (chemins
+    d'écriture) elle lève une exception plutôt que d'être réécrite comme vide.
+    """
+    path = _partition_file(user_id, key)
+    if not os.path.exists(path):
+        return []
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        message = f"Erreur lors du chargement de la partition {path} : {str(e)}"
+        if strict:
+            raise Exception(message)
+        print(message)
+        return []
+
+def write_partition(user_id: Optional[str], key: str, entries: List[Dict[str, Any]]):
+    """Réécrit une partition de manière atomique (supprimée si elle devient vide)"""
+    path = _partition_file(user_id, key)
+
+    if not entries:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+
+    dream_locks.atomic_write(path, json.dumps(entries, ensure_ascii=False, indent=2))
+
+def _partitions_in_range(user_id: Optional[str], start: date = None, end: date = None) -> List[str]:
+    """Partitions pouvant contenir des rêves entre start et end (élagage par mois)"""
+    keys = list_partitions(user_id)
+    if start is None and end is None:
+        return keys
+
+    selected = []
+    for key in keys:
+        if _is_month_key(key):
+            if start is not None and key < start.isoformat()[:7]:
+                continue
+            if end is not None and key > end.isoformat()[:7]:
+                continue
+        selected.append(key)
+    return selected
+
+def load_user_history(user_id: Optional[str], start: date = None, end: date = None) -> List[Dict[str, Any]]:
+    """Charge l'historique d'un utilisateur, en ne lisant que les partitions utiles"""
+    history = []
+    for key in _partitions_in_range(user_id, start, end):
+        history.extend(load_partition(user_id, key))
+
+    if start is not None or end is not None:
+        history = [d for d in history if _in_range(d, start, end)]
+    return history
+
+def _in_range(dream: Dict[str, Any], start: date = None, end: date = None) -> bool:
+    dream_day = datetime.fromisoformat(dream["date"]).date()
+    return (start is None or dream_day >= start) and (end is None or dream_day <= end)
+
+def append_entries(user_id: Optional[str], entries: List[Dict[str, Any]]):
+    """Ajoute des entrées en ne réécrivant que les partitions concernées"""
+    grouped = {}
+    for entry in entries:
+        grouped.setdefault(partition_key(entry), []).append(entry)
+
+    with user_lock(user_id):
+        for key, new_entries in grouped.items():
+            write_partition(user_id, key, load_partition(user_id, key, strict=True) + new_entries)
+
+def remove_entry(user_id: Optional[str], dream: Dict[str, Any]) -> bool:
+    """Supprime une entrée de sa partition (comparée par date et texte)"""
+    identity = (dream.get("date"), dream.get("text"))
+
+    with user_lock(user_id):
+        # La partition attendue d'abord, puis les autres (changement de mode de découpage)
+        keys = list_partitions(user_id)
+        expected = partition_key(dream)
+        if expected in keys:
+            keys.remove(expected)
+            keys.insert(0, expected)
+
+        for key in keys:
+            entries = load_partition(user_id, key, strict=True)
+            for i, entry in enumerate(entries):
+                if (entry.get("date"), entry.get("text")) == identity:
+                    entries.pop(i)
+                    write_partition(user_id, key, entries)
+                    return True
+    return False
+
+def replace_user_history(user_id: Optional[str], history: List[Dict[str, Any]]):
+    """Réécrit entièrement l'historique d'un utilisateur (migrations, restaurations)"""
+    grouped = {}
+    for entry in history:
+        grouped.setdefault(partition_key(entry), []).append(entry)
+
+    with user_lock(user_id):
+        for key in list_partitions(user_id):
+            if key not in grouped:
+                write_partition(user_id, key, [])
+        for key, entries in grouped.items():
+            write_partition(user_id, key, entries)
+
+def iter_all_histories() -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """Parcourt l'historique de chaque utilisateur (agrégations d'administration)"""
+    for user_id in list_users():
+        yield user_id, load_user_history(user_id)
+
+def migrate_legacy_file(legacy_file: str, user_id: str = DEFAULT_USER) -> int:
+    """Importe l'ancien fichier unique dans les partitions d'un utilisateur
+
+    La migration n'a lieu qu'une fois : tant que l'utilisateur n'a pas encore
+    de répertoire. L'ancien fichier est conservé tel quel.
+    """
+    with user_lock(user_id):
+        if not os.path.exists(legacy_file) or user_exists(user_id):
+            return 0
+
+        with open(legacy_file, 'r', encoding='utf-8') as f:
+            history = json.load(f)
+
+        os.makedirs(user_dir(user_id), exist_ok=True)
+        append_entries(user_id, history)
+        return len(history)
@@ -0,0 +1,362 @@
+import whisper
+import torch
+import numpy as np
+import os
+import json
+import struct
+import hashlib
+import tempfile
+import subprocess
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from dotenv import load_dotenv
+from typing import Dict, Any, BinaryIO, Optional, Union
+
+load_dotenv()
+
+# Configuration des modèles (Whisper est chargé à la première transcription)
+# WHISPER_MODEL : taille du modèle (tiny, base, small...) selon le déploiement
+# WHISPER_PROFILE : "fp32" (référence) ou "int8" (quantification dynamique, CPU)
+# WHISPER_THREADS : nombre de threads intra-op de torch (0 = valeur par défaut)
+WHISPER_MODEL_NAME = os.getenv("WHISPER_MODEL", "base")
+WHISPER_PROFILE = os.getenv("WHISPER_PROFILE", "fp32")
+WHISPER_THREADS = os.getenv("WHISPER_THREADS", "0")  # Validé au chargement du modèle (voir _whisper_threads)
+WHISPER_PROFILES = ("fp32", "int8")
+_whisper_models = {}
+_whisper_lock = threading.Lock()
+# Whisper installe des hooks de cache KV pendant le décodage : une inférence à la fois
+_inference_lock = threading.Lock()
+
+# Cache persistant des transcriptions, indexé par empreinte du contenu audio
+TRANSCRIPTION_CACHE_FILE = "transcription_cache.json"
+TRANSCRIPTION_CACHE_MAX_ENTRIES = 500
+TRANSCRIPTION_CACHE_MAX_CHARS = 2_000_000
+_cache_lock = threading.Lock()
+# Copie en mémoire du cache (ordre = ordre LRU), relue seulement quand le
+# fichier a été réécrit par un autre processus (application, ingestion, API)
+_memory_cache: Optional["OrderedDict[str, Dict[str, Any]]"] = None
+_memory_cache_signature = None
+
+# Fréquence d'échantillonnage attendue par Whisper
+AUDIO_SAMPLE_RATE = 16000
+
+# Audio accepté : chemin, octets bruts ou objet fichier (ex. upload Streamlit)
+AudioInput = Union[str, bytes, bytearray, memoryview, BinaryIO]
+
+# Formats d'échantillons WAV décodés nativement : (format, bits) -> dtype
+_WAV_DTYPES = {
+    (1, 8): np.dtype(np.uint8),
+    (1, 16): np.dtype("<i2"),
+    (1, 32): np.dtype("<i4"),
+    (3, 32): np.dtype("<f4"),
+    (3, 64): np.dtype("<f8"),
+}
+
+class TranscriptionInputError(Exception):
+    """Audio indécodable ou langue inconnue : erreur de la requête, pas du service"""
+
+def validate_language(language: str) -> str:
+    """Vérifie qu'une langue (code ou nom anglais, ex. « fr » ou « french ») est connue de Whisper"""
+    from whisper.tokenizer import LANGUAGES, TO_LANGUAGE_CODE
+    
+    if not isinstance(language, str) or (language.lower() not in LANGUAGES and language.lower() not in TO_LANGUAGE_CODE):
+        raise TranscriptionInputError(f"Langue de transcription inconnue : {language!r}")
+    return language
+
+def read_audio_bytes(audio: AudioInput) -> Union[bytes, bytearray, memoryview]:
+    """Récupère le contenu brut d'un audio sans passer par un fichier temporaire"""
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        return audio
+    if isinstance(audio, str):
+        with open(audio, "rb") as f:
+            return f.read()
+    if hasattr(audio, "getbuffer"):
+        # BytesIO (et les uploads Streamlit) : vue sur le tampon, sans copie
+        return audio.getbuffer()
+    return audio.read()
+
+def decode_audio(data: Union[bytes, bytearray, memoryview]) -> np.ndarray:
+    """Décode un audio en tableau float32 mono à 16 kHz, prêt pour Whisper"""
+    if bytes(data[:4]) == b"RIFF" and bytes(data[8:12]) == b"WAVE":
+        try:
+            samples = _decode_wav(data)
+        except (struct.error, ValueError) as e:
+            raise TranscriptionInputError(f"Fichier WAV invalide : {str(e)}")
+        if samples is not None:
+            return samples
+    # Formats compressés (MP3...) ou WAV exotiques : ffmpeg via des pipes
+    return _decode_with_ffmpeg(data)
+
+def _decode_wav(data: Union[bytes, bytearray, memoryview]) -> Optional[np.ndarray]:
+    """Décode un WAV PCM/float directement depuis la mémoire (None si format non géré)"""
+    view = memoryview(data)
+    fmt = None
+    offset = 12
+    
+    while offset + 8 <= len(view):
+        chunk_id = bytes(view[offset:offset + 4])
+        chunk_size = struct.unpack_from("<I", view, offset + 4)[0]
+        body = offset + 8
+        
+        if chunk_id == b"fmt ":
+            audio_format, channels, rate = struct.unpack_from("<HHI", view, body)
+            bits = struct.unpack_from("<H", view, body + 14)[0]
+            if audio_format == 0xFFFE and chunk_size >= 26:
+                # WAVE_FORMAT_EXTENSIBLE : le vrai format est en tête du GUID
+                audio_format = struct.unpack_from("<H", view, body + 24)[0]
+            fmt = (audio_format, channels, rate, bits)
+        elif chunk_id == b"data" and fmt is not None:
+            audio_format, channels, rate, bits = fmt
+            dtype = _WAV_DTYPES.get((audio_format, bits))
+            if dtype is None or channels == 0 or rate == 0:
+                return None
+            
+            # Les WAV en streaming annoncent parfois une taille de 0xFFFFFFFF
+            size = min(chunk_size, len(view) - body)
+            count = size // dtype.itemsize
+            count -= count % channels
+            
+            # Lecture des échantillons directement dans le tampon d'origine
+            samples = np.frombuffer(view, dtype=dtype, count=count, offset=body)
+            return _to_model_input(samples, channels, rate)
+        
+        offset = body + chunk_size + (chunk_size & 1)
+    
+    return None
+
+def _to_model_input(samples: np.ndarray, channels: int, rate: int) -> np.ndarray:
+    """Convertit des échantillons bruts en float32 mono normalisé à 16 kHz"""
+    
+    # Une seule allocation float32 : mixage mono ou conversion de type
+    if channels > 1:
+        audio = samples.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+    else:
+        audio = samples.astype(np.float32)
+    
+    # Normalisation en place dans [-1, 1]
+    if samples.dtype == np.uint8:
+        audio -= 128.0
+        audio *= 1.0 / 128.0
+    elif samples.dtype.kind == "i":
+        audio *= 1.0 / float(2 ** (8 * samples.dtype.itemsize - 1))
+    
+    if rate != AUDIO_SAMPLE_RATE:
+        audio = _resample(audio, rate)
+    
+    return audio
+
+def _resample(audio: np.ndarray, rate: int) -> np.ndarray:
+    """Rééchantillonne linéairement vers 16 kHz (avec lissage anti-repliement)"""
+    if len(audio) == 0:
+        return audio
+    
+    if rate > AUDIO_SAMPLE_RATE:
+        # Moyenne glissante pour limiter le repliement avant décimation
+        width = int(round(rate / AUDIO_SAMPLE_RATE))
+        if width > 1:
+            audio = np.convolve(audio, np.full(width, 1.0 / width, dtype=np.float32), mode="same")
+    
+    target_length = int(round(len(audio) * AUDIO_SAMPLE_RATE / rate))
+    positions = np.arange(target_length, dtype=np.float64) * (rate / AUDIO_SAMPLE_RATE)
+    return np.interp(positions, np.arange(len(audio)), audio).astype(np.float32)
+
+def _decode_with_ffmpeg(data: Union[bytes, bytearray, memoryview]) -> np.ndarray:
+    """Décode un audio compressé avec ffmpeg, entrée et sortie via des pipes"""
+    command = [
+        "ffmpeg", "-nostdin", "-threads", "0",
+        "-i", "pipe:0",
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(AUDIO_SAMPLE_RATE),
+        "pipe:1"
+    ]
+    
+    try:
+        output = subprocess.run(command, input=data, capture_output=True, check=True).stdout
+    except FileNotFoundError:
+        raise TranscriptionInputError("Format audio non pris en charge : ffmpeg est requis pour le décoder")
+    except subprocess.CalledProcessError as e:
+        raise TranscriptionInputError(f"Impossible de décoder l'audio : {e.stderr.decode(errors='ignore').strip()}")
+    
+    audio = np.frombuffer(output, dtype=np.int16).astype(np.float32)
+    audio *= 1.0 / 32768.0
+    return audio
+
+def _whisper_threads() -> int:
+    """Nombre de threads demandé par WHISPER_THREADS (une valeur invalide n'empêche pas l'import du module)"""
+    try:
+        threads = int(WHISPER_THREADS)
+    except (TypeError, ValueError):
+        threads = -1
+    if threads < 0:
+        raise Exception(f"WHISPER_THREADS doit être un entier positif ou nul (reçu : {WHISPER_THREADS!r})")
+    return threads
+
+def get_whisper_model(model_name: str = None, profile: str = None):
+    """Charge un modèle Whisper pour un profil d'inférence, puis le garde en mémoire"""
+    model_name = model_name or WHISPER_MODEL_NAME
+    profile = profile or WHISPER_PROFILE
+    
+    if profile not in WHISPER_PROFILES:
+        raise Exception(f"Profil Whisper inconnu : {profile} (attendu : {', '.join(WHISPER_PROFILES)})")
+    threads = _whisper_threads()
+    
+    with _whisper_lock:
+        if (model_name, profile) not in _whisper_models:
+            if threads > 0:
+                torch.set_num_threads(threads)
+            _whisper_models[(model_name, profile)] = _load_whisper_model(model_name, profile)
+    return _whisper_models[(model_name, profile)]
+
+def _load_whisper_model(model_name: str, profile: str):
+    """Charge le modèle et applique le profil (repli sur fp32 si la quantification échoue)"""
+    if profile != "int8":
+        return whisper.load_model(model_name)
+    
+    model = whisper.load_model(model_name, device="cpu")
+    try:
+        _use_plain_linear_layers(model)
+        # En place : pas de copie fp32 du modèle, qui doublerait le pic mémoire
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    except Exception as e:
+        print(f"Quantification int8 impossible, repli sur fp32 : {str(e)}")
+        # Le modèle a pu être modifié en partie : on recharge une copie intacte
+        del model
+        return whisper.load_model(model_name, device="cpu")
+
+def _use_plain_linear_layers(module: torch.nn.Module):
+    """Remplace les sous-classes de nn.Linear de Whisper par des nn.Linear quantifiables"""
+    for name, child in module.named_children():
+        if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+            # quantize_dynamic ne reconnaît que le type exact nn.Linear
+            plain = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+            plain.weight = child.weight
+            plain.bias = child.bias
+            setattr(module, name, plain)
+        else:
+            _use_plain_linear_layers(child)
+
+def run_whisper(samples: np.ndarray, language: str = "fr", model_name: str = None, profile: str = None) -> str:
+    """Exécute Whisper sur un tableau audio décodé, sans passer par le cache"""
+    model = get_whisper_model(model_name, profile)
+    
+    # fp16 n'a de sens que sur GPU ; sur CPU Whisper retomberait en fp32 avec un avertissement
+    use_fp16 = next(model.parameters()).device.type == "cuda"
+    
+    with _inference_lock:
+        result = model.transcribe(samples, language=language, fp16=use_fp16)
+    return result["text"]
+
+def transcription_cache_key(audio_data: Union[bytes, bytearray, memoryview], model_name: str, language: str) -> str:
+    """Calcule la clé de cache d'une transcription (contenu audio, modèle, langue)"""
+    digest = hashlib.sha256(audio_data).hexdigest()
+    return f"{digest}:{model_name}:{language}"
+
+def _load_transcription_cache() -> Dict[str, Dict[str, Any]]:
+    """Charge le cache des transcriptions (ordre d'insertion = ordre LRU)"""
+    if not os.path.exists(TRANSCRIPTION_CACHE_FILE):
+        return {}
+    
+    try:
+        with open(TRANSCRIPTION_CACHE_FILE, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except Exception as e:
+        print(f"Erreur lors du chargement du cache de transcription : {str(e)}")
+        return {}
+
+def _cache_file_signature() -> Optional[tuple]:
+    try:
+        stat = os.stat(TRANSCRIPTION_CACHE_FILE)
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+def _get_memory_cache() -> "OrderedDict[str, Dict[str, Any]]":
+    """Cache en mémoire, rechargé depuis le fichier seulement s'il a changé (appelé sous _cache_lock)"""
+    global _memory_cache, _memory_cache_signature
+    signature = _cache_file_signature()
+    if _memory_cache is None or signature != _memory_cache_signature:
+        _memory_cache = OrderedDict(_load_transcription_cache())
+        _memory_cache_signature = signature
+    return _memory_cache
+
+def _save_transcription_cache(cache: "OrderedDict[str, Dict[str, Any]]"):
+    """Sauvegarde le cache après éviction des entrées les moins récemment utilisées"""
+    global _memory_cache_signature
+    
+    total_chars = sum(len(item["text"]) for item in cache.values())
+    while cache and (len(cache) > TRANSCRIPTION_CACHE_MAX_ENTRIES or total_chars > TRANSCRIPTION_CACHE_MAX_CHARS):
+        total_chars -= len(cache.popitem(last=False)[1]["text"])
+    
+    # Écriture atomique via un fichier temporaire propre à cet appel : plusieurs
+    # processus peuvent écrire en même temps sans se partager le même fichier
+    directory = os.path.dirname(os.path.abspath(TRANSCRIPTION_CACHE_FILE))
+    fd, temp_file = tempfile.mkstemp(dir=directory, prefix=".transcription_cache.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(temp_file, TRANSCRIPTION_CACHE_FILE)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+    _memory_cache_signature = _cache_file_signature()
+
+def get_cached_transcription(cache_key: str) -> Optional[str]:
+    """Retourne une transcription en cache (et la marque comme récente), ou None
+    
+    La récence n'est mise à jour qu'en mémoire : elle est écrite avec le
+    prochain ajout, pas à chaque lecture.
+    """
+    with _cache_lock:
+        cache = _get_memory_cache()
+        item = cache.get(cache_key)
+        if item is None:
+            return None
+        
+        item["last_used"] = datetime.now().isoformat()
+        cache.move_to_end(cache_key)
+        return item["text"]
+
+def store_transcription(cache_key: str, text: str):
+    """Ajoute une transcription au cache"""
+    with _cache_lock:
+        cache = _get_memory_cache()
+        cache.pop(cache_key, None)
+        cache[cache_key] = {"text": text, "last_used": datetime.now().isoformat()}
+        try:
+            _save_transcription_cache(cache)
+        except Exception as e:
+            print(f"Erreur lors de la sauvegarde du cache de transcription : {str(e)}")
+
+def clear_transcription_cache():
+    """Vide le cache des transcriptions"""
+    global _memory_cache
+    with _cache_lock:
+        _memory_cache = None
+        if os.path.exists(TRANSCRIPTION_CACHE_FILE):
+            os.remove(TRANSCRIPTION_CACHE_FILE)
+
+def transcribe_audio(audio: AudioInput, language: str = "fr") -> str:
+    """Transcrit un audio (chemin, octets ou objet fichier) en texte"""
+    try:
+        validate_language(language)
+        audio_data = read_audio_bytes(audio)
+        
+        # Le cache est consulté avant même de charger le modèle
+        model_id = f"{WHISPER_MODEL_NAME}/{WHISPER_PROFILE}"
+        cache_key = transcription_cache_key(audio_data, model_id, language)
+        cached_text = get_cached_transcription(cache_key)
+        if cached_text is not None:
+            return cached_text
+        
+        # Décodage en mémoire : le tableau est passé tel quel au modèle
+        samples = decode_audio(audio_data)
+        text = run_whisper(samples, language=language)
+        
+        store_transcription(cache_key, text)
+        return text
+    except TranscriptionInputError as e:
+        raise TranscriptionInputError(f"Erreur lors de la transcription : {str(e)}")
+    except Exception as e:
+        raise Exception(f"Erreur lors de la transcription : {str(e)}")
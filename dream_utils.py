@@ -1,354 +1,288 @@
-import whisper
-import requests
 import os
 import json
-import re
+import importlib
+import itertools
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from dotenv import load_dotenv
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Iterator, Tuple
+import dream_archive
+import dream_backup
+import dream_media
+import dream_rollups
+import dream_storage
+from dream_records import CompactHistory
+# Fonctions d'analyse (bibliothèque standard uniquement), réexportées pour compatibilité
+from dream_analysis import (
+    analyze_dream,
+    generate_comprehensive_interpretation,
+    get_interpretation,
+    migrate_analysis,
+    identify_dream_themes,
+    generate_psychological_insights,
+    calculate_complexity_score
+)
 
-load_dotenv()
+# Whisper/torch/numpy (transcription) et requests (images) ne sont importés
+# qu'à la première utilisation : l'interface et le stockage démarrent sans eux
+_TRANSCRIPTION_ATTRIBUTES = (
+    "AUDIO_SAMPLE_RATE", "WHISPER_MODEL_NAME", "WHISPER_PROFILE", "WHISPER_THREADS", "WHISPER_PROFILES",
+    "TRANSCRIPTION_CACHE_FILE", "read_audio_bytes", "decode_audio", "get_whisper_model", "run_whisper",
+    "transcription_cache_key", "get_cached_transcription", "store_transcription", "clear_transcription_cache"
+)
 
-# Configuration des modèles
-whisper_model = whisper.load_model("base")
-
-# Fichier de stockage des rêves
+# Ancien fichier de stockage unique, migré vers dream_storage (utilisateur par défaut)
 DREAMS_FILE = "dreams_history.json"
+_legacy_migrated = False
 
-def transcribe_audio(audio_path: str) -> str:
-    """Transcrit un fichier audio en texte"""
-    try:
-        result = whisper_model.transcribe(audio_path, language="fr")
-        return result["text"]
-    except Exception as e:
-        raise Exception(f"Erreur lors de la transcription : {str(e)}")
+# Le fichier .env est lu au premier accès au stockage plutôt qu'à l'import
+_env_loaded = False
 
-def generate_image(prompt: str) -> str:
-    """Génère une image à partir d'un prompt"""
-    api_key = os.getenv("CLIPDROP_API_KEY")
-    if not api_key:
-        raise Exception("La clé API Clipdrop n'est pas définie dans .env")
-    
-    # Amélioration du prompt pour de meilleures images
-    enhanced_prompt = f"dream interpretation, surreal, mystical, {prompt}, high quality, detailed, artistic"
-    
-    url = "https://clipdrop-api.co/text-to-image/v1"
-    
-    try:
-        response = requests.post(
-            url,
-            headers={"x-api-key": api_key},
-            json={
-                "prompt": enhanced_prompt,
-                
-            }
-        )
-        
-        if response.status_code == 200:
-            # Nom de fichier unique
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"dream_image_{timestamp}.png"
-            
-            with open(filename, "wb") as f:
-                f.write(response.content)
-            return filename
-        else:
-            raise Exception(f"Erreur génération image : {response.status_code}, {response.text}")
-    except Exception as e:
-        raise Exception(f"Erreur lors de la génération d'image : {str(e)}")
-
-def analyze_dream(dream_text: str) -> Dict[str, Any]:
-    """Analyse un rêve et retourne une interprétation complète"""
-    
-    # Dictionnaire étendu des symboles de rêve
-    dream_symbols = {
-        "eau": "émotions, inconscient, purification, fluidité",
-        "feu": "passion, transformation, énergie, destruction créatrice",
-        "voler": "liberté, évasion, aspiration, dépassement de soi",
-        "chute": "perte de contrôle, anxiété, peur de l'échec",
-        "animal": "instincts, nature primitive, aspects refoulés",
-        "maison": "soi, psyché, sécurité, intimité",
-        "mort": "transformation, fin d'un cycle, renaissance",
-        "enfant": "innocence, nouveau départ, potentiel",
-        "serpent": "transformation, sagesse cachée, guérison",
-        "chat": "indépendance, mystère, intuition féminine",
-        "chien": "loyauté, amitié, protection, fidélité",
-        "arbre": "croissance, stabilité, connexion terre-ciel",
-        "montagne": "défi, objectif, élévation spirituelle",
-        "océan": "inconscient collectif, immensité, émotions profondes",
-        "lumière": "connaissance, espoir, révélation, clarté",
-        "obscurité": "inconnu, peur, mystère, potentiel caché",
-        "pont": "transition, connexion, passage",
-        "escalier": "progression, évolution, ascension",
-        "miroir": "introspection, vérité, conscience de soi",
-        "clé": "solution, accès, révélation, pouvoir",
-        "porte": "opportunité, passage, choix, seuil",
-        "voiture": "contrôle, direction de vie, autonomie",
-        "avion": "ambitions élevées, perspective, voyage spirituel",
-        "école": "apprentissage, évaluation, retour au passé",
-        "hôpital": "guérison, vulnérabilité, besoin de soins",
-        "nourriture": "besoins fondamentaux, nourriture spirituelle",
-        "argent": "valeur personnelle, sécurité, pouvoir",
-        "bijoux": "valeur cachée, beauté intérieure, préciosité",
-        "livre": "connaissance, sagesse, recherche de vérité",
-        "téléphone": "communication, besoin de connexion",
-        "bébé": "nouveau projet, vulnérabilité, responsabilité"
-    }
-    
-    # Analyse des symboles présents
-    symbols_found = []
-    dream_lower = dream_text.lower()
-    
-    for symbol, meaning in dream_symbols.items():
-        if symbol in dream_lower:
-            symbols_found.append(symbol)
-    
-    # Analyse des émotions étendues
-    emotion_words = {
-        "peur": ["peur", "effrayé", "terrifié", "anxieux", "angoissé", "inquiet", "paniqué"],
-        "joie": ["heureux", "joyeux", "content", "ravi", "euphorie", "délice", "bonheur"],
-        "tristesse": ["triste", "mélancolique", "déprimé", "chagrin", "peine", "mélancolie"],
-        "colère": ["colère", "furieux", "irrité", "rage", "énervé", "agacé", "indigné"],
-        "surprise": ["surpris", "étonné", "choqué", "stupéfait", "sidéré", "ébahi"],
-        "sérénité": ["calme", "paisible", "serein", "tranquille", "apaisé", "zen"],
-        "amour": ["amour", "tendresse", "affection", "passion", "attachement"],
-        "nostalgie": ["nostalgie", "mélancolie", "regret", "souvenir", "passé"],
-        "confusion": ["confus", "perdu", "déboussolé", "désorienté", "trouble"],
-        "excitation": ["excité", "stimulé", "enthousiaste", "fébrile", "survolté"]
-    }
-    
-    emotions_detected = []
-    for emotion, words in emotion_words.items():
-        if any(word in dream_lower for word in words):
-            emotions_detected.append(emotion)
-    
-    # Génération d'une interprétation riche
-    interpretation = generate_comprehensive_interpretation(dream_text, symbols_found, emotions_detected)
-    
-    return {
-        "interpretation": interpretation,
-        "symbols": symbols_found,
-        "emotions": emotions_detected,
-        "word_count": len(dream_text.split()),
-        "complexity_score": calculate_complexity_score(dream_text),
-        "themes": identify_dream_themes(dream_text, symbols_found),
-        "psychological_insights": generate_psychological_insights(symbols_found, emotions_detected)
-    }
+# Vues dérivées de l'historique (historique compact, mots récurrents) mises en
+# cache par journal, et recalculées dès qu'une partition change
+HISTORY_CACHE_SIZE = 16
+_history_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_history_cache_lock = threading.Lock()
 
-def generate_comprehensive_interpretation(dream_text: str, symbols: List[str], emotions: List[str]) -> str:
-    """Génère une interprétation complète et riche du rêve"""
-    
-    interpretation_parts = []
-    
-    # Introduction personnalisée
-    if emotions:
-        dominant_emotion = emotions[0]
-        if dominant_emotion == "peur":
-            interpretation_parts.append("Votre rêve semble refléter des préoccupations ou anxiétés actuelles.")
-        elif dominant_emotion == "joie":
-            interpretation_parts.append("Ce rêve révèle un état d'esprit positif et optimiste.")
-        elif dominant_emotion == "tristesse":
-            interpretation_parts.append("Votre rêve exprime peut-être un besoin de guérison émotionnelle.")
-        else:
-            interpretation_parts.append("Votre rêve révèle une riche palette d'émotions à explorer.")
-    else:
-        interpretation_parts.append("Votre rêve offre des insights fascinants sur votre monde intérieur.")
-    
-    # Analyse approfondie des symboles
-    if symbols:
-        interpretation_parts.append(f"\n🔮 **Symboles identifiés** : {', '.join(symbols)}")
-        
-        # Analyse spécifique par symbole
-        for symbol in symbols[:3]:  # Limiter aux 3 premiers pour éviter la surcharge
-            if symbol == "eau":
-                interpretation_parts.append("• L'eau représente vos émotions profondes et votre capacité d'adaptation. Elle peut indiquer un besoin de purification ou de renouveau émotionnel.")
-            elif symbol == "voler":
-                interpretation_parts.append("• Le vol symbolise votre désir de liberté et d'évasion. Vous aspirez peut-être à dépasser vos limitations actuelles.")
-            elif symbol == "maison":
-                interpretation_parts.append("• La maison reflète votre état psychologique intime. Elle peut révéler comment vous vous sentez en sécurité ou non dans votre vie.")
-            elif symbol == "animal":
-                interpretation_parts.append("• Les animaux dans vos rêves représentent vos instincts naturels et vos aspects les plus authentiques.")
-            elif symbol == "mort":
-                interpretation_parts.append("• La mort symbolise une transformation profonde, la fin d'une période et le début d'une nouvelle phase de vie.")
-            elif symbol == "lumière":
-                interpretation_parts.append("• La lumière représente la connaissance, l'espoir et la clarté qui émergent dans votre conscience.")
-            elif symbol == "obscurité":
-                interpretation_parts.append("• L'obscurité peut symboliser l'inconnu qui vous intrigue ou des aspects de vous-même à explorer.")
-    
-    # Analyse des émotions
-    if emotions:
-        interpretation_parts.append(f"\n💭 **Climat émotionnel** : {', '.join(emotions)}")
-        
-        if "peur" in emotions and "joie" in emotions:
-            interpretation_parts.append("• Le mélange de peur et de joie suggère une période de transition où excitation et appréhension coexistent.")
-        elif "peur" in emotions:
-            interpretation_parts.append("• La peur présente peut refléter des anxiétés actuelles ou anticiper des défis à venir.")
-        elif "joie" in emotions:
-            interpretation_parts.append("• Les sentiments positifs indiquent un alignement avec vos valeurs profondes et vos aspirations.")
-        elif "tristesse" in emotions:
-            interpretation_parts.append("• La tristesse peut signaler un besoin de guérison ou d'acceptation d'une perte.")
-        
-        if "sérénité" in emotions:
-            interpretation_parts.append("• La sérénité suggère que vous trouvez un équilibre intérieur malgré les défis.")
-    
-    # Analyse des patterns narratifs
-    dream_lower = dream_text.lower()
-    
-    # Analyse du mouvement dans le rêve
-    if any(word in dream_lower for word in ["course", "courir", "fuite", "poursuivre"]):
-        interpretation_parts.append("\n🏃 **Dynamique de mouvement** : Le thème de la course ou de la fuite suggère un désir d'échapper à une situation ou au contraire de poursuivre un objectif.")
-    
-    if any(word in dream_lower for word in ["chute", "tomber", "glisser"]):
-        interpretation_parts.append("\n⬇️ **Dynamique de chute** : La chute peut représenter une perte de contrôle ou la peur d'échouer dans un domaine important.")
-    
-    # Analyse des relations dans le rêve
-    if any(word in dream_lower for word in ["famille", "mère", "père", "enfant", "frère", "sœur"]):
-        interpretation_parts.append("\n👨‍👩‍👧‍👦 **Dimension familiale** : La présence de la famille suggère des questions liées à vos racines, votre identité ou vos relations proches.")
-    
-    if any(word in dream_lower for word in ["ami", "amour", "couple", "partenaire"]):
-        interpretation_parts.append("\n💕 **Dimension relationnelle** : Les relations dans votre rêve reflètent vos besoins de connexion et d'intimité.")
-    
-    # Conseils et perspectives
-    interpretation_parts.append("\n✨ **Perspectives** :")
-    
-    if symbols and emotions:
-        if "eau" in symbols and "sérénité" in emotions:
-            interpretation_parts.append("• Votre rêve suggère une période propice à l'introspection et à la guérison émotionnelle.")
-        elif "voler" in symbols and "joie" in emotions:
-            interpretation_parts.append("• C'est peut-être le moment d'oser prendre des risques créatifs ou professionnels.")
-        elif "maison" in symbols and "peur" in emotions:
-            interpretation_parts.append("• Explorez ce qui vous fait vous sentir en sécurité ou vulnérable dans votre environnement actuel.")
-        else:
-            interpretation_parts.append("• Considérez ce rêve comme une invitation à explorer les aspects de votre vie qu'il met en lumière.")
-    
-    interpretation_parts.append("• Gardez un journal de vos rêves pour identifier des patterns récurrents.")
-    interpretation_parts.append("• Méditez sur les émotions ressenties pour mieux comprendre leurs messages.")
-    
-    return "\n".join(interpretation_parts)
+# Mots ignorés par get_recurring_words
+COMMON_WORDS = {"le", "la", "les", "de", "des", "du", "un", "une", "et", "ou", "mais", "donc", "car", "ni", "je", "tu", "il", "elle", "nous", "vous", "ils", "elles", "que", "qui", "dont", "où", "dans", "sur", "avec", "sans", "pour", "par", "à", "au", "aux", "ce", "cette", "ces", "mon", "ma", "mes", "ton", "ta", "tes", "son", "sa", "ses", "notre", "votre", "leur", "leurs"}
 
-def identify_dream_themes(dream_text: str, symbols: List[str]) -> List[str]:
-    """Identifie les thèmes principaux du rêve"""
-    
-    themes = []
-    dream_lower = dream_text.lower()
-    
-    # Thèmes basés sur les symboles
-    transformation_symbols = ["mort", "serpent", "feu", "eau", "papillon"]
-    if any(symbol in symbols for symbol in transformation_symbols):
-        themes.append("Transformation")
-    
-    freedom_symbols = ["voler", "oiseau", "ciel", "montagne"]
-    if any(symbol in symbols for symbol in freedom_symbols):
-        themes.append("Liberté")
-    
-    security_symbols = ["maison", "famille", "enfant", "cocon"]
-    if any(symbol in symbols for symbol in security_symbols):
-        themes.append("Sécurité")
-    
-    # Thèmes basés sur le contenu textuel
-    if any(word in dream_lower for word in ["travail", "bureau", "collègue", "patron"]):
-        themes.append("Vie professionnelle")
-    
-    if any(word in dream_lower for word in ["amour", "couple", "mariage", "baiser"]):
-        themes.append("Relations amoureuses")
-    
-    if any(word in dream_lower for word in ["école", "examen", "étude", "apprendre"]):
-        themes.append("Apprentissage")
-    
-    if any(word in dream_lower for word in ["voyage", "partir", "route", "destination"]):
-        themes.append("Voyage/Quête")
-    
-    if any(word in dream_lower for word in ["passé", "enfance", "souvenir", "nostalgie"]):
-        themes.append("Passé/Mémoire")
-    
-    return themes
+def __getattr__(name: str):
+    """Accès paresseux aux attributs de transcription déplacés dans dream_transcription"""
+    if name in _TRANSCRIPTION_ATTRIBUTES:
+        return getattr(importlib.import_module("dream_transcription"), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-def generate_psychological_insights(symbols: List[str], emotions: List[str]) -> List[str]:
-    """Génère des insights psychologiques basés sur les symboles et émotions"""
-    
-    insights = []
-    
-    # Insights basés sur les combinaisons symboles/émotions
-    if "eau" in symbols and "peur" in emotions:
-        insights.append("Possible anxiété face à vos émotions profondes")
-    
-    if "voler" in symbols and "joie" in emotions:
-        insights.append("Forte aspiration à la liberté et à l'accomplissement")
-    
-    if "maison" in symbols and "sérénité" in emotions:
-        insights.append("Sentiment de sécurité intérieure bien établi")
-    
-    if "mort" in symbols and "tristesse" in emotions:
-        insights.append("Processus de deuil ou acceptation d'un changement")
-    
-    # Insights basés sur les émotions multiples
-    if len(emotions) > 2:
-        insights.append("Richesse émotionnelle complexe nécessitant de l'attention")
-    
-    if "peur" in emotions and "joie" in emotions:
-        insights.append("Ambivalence face à une situation de changement")
-    
-    # Insights basés sur les symboles
-    if len(symbols) > 3:
-        insights.append("Rêve riche en symboles indiquant une période de transformation")
-    
-    if "lumière" in symbols and "obscurité" in symbols:
-        insights.append("Processus d'intégration entre conscient et inconscient")
-    
-    return insights
+def transcribe_audio(audio, language: str = "fr") -> str:
+    """Transcrit un audio (chemin, octets ou objet fichier) en texte
+
+    Whisper et torch sont chargés au premier appel (voir dream_transcription).
+    """
+    from dream_transcription import transcribe_audio as _transcribe_audio
+    return _transcribe_audio(audio, language=language)
+
+def generate_image(prompt: str, analysis: Dict[str, Any] = None, style: str = None, mood: str = None) -> str:
+    """Génère une image à partir d'un prompt et de l'analyse (requests est chargé au premier appel)
+
+    Le moteur est choisi par DREAM_IMAGE_BACKEND (voir dream_images).
+    """
+    from dream_images import generate_image as _generate_image
+    return _generate_image(prompt, analysis=analysis, style=style, mood=mood)
+
+def _load_env():
+    """Charge le fichier .env une seule fois, au premier accès au stockage"""
+    global _env_loaded
+    if not _env_loaded:
+        _env_loaded = True
+        from dotenv import load_dotenv
+        load_dotenv()
+
+def _resolve_user(user_id: str = None) -> str:
+    """Résout l'utilisateur (par défaut si absent) et migre l'ancien fichier unique au besoin"""
+    global _legacy_migrated
+    
+    _load_env()
+    user_id = dream_storage.safe_user_id(user_id)
+    if user_id == dream_storage.DEFAULT_USER and not _legacy_migrated:
+        _legacy_migrated = True
+        if dream_storage.migrate_legacy_file(DREAMS_FILE, user_id):
+            # Les références d'images incluent désormais l'utilisateur
+            for dream in dream_storage.load_user_history(user_id):
+                if dream.get("image_path"):
+                    dream_media.add_reference(dream["image_path"], dream_reference(dream, user_id))
+                    dream_media.remove_reference(dream["image_path"], dream.get("date", ""), delete_orphan=False)
+    return user_id
+
+def _rollups_file(user_id: str) -> str:
+    return dream_storage.user_file(user_id, dream_rollups.ROLLUPS_FILE)
+
+def dream_reference(dream: Dict[str, Any], user_id: str = None) -> str:
+    """Identifiant d'une entrée de rêve utilisé dans l'index des images"""
+    return f"{dream_storage.safe_user_id(user_id)}/{dream.get('date', '')}"
 
-def calculate_complexity_score(dream_text: str) -> float:
-    """Calcule un score de complexité du rêve"""
+def save_dream_entry(dream_entry: Dict[str, Any], user_id: str = None):
+    """Sauvegarde une entrée de rêve dans la partition de l'utilisateur"""
+    save_dream_entries([dream_entry], user_id=user_id)
+
+def save_dream_entries(dream_entries: List[Dict[str, Any]], user_id: str = None):
+    """Sauvegarde un lot d'entrées en une seule écriture par partition touchée"""
     
-    # Facteurs de complexité
-    word_count = len(dream_text.split())
-    sentence_count = len(re.split(r'[.!?]+', dream_text))
+    user_id = _resolve_user(user_id)
     
-    # Présence de mots complexes
-    complex_words = ["transformation", "métamorphose", "symbolique", "mystérieux", "surréaliste"]
-    complex_word_count = sum(1 for word in complex_words if word in dream_text.lower())
+    # Le verrou du journal couvre l'écriture et la mise à jour incrémentale des
+    # agrégats : une reconstruction concurrente (_get_rollups) voit soit les
+    # deux, soit aucune, et ne compte jamais un rêve deux fois
+    with dream_storage.user_lock(user_id):
+        # Seules les partitions des entrées sont réécrites
+        try:
+            dream_storage.append_entries(user_id, dream_entries)
+        except Exception as e:
+            raise Exception(f"Erreur lors de la sauvegarde : {str(e)}")
+        
+        dream_rollups.record_dreams(dream_entries, rollups_file=_rollups_file(user_id))
     
-    # Score basé sur différents critères
-    length_score = min(word_count / 100, 1.0)  # Normalisé sur 100 mots
-    structure_score = min(sentence_count / 10, 1.0)  # Normalisé sur 10 phrases
-    complexity_word_score = min(complex_word_count / 5, 1.0)  # Normalisé sur 5 mots complexes
+    # Référencer les images pour qu'elles échappent à la collecte des orphelines
+    for dream_entry in dream_entries:
+        if dream_entry.get("image_path"):
+            dream_media.add_reference(dream_entry["image_path"], dream_reference(dream_entry, user_id))
     
-    final_score = (length_score + structure_score + complexity_word_score) / 3
-    return round(final_score * 10, 1)  # Score sur 10
+    # Journal des changements pour les sauvegardes incrémentales
+    for dream_entry in dream_entries:
+        dream_backup.log_change("insert", user_id, dream_entry)
 
-def save_dream_entry(dream_entry: Dict[str, Any]):
-    """Sauvegarde une entrée de rêve dans le fichier JSON"""
+def load_dream_history(user_id: str = None, start: datetime = None, end: datetime = None,
+                       include_archive: bool = False) -> List[Dict[str, Any]]:
+    """Charge l'historique des rêves d'un utilisateur (éventuellement limité à une plage de dates)
     
-    # Charger l'historique existant
-    history = load_dream_history()
+    Seuls les rêves récents sont lus par défaut ; include_archive=True ajoute,
+    en tête, les rêves de l'archive froide (voir apply_retention_policy).
+    """
     
-    # Ajouter la nouvelle entrée
-    history.append(dream_entry)
+    user_id = _resolve_user(user_id)
+    start = start.date() if isinstance(start, datetime) else start
+    end = end.date() if isinstance(end, datetime) else end
     
-    # Sauvegarder
     try:
-        with open(DREAMS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(history, f, ensure_ascii=False, indent=2)
-    except Exception as e:
-        raise Exception(f"Erreur lors de la sauvegarde : {str(e)}")
-
-def load_dream_history() -> List[Dict[str, Any]]:
-    """Charge l'historique des rêves depuis le fichier JSON"""
-    
-    if not os.path.exists(DREAMS_FILE):
-        return []
-    
-    try:
-        with open(DREAMS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        history = dream_storage.load_user_history(user_id, start=start, end=end)
+        if include_archive:
+            history = list(dream_archive.iter_cold_history(user_id, start=start, end=end)) + history
+        return history
     except Exception as e:
         print(f"Erreur lors du chargement de l'historique : {str(e)}")
         return []
 
-def get_dream_statistics() -> Dict[str, Any]:
-    """Calcule des statistiques sur les rêves enregistrés"""
+def iter_dream_locations(user_id: str = None, include_archive: bool = False) -> Iterator[Tuple[tuple, Dict[str, Any]]]:
+    """Parcourt les rêves (dans l'ordre de load_dream_history) avec leur emplacement
+    
+    L'emplacement (niveau, partition, début, fin) situe l'entrée en octets dans
+    le JSON de sa partition : load_dreams_at la relit sans décoder les autres.
+    Une seule partition est en mémoire à la fois.
+    """
+    user_id = _resolve_user(user_id)
+    partitions = [("hot", key) for key in dream_storage.list_partitions(user_id)]
+    if include_archive:
+        partitions = [("cold", month) for month in dream_archive.list_cold_months(user_id)] + partitions
+    
+    for tier, key in partitions:
+        try:
+            if tier == "cold":
+                text = dream_archive.read_cold_month_bytes(user_id, key).decode('utf-8')
+            else:
+                text = dream_storage.read_partition_text(user_id, key)
+            for start, end, dream in dream_storage.iter_json_entries(text):
+                yield (tier, key, start, end), dream
+        except ValueError as e:
+            print(f"Erreur lors de la lecture de la partition {key} : {str(e)}")
+
+def load_dreams_at(user_id: str, locations: List[tuple]) -> List[Dict[str, Any]]:
+    """Relit les rêves aux emplacements donnés (voir iter_dream_locations), dans le même ordre
+    
+    Lève une exception si un emplacement n'est plus lisible (partition réécrite
+    depuis leur calcul) : les emplacements doivent alors être recalculés.
+    """
+    user_id = _resolve_user(user_id)
+    cold_months = {}
+    dreams = []
+    for tier, key, start, end in locations:
+        try:
+            if tier == "cold":
+                # Un mois archivé est décompressé en entier, une seule fois
+                if key not in cold_months:
+                    cold_months[key] = dream_archive.read_cold_month_bytes(user_id, key)
+                data = cold_months[key][start:end]
+            else:
+                data = dream_storage.read_partition_range(user_id, key, start, end)
+            dreams.append(json.loads(data))
+        except (OSError, ValueError) as e:
+            raise Exception(f"Erreur lors de la relecture d'un rêve ({tier}/{key}) : {str(e)}")
+    return dreams
+
+def _cached_history_view(kind: str, user_id: str, include_archive: bool, build):
+    """Vue dérivée de l'historique, reconstruite seulement si les partitions ont changé"""
+    user_id = _resolve_user(user_id)
+    signature = dream_storage.partition_signature(user_id)
+    if include_archive:
+        signature += (dream_archive.archive_signature(user_id),)
+    key = (kind, user_id, include_archive)
+    
+    with _history_cache_lock:
+        cached = _history_cache.get(key)
+        if cached is not None and cached[0] == signature:
+            _history_cache.move_to_end(key)
+            return cached[1]
+    
+    # Une écriture pendant la construction change l'empreinte : la vue sera reconstruite au prochain appel
+    value = build(user_id)
+    with _history_cache_lock:
+        _history_cache[key] = (signature, value)
+        _history_cache.move_to_end(key)
+        while len(_history_cache) > HISTORY_CACHE_SIZE:
+            _history_cache.popitem(last=False)
+    return value
+
+def load_compact_history(user_id: str = None, include_archive: bool = False) -> Tuple[CompactHistory, List[tuple]]:
+    """Historique compact d'un utilisateur et emplacement de chaque rêve (voir load_dreams_at)
+    
+    Construit partition par partition, sans garder les entrées complètes, et
+    mis en cache tant que les partitions ne changent pas.
+    """
+    def build(user_id):
+        compact = CompactHistory()
+        locations = []
+        for location, dream in iter_dream_locations(user_id, include_archive):
+            compact.add(dream)
+            locations.append(location)
+        return compact, locations
+    
+    return _cached_history_view("compact", user_id, include_archive, build)
+
+def get_recurring_words(user_id: str = None, include_archive: bool = False, top: int = 10) -> Dict[str, int]:
+    """Mots les plus fréquents des récits (hors mots courants et mots de moins de 4 lettres)"""
+    def build(user_id):
+        word_counts = {}
+        for _, dream in iter_dream_locations(user_id, include_archive):
+            for word in dream["text"].lower().split():
+                if len(word) > 3 and word not in COMMON_WORDS:
+                    word_counts[word] = word_counts.get(word, 0) + 1
+        return word_counts
+    
+    word_counts = _cached_history_view("words", user_id, include_archive, build)
+    return dict(sorted(word_counts.items(), key=lambda x: x[1], reverse=True)[:top])
+
+def get_dream_statistics(user_id: str = None, columnar: bool = False, include_archive: bool = False) -> Dict[str, Any]:
+    """Calcule des statistiques sur les rêves enregistrés d'un utilisateur
+
+    Avec columnar=True, le calcul lit l'archive colonnaire au lieu des
+    partitions JSON si elle est à jour (voir build_columnar_archive, ou
+    python dream_columnar.py build). Avec include_archive=True, les rêves de
+    l'archive froide sont comptés.
+    """
+    if columnar:
+        archive = _open_columnar_archive(user_id, include_archive)
+        if archive is not None:
+            return archive.statistics()
+    return compute_dream_statistics(load_dream_history(user_id, include_archive=include_archive))
+
+def get_admin_statistics(include_archive: bool = False) -> Dict[str, Any]:
+    """Statistiques d'administration agrégées sur toutes les partitions utilisateur"""
+    
+    _resolve_user(None)
     
-    history = load_dream_history()
+    users = {}
+    all_dreams = []
+    for user_id in dream_storage.list_users():
+        history = load_dream_history(user_id, include_archive=include_archive)
+        users[user_id] = len(history)
+        all_dreams.extend(history)
+    
+    return {
+        "total_users": len(users),
+        "dreams_per_user": users,
+        "global": compute_dream_statistics(all_dreams)
+    }
+
+def compute_dream_statistics(history: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Calcule des statistiques sur une liste de rêves"""
     
     if not history:
         return {}
@@ -425,14 +359,21 @@ def calculate_dream_frequency(dates: List[datetime]) -> float:
     period_weeks = period_days / 7
     return round(len(dates) / period_weeks, 1)
 
-def search_dreams(query: str, dream_history: List[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-    """Recherche dans l'historique des rêves"""
+def search_dreams(query: str, dream_history: List[Dict[str, Any]] = None, user_id: str = None,
+                  include_archive: bool = False) -> List[Dict[str, Any]]:
+    """Recherche dans l'historique des rêves d'un utilisateur
+    
+    Avec include_archive=True, la recherche continue dans l'archive froide,
+    décompressée un mois à la fois.
+    """
     
     if dream_history is None:
-        dream_history = load_dream_history()
+        dream_history = load_dream_history(user_id)
+        if include_archive:
+            dream_history = itertools.chain(dream_archive.iter_cold_history(_resolve_user(user_id)), dream_history)
     
     if not query.strip():
-        return dream_history
+        return list(dream_history)
     
     query_lower = query.lower()
     results = []
@@ -462,13 +403,13 @@ def search_dreams(query: str, dream_history: List[Dict[str, Any]] = None) -> Lis
     
     return results
 
-def export_dreams_to_json(filename: str = None) -> str:
-    """Exporte tous les rêves vers un fichier JSON"""
+def export_dreams_to_json(filename: str = None, user_id: str = None) -> str:
+    """Exporte tous les rêves d'un utilisateur (archive froide comprise) vers un fichier JSON"""
     
     if filename is None:
         filename = f"dreams_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     
-    history = load_dream_history()
+    history = load_dream_history(user_id, include_archive=True)
     
     try:
         with open(filename, 'w', encoding='utf-8') as f:
@@ -477,8 +418,8 @@ def export_dreams_to_json(filename: str = None) -> str:
     except Exception as e:
         raise Exception(f"Erreur lors de l'export : {str(e)}")
 
-def import_dreams_from_json(filename: str) -> int:
-    """Importe des rêves depuis un fichier JSON"""
+def import_dreams_from_json(filename: str, user_id: str = None) -> int:
+    """Importe des rêves depuis un fichier JSON dans le journal d'un utilisateur"""
     
     if not os.path.exists(filename):
         raise Exception(f"Le fichier {filename} n'existe pas")
@@ -492,7 +433,8 @@ def import_dreams_from_json(filename: str) -> int:
             raise Exception("Le fichier doit contenir une liste de rêves")
         
         # Charger l'historique existant
-        existing_history = load_dream_history()
+        user_id = _resolve_user(user_id)
+        existing_history = load_dream_history(user_id, include_archive=True)
         
         # Éviter les doublons basés sur la date et le texte
         existing_keys = set()
@@ -508,39 +450,36 @@ def import_dreams_from_json(filename: str) -> int:
                 new_dreams.append(dream)
                 existing_keys.add(key)
         
-        # Sauvegarder l'historique mis à jour
-        updated_history = existing_history + new_dreams
-        
-        with open(DREAMS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(updated_history, f, ensure_ascii=False, indent=2)
+        # Sauvegarder uniquement les partitions touchées par les nouveaux rêves
+        save_dream_entries(new_dreams, user_id=user_id)
         
         return len(new_dreams)
         
     except Exception as e:
         raise Exception(f"Erreur lors de l'import : {str(e)}")
 
-def delete_dream(dream_index: int) -> bool:
-    """Supprime un rêve de l'historique"""
+def delete_dream(dream_index: int, user_id: str = None) -> bool:
+    """Supprime un rêve de l'historique d'un utilisateur"""
     
-    history = load_dream_history()
+    user_id = _resolve_user(user_id)
+    history = load_dream_history(user_id)
     
     if 0 <= dream_index < len(history):
-        # Supprimer le fichier image associé si il existe
+        # Détacher l'image associée (supprimée si plus aucun rêve ne l'utilise)
         dream = history[dream_index]
         image_path = dream.get("image_path", "")
-        if image_path and os.path.exists(image_path):
+        if image_path and not dream_media.remove_reference(image_path, dream_reference(dream, user_id)) and os.path.exists(image_path):
             try:
-                os.remove(image_path)
+                os.remove(image_path)  # Image antérieure au stockage dream_media
             except:
                 pass  # Ignorer les erreurs de suppression d'image
         
-        # Supprimer l'entrée
-        history.pop(dream_index)
-        
-        # Sauvegarder
+        # Supprimer l'entrée de sa partition
         try:
-            with open(DREAMS_FILE, 'w', encoding='utf-8') as f:
-                json.dump(history, f, ensure_ascii=False, indent=2)
+            with dream_storage.user_lock(user_id):
+                dream_storage.remove_entry(user_id, dream)
+                dream_rollups.record_dreams([dream], delta=-1, rollups_file=_rollups_file(user_id))
+            dream_backup.log_change("delete", user_id, dream)
             return True
         except Exception as e:
             raise Exception(f"Erreur lors de la suppression : {str(e)}")
@@ -548,35 +487,268 @@ def delete_dream(dream_index: int) -> bool:
     return False
 
 def cleanup_old_images(days_old: int = 30):
-    """Nettoie les images anciennes pour libérer de l'espace"""
+    """Supprime les images plus référencées par aucun rêve depuis au moins days_old jours"""
+    
+    # L'index du stockage suffit : aucun parcours du système de fichiers
+    return dream_media.collect_orphans(older_than_days=days_old)
+
+def migrate_images_to_media_store(user_id: str = None) -> int:
+    """Déplace les images historiques (dream_image_*.png) d'un utilisateur dans le stockage dream_media"""
+    
+    user_id = _resolve_user(user_id)
+    history = load_dream_history(user_id)
+    migrated = []
+    references = {}
+    
+    for dream in history:
+        image_path = dream.get("image_path", "")
+        if not image_path:
+            continue
+        
+        if not dream_media.is_managed(image_path) and os.path.exists(image_path):
+            try:
+                previous = dict(dream)
+                dream["image_path"] = dream_media.import_image(image_path, dream_reference(dream, user_id))
+                migrated.append((previous, dream))
+            except Exception as e:
+                print(f"Erreur lors de la migration de {image_path} : {str(e)}")
+        
+        references.setdefault(dream["image_path"], []).append(dream_reference(dream, user_id))
+    
+    if migrated:
+        try:
+            dream_storage.replace_user_history(user_id, history)
+        except Exception as e:
+            raise Exception(f"Erreur lors de la migration des images : {str(e)}")
+        for previous, dream in migrated:
+            dream_backup.log_change("update", user_id, dream, previous=previous)
+    
+    # Resynchroniser l'index avec tous les journaux et leurs archives (les images sont partagées entre utilisateurs)
+    for other_user in dream_storage.list_users():
+        dreams = dream_archive.iter_cold_history(other_user)
+        if other_user != user_id:
+            dreams = itertools.chain(dream_storage.load_user_history(other_user), dreams)
+        for dream in dreams:
+            if dream.get("image_path"):
+                references.setdefault(dream["image_path"], []).append(dream_reference(dream, other_user))
+    dream_media.rebuild_references(references)
+    return len(migrated)
+
+def _migrate_dreams(dreams: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """Migre en place l'interprétation de chaque rêve et retourne les couples (avant, après) modifiés"""
+    migrated = []
+    for dream in dreams:
+        previous = json.loads(json.dumps(dream))
+        if migrate_analysis(dream.get("analysis", {})):
+            migrated.append((previous, dream))
+    return migrated
+
+def migrate_interpretations(user_id: str = None) -> int:
+    """Remplace le texte d'interprétation des anciens rêves par ses identifiants de modèles
     
-    cutoff_date = datetime.now().timestamp() - (days_old * 24 * 60 * 60)
+    Les partitions récentes et l'archive froide (mois par mois) sont migrées.
+    Les interprétations qui ne se re-rendent pas à l'identique gardent leur
+    texte : la migration est sans perte.
+    """
     
-    # Lister tous les fichiers d'images de rêves
-    image_files = []
-    for filename in os.listdir('.'):
-        if filename.startswith('dream_image_') and filename.endswith('.png'):
-            image_files.append(filename)
+    user_id = _resolve_user(user_id)
+    migrated = []
     
-    deleted_count = 0
+    try:
+        with dream_storage.user_lock(user_id):
+            history = load_dream_history(user_id)
+            hot_migrated = _migrate_dreams(history)
+            if hot_migrated:
+                dream_storage.replace_user_history(user_id, history)
+            migrated.extend(hot_migrated)
+            
+            # Seuls les mois archivés modifiés sont réécrits, à leur date limite actuelle
+            cutoff = dream_archive.load_manifest(user_id)["cutoff"]
+            for month in dream_archive.list_cold_months(user_id):
+                month_migrated = _migrate_dreams(dream_archive.load_cold_month(user_id, month))
+                if month_migrated:
+                    dream_archive.archive_entries(user_id, [dream for _, dream in month_migrated],
+                                                  datetime.fromisoformat(cutoff))
+                migrated.extend(month_migrated)
+    except Exception as e:
+        raise Exception(f"Erreur lors de la migration des interprétations : {str(e)}")
     
-    for image_file in image_files:
+    for previous, dream in migrated:
+        dream_backup.log_change("update", user_id, dream, previous=previous)
+    return len(migrated)
+
+def backup_dreams(full: bool = False) -> Dict[str, Any]:
+    """Crée un point de contrôle des journaux de tous les utilisateurs"""
+
+    _resolve_user(None)  # L'ancien fichier unique doit être migré avant l'instantané
+    try:
+        # Les instantanés couvrent les deux niveaux : un rêve archivé reste un rêve du journal
+        return dream_backup.create_backup(
+            lambda: {user_id: load_dream_history(user_id, include_archive=True) for user_id in dream_storage.list_users()},
+            full=full
+        )
+    except Exception as e:
+        raise Exception(f"Erreur lors de la sauvegarde incrémentale : {str(e)}")
+
+def restore_dreams(point: datetime = None) -> int:
+    """Restaure tous les journaux dans leur état à une date donnée et retourne le nombre de rêves"""
+
+    _resolve_user(None)
+    try:
+        users = dream_backup.restore_point(point)
+        for user_id in set(dream_storage.list_users()) | set(users):
+            # Chaque rêve retrouve son niveau d'après la date limite d'archivage du journal
+            cutoff = dream_archive.load_manifest(user_id)["cutoff"]
+            hot, cold = users.get(user_id, []), []
+            if cutoff:
+                hot, cold = dream_archive.split_tiers(hot, datetime.fromisoformat(cutoff))
+            with dream_storage.user_lock(user_id):
+                dream_storage.replace_user_history(user_id, hot)
+                dream_archive.replace_cold_history(user_id, cold)
+                # Agrégats recalculés sur l'historique restauré complet, archive comprise
+                dream_rollups.save_rollups(dream_rollups.build_rollups(users.get(user_id, [])), _rollups_file(user_id))
+        # Nouvel instantané : les restaurations suivantes repartent de cet état
+        dream_backup.create_backup(lambda: users, full=True)
+    except Exception as e:
+        raise Exception(f"Erreur lors de la restauration : {str(e)}")
+
+    # Les références d'images suivent l'historique restauré
+    references = {}
+    for user_id, history in users.items():
+        for dream in history:
+            if dream.get("image_path"):
+                references.setdefault(dream["image_path"], []).append(dream_reference(dream, user_id))
+    dream_media.rebuild_references(references)
+    return sum(len(history) for history in users.values())
+
+def apply_retention_policy(user_id: str = None, hot_days: int = None) -> int:
+    """Déplace les rêves plus anciens que la fenêtre chaude dans l'archive froide et retourne leur nombre
+    
+    La fenêtre est de DREAM_HOT_DAYS jours (365 par défaut). Le texte et
+    l'analyse sont compressés (zstd ou gzip) ; les images sont ré-encodées en
+    WebP avec perte. Les agrégats, qui couvrent tout le journal, ne changent pas.
+    """
+    
+    user_id = _resolve_user(user_id)
+    cutoff = dream_archive.hot_cutoff(hot_days)
+    hot, cold = dream_archive.split_tiers(load_dream_history(user_id), cutoff)
+    if not cold:
+        return 0
+    
+    recompressed = []
+    for dream in cold:
+        image_path = dream.get("image_path", "")
+        if image_path and dream_media.is_managed(image_path):
+            new_path = dream_media.recompress_image(image_path)
+            if new_path != image_path:
+                previous = dict(dream)
+                dream["image_path"] = new_path
+                dream_media.add_reference(new_path, dream_reference(dream, user_id))
+                recompressed.append((previous, dream))
+    
+    with dream_storage.user_lock(user_id):
         try:
-            # Vérifier la date de création
-            file_time = os.path.getctime(image_file)
-            if file_time < cutoff_date:
-                os.remove(image_file)
-                deleted_count += 1
-        except:
-            continue  # Ignorer les erreurs
+            # L'archive est écrite avant de retirer les rêves des partitions : un échec ne perd rien
+            dream_archive.archive_entries(user_id, cold, cutoff)
+            dream_storage.replace_user_history(user_id, hot)
+        except Exception as e:
+            raise Exception(f"Erreur lors de l'archivage : {str(e)}")
+    for previous, dream in recompressed:
+        # L'image d'origine est supprimée si plus aucun rêve ne l'utilise
+        dream_media.remove_reference(previous["image_path"], dream_reference(dream, user_id))
+        dream_backup.log_change("update", user_id, dream, previous=previous)
+    return len(cold)
+
+def _get_rollups(user_id: str) -> Dict[str, Any]:
+    """Agrégats sauvegardés d'un utilisateur (rêves récents et archivés)
+    
+    Une reconstruction relit tout le journal sous son verrou : aucune écriture
+    ne peut s'intercaler entre la lecture et la sauvegarde des agrégats.
+    """
+    with dream_storage.user_lock(user_id):
+        return dream_rollups.get_rollups(lambda: load_dream_history(user_id, include_archive=True), _rollups_file(user_id))
+
+def _columnar_dir(user_id: str) -> str:
+    return dream_storage.user_file(user_id, "columnar")
+
+def _columnar_source(user_id: str, include_archive: bool) -> Dict[str, Any]:
+    """Empreinte des données couvertes par une archive colonnaire (forme JSON, comparable au manifeste)"""
+    source = {
+        "include_archive": include_archive,
+        "partitions": dream_storage.partition_signature(user_id),
+        "archive": dream_archive.archive_signature(user_id) if include_archive else None
+    }
+    return json.loads(json.dumps(source))
+
+def build_columnar_archive(user_id: str = None, include_archive: bool = False) -> int:
+    """Construit l'archive colonnaire (mmap) de l'historique d'un utilisateur et retourne le nombre de rêves"""
+    
+    import dream_columnar  # numpy n'est chargé que pour l'archive
     
-    return deleted_count
+    user_id = _resolve_user(user_id)
+    try:
+        # Empreinte et lecture sous le verrou du journal : elles décrivent le même état
+        with dream_storage.user_lock(user_id):
+            source = _columnar_source(user_id, include_archive)
+            history = load_dream_history(user_id, include_archive=include_archive)
+        manifest = dream_columnar.build_archive(history, _columnar_dir(user_id), source=source)
+    except Exception as e:
+        raise Exception(f"Erreur lors de la construction de l'archive colonnaire : {str(e)}")
+    return manifest["count"]
 
-def get_dream_insights(dream_history: List[Dict[str, Any]] = None) -> Dict[str, Any]:
-    """Génère des insights avancés sur les rêves"""
+def _open_columnar_archive(user_id: str = None, include_archive: bool = False):
+    """Archive colonnaire de l'utilisateur, ou None si elle n'a pas été construite ou est périmée
+    
+    Une archive construite sur d'autres données (écriture depuis, ou autre
+    choix d'include_archive) est ignorée : l'appelant relit les partitions JSON.
+    """
+    import dream_columnar
+    
+    user_id = _resolve_user(user_id)
+    archive_dir = _columnar_dir(user_id)
+    if not dream_columnar.archive_exists(archive_dir):
+        return None
+    archive = dream_columnar.open_archive(archive_dir)
+    if archive.manifest.get("source") != _columnar_source(user_id, include_archive):
+        return None
+    return archive
+
+def get_dream_trends(start: datetime = None, end: datetime = None, granularity: str = None,
+                     max_points: int = dream_rollups.ROLLUP_MAX_POINTS, user_id: str = None) -> Dict[str, Any]:
+    """Séries temporelles (émotions, symboles, thèmes, types, moyennes) sur une plage de dates
+    
+    Lit uniquement les agrégats pré-calculés, qui couvrent aussi l'archive
+    froide ; la granularité est choisie automatiquement selon l'étendue si
+    elle n'est pas précisée.
+    """
+    user_id = _resolve_user(user_id)
+    rollups = _get_rollups(user_id)
+    return dream_rollups.query_rollups(
+        rollups,
+        start=start.date() if isinstance(start, datetime) else start,
+        end=end.date() if isinstance(end, datetime) else end,
+        granularity=granularity,
+        max_points=max_points
+    )
+
+def get_dream_insights(dream_history: List[Dict[str, Any]] = None, user_id: str = None,
+                       columnar: bool = False, include_archive: bool = False) -> Dict[str, Any]:
+    """Génère des insights avancés sur les rêves (columnar, include_archive : voir get_dream_statistics)
+    
+    Sans historique fourni, l'évolution des émotions vient des agrégats
+    enregistrés, qui couvrent aussi l'archive froide.
+    """
+    
+    if columnar and dream_history is None:
+        archive = _open_columnar_archive(user_id, include_archive)
+        if archive is not None:
+            return archive.insights()
     
+    # Les agrégats enregistrés couvrent tout le journal, archive comprise
+    from_argument = dream_history is not None
     if dream_history is None:
-        dream_history = load_dream_history()
+        user_id = _resolve_user(user_id)
+        dream_history = load_dream_history(user_id, include_archive=include_archive)
     
     if not dream_history:
         return {}
@@ -627,23 +799,20 @@ def get_dream_insights(dream_history: List[Dict[str, Any]] = None) -> Dict[str,
         if denominator != 0:
             correlation = numerator / denominator
     
-    # Évolution des émotions dans le temps
-    emotion_evolution = {}
-    for d in dream_history:
-        date_str = d["date"][:10]  # YYYY-MM-DD
-        emotions = d["metadata"].get("emotions", [])
-        
-        if date_str not in emotion_evolution:
-            emotion_evolution[date_str] = {}
-        
-        for emotion in emotions:
-            emotion_evolution[date_str][emotion] = emotion_evolution[date_str].get(emotion, 0) + 1
+    # Évolution des émotions dans le temps, depuis les agrégats (jour, semaine ou mois selon l'étendue)
+    if from_argument:
+        rollups = dream_rollups.build_rollups(dream_history)
+    else:
+        rollups = _get_rollups(user_id)
+    trend = dream_rollups.query_rollups(rollups)
+    emotion_evolution = {point["start"]: point["emotions"] for point in trend["points"]}
     
     insights = {
         "most_common_weekday": most_common_weekday,
         "most_common_hour": most_common_hour,
         "sleep_clarity_correlation": round(correlation, 3),
         "emotion_evolution": emotion_evolution,
+        "emotion_evolution_granularity": trend["granularity"],
         "total_analysis_period_days": (max(dates) - min(dates)).days if len(dates) > 1 else 0,
         "average_dreams_per_week": calculate_dream_frequency(dates)
     }
@@ -0,0 +1,241 @@
+"""Import en masse de rêves (textes et enregistrements audio), sans interface.
+
+Chaque élément passe par la chaîne complète transcription -> analyse ->
+image (optionnelle) -> sauvegarde. Les éléments sont traités en parallèle et
+sauvegardés par lots ; un fichier de reprise permet de relancer un import
+interrompu sans retraiter ce qui a déjà été sauvegardé.
+
+Sources acceptées :
+  - un répertoire de fichiers .txt/.md et audio (.wav, .mp3...), chacun
+    pouvant être accompagné d'un fichier <nom>.json de métadonnées
+    ({"title": ..., "date": ..., "metadata": {...}}) ;
+  - un manifeste .json (liste) ou .jsonl, dont chaque élément contient soit
+    "text", soit "path" (relatif au manifeste), plus les mêmes métadonnées.
+
+Exemple :
+    python ingest_dreams.py imports/2025-07 --user alice --workers 4 --images
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Any, Set
+
+from dream_storage import safe_user_id
+from dream_utils import analyze_dream, generate_image, load_dream_history, save_dream_entries, transcribe_audio
+
+TEXT_EXTENSIONS = (".txt", ".md")
+AUDIO_EXTENSIONS = (".wav", ".mp3", ".m4a", ".ogg", ".flac", ".webm")
+
+def _read_sidecar(path: str) -> Dict[str, Any]:
+    """Lit le fichier de métadonnées <nom>.json associé à un fichier, s'il existe"""
+    sidecar = os.path.splitext(path)[0] + ".json"
+    if not os.path.exists(sidecar):
+        return {}
+    with open(sidecar, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def collect_items(source: str) -> List[Dict[str, Any]]:
+    """Construit la liste des éléments à importer depuis un répertoire ou un manifeste"""
+    items = []
+
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            path = os.path.join(source, name)
+            extension = os.path.splitext(name)[1].lower()
+            if extension not in TEXT_EXTENSIONS + AUDIO_EXTENSIONS:
+                continue
+
+            item = _read_sidecar(path)
+            item["path"] = path
+            item["id"] = name
+            items.append(item)
+        return items
+
+    with open(source, 'r', encoding='utf-8') as f:
+        if source.endswith(".jsonl"):
+            entries = [json.loads(line) for line in f if line.strip()]
+        else:
+            entries = json.load(f)
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    for entry in entries:
+        item = dict(entry)
+        # Identifiant stable d'une exécution à l'autre : empreinte de l'élément du manifeste
+        item["id"] = hashlib.sha1(json.dumps(entry, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+        if "path" in item and not os.path.isabs(item["path"]):
+            item["path"] = os.path.join(base_dir, item["path"])
+        items.append(item)
+    return items
+
+def process_item(item: Dict[str, Any], args: argparse.Namespace) -> Dict[str, Any]:
+    """Exécute la chaîne complète sur un élément et retourne l'entrée de rêve"""
+    path = item.get("path")
+    is_audio = path is not None and path.lower().endswith(AUDIO_EXTENSIONS)
+
+    if is_audio:
+        text = transcribe_audio(path, language=args.language)
+    elif path is not None:
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+    else:
+        text = item["text"]
+
+    if item.get("date"):
+        dream_date = datetime.fromisoformat(item["date"])
+    elif path is not None:
+        dream_date = datetime.fromtimestamp(os.path.getmtime(path))
+    else:
+        dream_date = datetime.now()
+
+    analysis = analyze_dream(text)
+
+    image_path = ""
+    if args.images:
+        try:
+            image_path = generate_image(f"{text}, style {args.style}, ambiance {args.mood}",
+                                        analysis=analysis, style=args.style, mood=args.mood)
+        except Exception as e:
+            # Une image manquante ne doit pas bloquer l'import du rêve
+            print(f"\n⚠️ {item['id']} : {str(e)}", file=sys.stderr)
+
+    metadata = {
+        "input_type": "audio" if is_audio else "text",
+        "style": args.style,
+        "mood": args.mood,
+        "import_source": item["id"]
+    }
+    metadata.update(item.get("metadata", {}))
+
+    return {
+        "title": item.get("title") or f"Rêve importé du {dream_date.strftime('%d/%m/%Y')}",
+        "text": text,
+        "analysis": analysis,
+        "image_path": image_path,
+        "metadata": metadata,
+        "date": dream_date.isoformat()
+    }
+
+def load_checkpoint(checkpoint_file: str) -> Set[str]:
+    """Identifiants des éléments déjà sauvegardés lors d'une exécution précédente"""
+    if not os.path.exists(checkpoint_file):
+        return set()
+    with open(checkpoint_file, 'r', encoding='utf-8') as f:
+        return set(json.load(f).get("done", []))
+
+def save_checkpoint(checkpoint_file: str, done: Set[str]):
+    """Enregistre la progression de manière atomique"""
+    temp_file = f"{checkpoint_file}.tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump({"done": sorted(done), "updated": datetime.now().isoformat()}, f)
+    os.replace(temp_file, checkpoint_file)
+
+def imported_sources(user_id: str, item_ids: Set[str]) -> Set[str]:
+    """Identifiants d'éléments déjà présents dans le journal (metadata.import_source), archive comprise
+
+    Couvre un arrêt entre la sauvegarde d'un lot et celle du fichier de reprise.
+    """
+    return {
+        dream["metadata"]["import_source"]
+        for dream in load_dream_history(user_id, include_archive=True)
+        if dream.get("metadata", {}).get("import_source") in item_ids
+    }
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}"
+
+def _print_progress(processed: int, total: int, errors: int, started: float):
+    elapsed = time.perf_counter() - started
+    rate = processed / elapsed if elapsed > 0 else 0
+    eta = (total - processed) / rate if rate > 0 else 0
+    print(
+        f"\r[{processed}/{total}] {rate:.2f} rêves/s | ETA {_format_duration(eta)} | erreurs : {errors}",
+        end="", file=sys.stderr, flush=True
+    )
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Import en masse de rêves textes et audio")
+    parser.add_argument("source", help="Répertoire de fichiers ou manifeste .json/.jsonl")
+    parser.add_argument("--user", default=None, help="Journal de destination (utilisateur par défaut sinon)")
+    parser.add_argument("--workers", type=int, default=4, help="Nombre d'éléments traités en parallèle")
+    parser.add_argument("--batch-size", type=int, default=25, help="Nombre d'entrées par écriture dans le stockage")
+    parser.add_argument("--images", action="store_true", help="Génère une image pour chaque rêve")
+    parser.add_argument("--style", default="réaliste")
+    parser.add_argument("--mood", default="mystérieuse")
+    parser.add_argument("--language", default="fr")
+    parser.add_argument("--checkpoint", help="Fichier de reprise (par défaut : <source>.checkpoint.json)")
+    parser.add_argument("--restart", action="store_true", help="Ignore le fichier de reprise existant et les rêves déjà importés")
+    args = parser.parse_args(argv)
+    try:
+        safe_user_id(args.user)
+    except Exception as e:
+        parser.error(str(e))
+
+    checkpoint_file = args.checkpoint or f"{args.source.rstrip(os.sep)}.checkpoint.json"
+    done = set() if args.restart else load_checkpoint(checkpoint_file)
+
+    items = [item for item in collect_items(args.source) if item["id"] not in done]
+    if not args.restart:
+        # Un lot sauvegardé juste avant un arrêt peut manquer au fichier de reprise
+        done.update(imported_sources(args.user, {item["id"] for item in items}))
+        items = [item for item in items if item["id"] not in done]
+    if done:
+        print(f"Reprise : {len(done)} éléments déjà importés", file=sys.stderr)
+    if not items:
+        print("Rien à importer.", file=sys.stderr)
+        return 0
+
+    pending = []
+    processed = errors = saved = 0
+    started = time.perf_counter()
+
+    def commit():
+        """Sauvegarde le lot en cours puis avance le point de reprise"""
+        nonlocal saved
+        if not pending:
+            return
+        save_dream_entries([entry for _, entry in pending], user_id=args.user)
+        done.update(item_id for item_id, _ in pending)
+        save_checkpoint(checkpoint_file, done)
+        saved += len(pending)
+        pending.clear()
+
+    executor = ThreadPoolExecutor(max_workers=args.workers)
+    try:
+        futures = {executor.submit(process_item, item, args): item for item in items}
+        for future in as_completed(futures):
+            item = futures[future]
+            processed += 1
+            try:
+                pending.append((item["id"], future.result()))
+            except Exception as e:
+                errors += 1
+                print(f"\n❌ {item['id']} : {str(e)}", file=sys.stderr)
+
+            if len(pending) >= args.batch_size:
+                commit()
+            _print_progress(processed, len(items), errors, started)
+    except KeyboardInterrupt:
+        print("\nInterruption : sauvegarde du lot en cours...", file=sys.stderr)
+        executor.shutdown(wait=False, cancel_futures=True)
+        commit()
+        print(f"{saved} rêves importés. Relancez la même commande pour reprendre.", file=sys.stderr)
+        return 130
+
+    executor.shutdown()
+    commit()
+
+    elapsed = time.perf_counter() - started
+    print(f"\n{saved} rêves importés en {_format_duration(elapsed)} "
+          f"({saved / elapsed if elapsed else 0:.2f} rêves/s), {errors} erreurs.", file=sys.stderr)
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,364 @@
+"""Test de charge du pipeline complet de l'application, sessions simulées en parallèle.
+
+Chaque session enchaîne les parcours d'un utilisateur de l'interface : rêve
+écrit (analyse, image, sauvegarde), rêve vocal (transcription en plus),
+consultation de l'historique, des analyses et de la galerie. Whisper et
+Clipdrop sont remplacés par des substituts locaux à latence configurable
+(le moteur procédural de dream_images peut servir de secours) ;
+le reste (décodage audio, cache de transcription, verrou d'inférence,
+stockage des images et des partitions JSON) est le code réel.
+
+La charge monte par paliers de sessions simultanées. Pour chaque palier :
+débit, taux d'erreurs et latences p50/p95/p99 par étape et par parcours ;
+le point de saturation est le premier palier où le débit ne progresse plus
+assez, où les erreurs dépassent le seuil ou où la latence dépasse l'objectif.
+
+Toutes les données sont écrites dans un répertoire temporaire (chemins
+relatifs), supprimé à la fin sauf avec --keep-data.
+
+Exemple :
+    python loadtest_app.py --levels 1 2 4 8 16 --duration 20 --whisper-rtf 0.2 --image-latency 1.5
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import threading
+import time
+import wave
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Dict, List, Any, Optional
+
+import dream_images
+import dream_media
+import dream_transcription
+import dream_utils
+from api_loadtest import SAMPLE_DREAMS, percentile
+
+STAGES = ("transcribe", "analyze", "image", "save", "history", "analytics", "gallery")
+
+# Répartition des parcours d'une session (poids relatifs)
+SCENARIO_WEIGHTS = {"text": 4, "audio": 2, "history": 2, "analytics": 1, "gallery": 1}
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+class StandInWhisper:
+    """Substitut du modèle Whisper : temps de calcul = rtf x durée de l'audio
+
+    Il passe par dream_transcription.run_whisper, donc par le même verrou
+    d'inférence que le vrai modèle : les transcriptions restent sérialisées.
+    """
+
+    def __init__(self, rtf: float):
+        self.rtf = rtf
+        self._parameter = SimpleNamespace(device=SimpleNamespace(type="cpu"))
+
+    def parameters(self):
+        yield self._parameter
+
+    def transcribe(self, samples, language: str = "fr", fp16: bool = False) -> Dict[str, Any]:
+        time.sleep(self.rtf * len(samples) / dream_transcription.AUDIO_SAMPLE_RATE)
+        return {"text": random.choice(SAMPLE_DREAMS)}
+
+def make_png_bytes(size_kb: int) -> bytes:
+    """Contenu d'image unique (signature PNG + octets aléatoires) pour le stockage dream_media"""
+    return PNG_SIGNATURE + os.urandom(max(0, size_kb * 1024 - len(PNG_SIGNATURE)))
+
+def make_wav_bytes(seconds: float, sample_rate: int = dream_transcription.AUDIO_SAMPLE_RATE) -> bytes:
+    """WAV mono 16 bits de bruit faible : chaque appel est unique, donc absent du cache"""
+    frames = int(seconds * sample_rate)
+    samples = struct.pack(f"<{frames}h", *(random.randint(-800, 800) for _ in range(frames)))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples)
+    return buffer.getvalue()
+
+class StandInClipdrop(dream_images.ImageBackend):
+    """Substitut du moteur Clipdrop : latence fixe et proportion d'échecs configurables"""
+
+    name = "clipdrop"
+
+    def __init__(self, latency: float, error_rate: float, size_kb: int):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.size_kb = size_kb
+
+    def render(self, prompt: str, analysis: Dict[str, Any] = None, style: str = None, mood: str = None) -> bytes:
+        time.sleep(self.latency)
+        if random.random() < self.error_rate:
+            raise Exception("Erreur génération image : 503, substitut Clipdrop indisponible")
+        return make_png_bytes(self.size_kb)
+
+def install_stand_ins(whisper_rtf: float, image_latency: float, image_error_rate: float, image_kb: int,
+                      procedural_fallback: bool = False):
+    """Remplace Whisper et Clipdrop par des substituts locaux"""
+    model = StandInWhisper(whisper_rtf)
+    dream_transcription.get_whisper_model = lambda model_name=None, profile=None: model
+
+    backends = [StandInClipdrop(image_latency, image_error_rate, image_kb)]
+    if procedural_fallback:
+        backends.append(dream_images.ProceduralBackend())
+    dream_images.configure_backends(backends)
+
+class Recorder:
+    """Collecte thread-safe des durées et des échecs par étape et par parcours"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[tuple]] = {}
+
+    def record(self, name: str, elapsed: float, ok: bool):
+        with self._lock:
+            self.samples.setdefault(name, []).append((elapsed, ok))
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            self.record(name, time.perf_counter() - start, ok)
+
+    def summary(self, name: str) -> Dict[str, Any]:
+        with self._lock:
+            samples = list(self.samples.get(name, []))
+        ok_latencies = [elapsed for elapsed, ok in samples if ok]
+        return {
+            "count": len(samples),
+            "errors": len(samples) - len(ok_latencies),
+            "p50": percentile(ok_latencies, 50),
+            "p95": percentile(ok_latencies, 95),
+            "p99": percentile(ok_latencies, 99)
+        }
+
+def _new_entry(text: str, analysis: Dict[str, Any], image_path: str, rng: random.Random) -> Dict[str, Any]:
+    return {
+        "title": f"Rêve de test {rng.randint(0, 10 ** 6)}",
+        "text": text,
+        "analysis": analysis,
+        "image_path": image_path,
+        "metadata": {
+            "sleep_quality": rng.randint(1, 10),
+            "dream_clarity": rng.randint(1, 10),
+            "emotions": rng.sample(["Joie", "Peur", "Tristesse", "Anxiété", "Sérénité"], rng.randint(0, 2)),
+            "dream_type": rng.choice(["Rêve normal", "Cauchemar", "Rêve lucide"])
+        },
+        # Microsecondes aléatoires : deux sessions du même journal ne partagent pas une date
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S") + f".{rng.randint(0, 999999):06d}"
+    }
+
+def text_pipeline(user_id: str, rng: random.Random, recorder: Recorder, config: argparse.Namespace):
+    """Page « Nouveau rêve » : analyse, image, sauvegarde"""
+    text = rng.choice(SAMPLE_DREAMS)
+    with recorder.stage("analyze"):
+        analysis = dream_utils.analyze_dream(text)
+    with recorder.stage("image"):
+        image_path = dream_utils.generate_image(f"{text}, style surréaliste, ambiance mystérieuse",
+                                                analysis=analysis, style="surréaliste", mood="mystérieuse")
+    with recorder.stage("save"):
+        dream_utils.save_dream_entry(_new_entry(text, analysis, image_path, rng), user_id=user_id)
+
+def audio_pipeline(user_id: str, rng: random.Random, recorder: Recorder, config: argparse.Namespace):
+    """Page « Rêve vocal » : transcription puis même chaîne que le texte"""
+    audio = make_wav_bytes(config.audio_seconds)
+    with recorder.stage("transcribe"):
+        text = dream_utils.transcribe_audio(audio)
+    with recorder.stage("analyze"):
+        analysis = dream_utils.analyze_dream(text)
+    with recorder.stage("image"):
+        image_path = dream_utils.generate_image(f"{text}, style surréaliste, ambiance mystérieuse",
+                                                analysis=analysis, style="surréaliste", mood="mystérieuse")
+    with recorder.stage("save"):
+        dream_utils.save_dream_entry(_new_entry(text, analysis, image_path, rng), user_id=user_id)
+
+def browse_history(user_id: str, rng: random.Random, recorder: Recorder, config: argparse.Namespace):
+    """Page « Historique » : chargement et filtre par émotion"""
+    with recorder.stage("history"):
+        compact, locations = dream_utils.load_compact_history(user_id)
+        emotions = compact.values("emotions")
+        indices = compact.filter(emotion=rng.choice(emotions) if emotions else None)
+        indices.sort(key=lambda i: compact.records[i].timestamp, reverse=True)
+        dream_utils.load_dreams_at(user_id, [locations[i] for i in indices[:20]])
+
+def browse_analytics(user_id: str, rng: random.Random, recorder: Recorder, config: argparse.Namespace):
+    """Page « Analyses » : statistiques et tendances"""
+    with recorder.stage("analytics"):
+        dream_utils.get_dream_statistics(user_id)
+        dream_utils.get_dream_trends(user_id=user_id)
+
+def browse_gallery(user_id: str, rng: random.Random, recorder: Recorder, config: argparse.Namespace):
+    """Page « Galerie » : lecture de toutes les images du journal"""
+    with recorder.stage("gallery"):
+        for dream in dream_utils.load_dream_history(user_id):
+            if os.path.exists(dream["image_path"]):
+                with open(dream["image_path"], "rb") as f:
+                    f.read()
+
+SCENARIOS = {
+    "text": text_pipeline,
+    "audio": audio_pipeline,
+    "history": browse_history,
+    "analytics": browse_analytics,
+    "gallery": browse_gallery
+}
+
+def seed_journals(users: List[str], dreams_per_user: int, image_kb: int):
+    """Pré-remplit les journaux pour que les pages de consultation aient du contenu"""
+    rng = random.Random(0)
+    for user_id in users:
+        entries = []
+        for i in range(dreams_per_user):
+            text = SAMPLE_DREAMS[i % len(SAMPLE_DREAMS)]
+            entry = _new_entry(text, dream_utils.analyze_dream(text), dream_media.store_image(make_png_bytes(image_kb)), rng)
+            entry["date"] = f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T0{i % 10}:00:00.{i:06d}"
+            entries.append(entry)
+        dream_utils.save_dream_entries(entries, user_id=user_id)
+
+def run_level(sessions: int, users: List[str], duration: float, config: argparse.Namespace) -> Dict[str, Any]:
+    """Fait tourner `sessions` sessions simultanées pendant `duration` secondes"""
+    recorder = Recorder()
+    names = list(SCENARIO_WEIGHTS)
+    weights = [SCENARIO_WEIGHTS[name] for name in names]
+    deadline = time.perf_counter() + duration
+
+    def session(index: int):
+        rng = random.Random(config.seed * 1000 + index)
+        user_id = users[index % len(users)]
+        while time.perf_counter() < deadline:
+            scenario = rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            ok = True
+            try:
+                SCENARIOS[scenario](user_id, rng, recorder, config)
+            except Exception:
+                ok = False
+            recorder.record(f"scenario:{scenario}", time.perf_counter() - start, ok)
+            if config.think_time:
+                time.sleep(rng.uniform(0, 2 * config.think_time))
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(i,), daemon=True) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    scenarios = {name: recorder.summary(f"scenario:{name}") for name in names}
+    actions = sum(s["count"] for s in scenarios.values())
+    errors = sum(s["errors"] for s in scenarios.values())
+    return {
+        "sessions": sessions,
+        "wall_seconds": wall,
+        "actions": actions,
+        "throughput": (actions - errors) / wall if wall else 0,
+        "error_rate": errors / actions if actions else 0,
+        "scenarios": scenarios,
+        "stages": {stage: recorder.summary(stage) for stage in STAGES}
+    }
+
+def find_saturation(levels: List[Dict[str, Any]], min_gain: float, max_error_rate: float,
+                    latency_slo: Optional[float]) -> Optional[Dict[str, Any]]:
+    """Premier palier saturé (débit qui stagne, erreurs ou latence hors objectif), None sinon"""
+    for i, level in enumerate(levels):
+        if level["error_rate"] > max_error_rate:
+            return {"sessions": level["sessions"], "reason": f"taux d'erreurs {level['error_rate']:.1%}"}
+
+        if latency_slo is not None:
+            worst = max(s["p95"] for s in level["scenarios"].values())
+            if worst > latency_slo:
+                return {"sessions": level["sessions"], "reason": f"p95 {worst:.2f} s > objectif {latency_slo:.2f} s"}
+
+        if i > 0:
+            previous = levels[i - 1]["throughput"]
+            gain = (level["throughput"] - previous) / previous if previous else 0
+            if gain < min_gain:
+                return {"sessions": level["sessions"], "reason": f"débit {gain:+.0%} par rapport au palier précédent"}
+    return None
+
+def print_level(level: Dict[str, Any]):
+    print(f"\n── {level['sessions']} sessions | {level['actions']} parcours en {level['wall_seconds']:.1f} s | "
+          f"débit {level['throughput']:.2f} parcours/s | erreurs {level['error_rate']:.1%}")
+    print(f"   {'':<20} {'n':>6} {'err':>5} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10}")
+    rows = [(f"parcours {name}", s) for name, s in level["scenarios"].items()]
+    rows += [(f"étape {name}", s) for name, s in level["stages"].items()]
+    for label, s in rows:
+        if s["count"]:
+            print(f"   {label:<20} {s['count']:>6} {s['errors']:>5} {s['p50'] * 1000:>10.0f} "
+                  f"{s['p95'] * 1000:>10.0f} {s['p99'] * 1000:>10.0f}")
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Test de charge du pipeline complet (sessions simultanées)")
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 2, 4, 8, 16], help="Paliers de sessions simultanées")
+    parser.add_argument("--duration", type=float, default=20.0, help="Durée de chaque palier (s)")
+    parser.add_argument("--users", type=int, help="Nombre de journaux distincts (défaut : un par session)")
+    parser.add_argument("--seed-dreams", type=int, default=30, help="Rêves pré-enregistrés par journal")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Pause moyenne entre deux parcours (s)")
+    parser.add_argument("--audio-seconds", type=float, default=5.0, help="Durée des audios envoyés")
+    parser.add_argument("--whisper-rtf", type=float, default=0.2, help="Facteur temps réel du substitut Whisper")
+    parser.add_argument("--image-latency", type=float, default=1.5, help="Latence du substitut Clipdrop (s)")
+    parser.add_argument("--image-error-rate", type=float, default=0.0, help="Proportion d'échecs du substitut Clipdrop")
+    parser.add_argument("--image-kb", type=int, default=256, help="Taille des images générées (Ko)")
+    parser.add_argument("--procedural-fallback", action="store_true",
+                        help="Moteur procédural local en secours du substitut Clipdrop")
+    parser.add_argument("--min-gain", type=float, default=0.10, help="Gain de débit minimal entre deux paliers")
+    parser.add_argument("--max-error-rate", type=float, default=0.05, help="Taux d'erreurs au-delà duquel un palier est saturé")
+    parser.add_argument("--latency-slo", type=float, help="Objectif de p95 par parcours (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep-data", action="store_true", help="Conserve le répertoire de données temporaire")
+    parser.add_argument("--json", dest="json_output", help="Écrit le rapport dans ce fichier JSON")
+    args = parser.parse_args(argv)
+
+    if args.json_output:
+        args.json_output = os.path.abspath(args.json_output)
+
+    workdir = tempfile.mkdtemp(prefix="dream_loadtest_")
+    original_cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        install_stand_ins(args.whisper_rtf, args.image_latency, args.image_error_rate, args.image_kb,
+                          args.procedural_fallback)
+        user_count = args.users or max(args.levels)
+        users = [f"loadtest-{i}" for i in range(user_count)]
+        print(f"Données : {workdir} | {user_count} journaux pré-remplis de {args.seed_dreams} rêves", file=sys.stderr)
+        seed_journals(users, args.seed_dreams, args.image_kb)
+
+        levels = []
+        for sessions in args.levels:
+            print(f"Palier {sessions} sessions...", file=sys.stderr)
+            levels.append(run_level(sessions, users, args.duration, args))
+            print_level(levels[-1])
+    finally:
+        os.chdir(original_cwd)
+        if not args.keep_data:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    saturation = find_saturation(levels, args.min_gain, args.max_error_rate, args.latency_slo)
+    print()
+    if saturation:
+        capacity = max((l["sessions"] for l in levels if l["sessions"] < saturation["sessions"]), default=None)
+        print(f"Saturation à {saturation['sessions']} sessions ({saturation['reason']}) ; "
+              f"capacité estimée : {capacity if capacity is not None else 'moins que le premier palier'} sessions")
+    else:
+        print(f"Pas de saturation observée jusqu'à {levels[-1]['sessions']} sessions")
+
+    if args.json_output:
+        with open(args.json_output, 'w', encoding='utf-8') as f:
+            json.dump({"config": vars(args), "levels": levels, "saturation": saturation}, f, ensure_ascii=False, indent=2)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())